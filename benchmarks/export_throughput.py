@@ -0,0 +1,55 @@
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+# Benchmarks import the scripts directly, the same way the scripts import each other
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from export import FORMATS, profile_record, write_artifacts
+from generate_profiles import iter_profiles
+
+
+def bench_format(export_format, profiles, write_dir=None):
+    """Seconds to extract records and render (and optionally write) every profile."""
+    spec = FORMATS[export_format]
+    render = spec.render
+    start = time.perf_counter()
+    if write_dir is None:
+        for profile in profiles:
+            render(profile_record(profile))
+    else:
+        for i, profile in enumerate(profiles):
+            profile_dir = os.path.join(write_dir, str(i))
+            os.makedirs(profile_dir, exist_ok=True)
+            write_artifacts(profile_dir, render(profile_record(profile)))
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark exporter throughput (profiles/sec per format).")
+    parser.add_argument("--profiles", "-n", type=int, default=5000, help="Number of profiles to render (default: 5000)")
+    parser.add_argument("--write", action="store_true", help="Also write the artifacts to a temporary directory")
+    parser.add_argument("--format", choices=list(FORMATS), action="append", help="Format to benchmark (repeatable; default: all)")
+    args = parser.parse_args(argv)
+
+    profiles = list(itertools.islice(iter_profiles(), args.profiles))
+    formats = args.format or list(FORMATS)
+
+    print(f"Profiles: {len(profiles)} ({'render + write' if args.write else 'render only'})")
+    results = {}
+    for export_format in formats:
+        if args.write:
+            with tempfile.TemporaryDirectory() as tmp:
+                elapsed = bench_format(export_format, profiles, tmp)
+        else:
+            elapsed = bench_format(export_format, profiles)
+        results[export_format] = len(profiles) / elapsed if elapsed else float('inf')
+        print(f"  {export_format:<10} {results[export_format]:>12,.0f} profiles/sec")
+    return results
+
+
+if __name__ == "__main__":
+    main()
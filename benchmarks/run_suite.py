@@ -0,0 +1,226 @@
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmarks import the scripts directly, the same way the scripts import each other
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+import generate_profiles
+from export import EXPORTERS
+
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_THRESHOLD = 0.10  # Relative slowdown / RSS growth tolerated before flagging a regression
+SEARCH_QUERY = "dell"
+FILTER_MAKE = "dell"
+FILTER_OS = "windows"
+
+CASES = ["generate", "search_scan", "search_store", "search_index", "filter_profiles"] + [f"export_{name}" for name in EXPORTERS]
+
+
+def synthesize_catalog(laptops, scale):
+    """Replicates the catalog `scale` times; copies get a " Mk<n>" model suffix so make/model stay unique."""
+    catalog = []
+    for copy in range(scale):
+        for laptop in laptops:
+            entry = dict(laptop)
+            if copy:
+                entry['model'] = f"{laptop['model']} Mk{copy + 1}"
+            catalog.append(entry)
+    return catalog
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children, in MB."""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def use_workspace(workspace):
+    """Points generate_profiles and the profile store at a benchmark workspace."""
+    profiles_dir = os.path.join(workspace, 'profiles')
+    generate_profiles.DB_PATH = os.path.join(workspace, 'laptops.json')
+    generate_profiles.PROFILES_DIR = profiles_dir
+    generate_profiles.MANIFEST_PATH = os.path.join(profiles_dir, '.generation_manifest.json')
+    generate_profiles.STORE_PATH = os.path.join(profiles_dir, 'profiles.tkpack')
+    return profiles_dir
+
+
+def run_case(case, workspace, export_sample):
+    """Runs one case in this process; returns (profiles processed, wall seconds)."""
+    profiles_dir = use_workspace(workspace)
+    laptops = generate_profiles.load_db()
+    total = sum(generate_profiles.variant_count(laptop) for laptop in laptops)
+
+    if case == "generate":
+        shutil.rmtree(profiles_dir, ignore_errors=True)
+        os.makedirs(profiles_dir)
+        start = time.perf_counter()
+        generate_profiles.main(["--force"])
+        return total, time.perf_counter() - start
+
+    if case.startswith("search_"):
+        from search_profiles import search_profiles
+        use_store = case == "search_store"
+        use_index = case == "search_index"
+        if use_index:
+            # Build the index untimed; the case measures a warm query
+            search_profiles(profiles_dir, SEARCH_QUERY, use_store=False, use_index=True)
+        start = time.perf_counter()
+        search_profiles(profiles_dir, SEARCH_QUERY, use_store=use_store, use_index=use_index)
+        return total, time.perf_counter() - start
+
+    if case == "filter_profiles":
+        from batch_export import find_profiles, filter_profiles
+        paths = find_profiles(profiles_dir)
+        start = time.perf_counter()
+        filter_profiles(paths, FILTER_MAKE, FILTER_OS)
+        return len(paths), time.perf_counter() - start
+
+    if case.startswith("export_"):
+        exporter = EXPORTERS[case[len("export_"):]]
+        profiles = list(itertools.islice(generate_profiles.iter_profiles(laptops), export_sample))
+        output_dir = os.path.join(workspace, 'exports', case)
+        os.makedirs(output_dir, exist_ok=True)
+        start = time.perf_counter()
+        for profile in profiles:
+            exporter(profile, output_dir)
+        return len(profiles), time.perf_counter() - start
+
+    raise ValueError(f"Unknown benchmark case: {case}")
+
+
+def worker(args):
+    """Entry point of the per-case subprocess: runs the case and writes its measurements as JSON."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        count, elapsed = run_case(args.case, args.workspace, args.export_sample)
+    result = {
+        "wall_s": round(elapsed, 4),
+        "profiles": count,
+        "profiles_per_sec": round(count / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    with open(args.result, 'w') as f:
+        json.dump(result, f)
+
+
+def measure(case, workspace, export_sample):
+    """Runs a case in a fresh interpreter so peak RSS belongs to that case alone."""
+    result_path = os.path.join(workspace, f'{case}.result.json')
+    command = [sys.executable, os.path.abspath(__file__), "--worker", case,
+               "--workspace", workspace, "--result", result_path, "--export-sample", str(export_sample)]
+    subprocess.run(command, check=True)
+    with open(result_path, 'r') as f:
+        return json.load(f)
+
+
+def run_suite(scales, cases, export_sample, workdir=None):
+    laptops = generate_profiles.load_db()
+    results = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for scale in scales:
+            workspace = os.path.join(tmp, f'x{scale}')
+            os.makedirs(workspace)
+            with open(os.path.join(workspace, 'laptops.json'), 'w') as f:
+                json.dump(synthesize_catalog(laptops, scale), f)
+
+            # Search and filter cases read the tree the generate case writes
+            needs_tree = any(not case.startswith("export_") for case in cases)
+            for case in (["generate"] if needs_tree else []) + [case for case in cases if case != "generate"]:
+                result = measure(case, workspace, export_sample)
+                if case in cases:
+                    result = {"case": case, "scale": scale, "models": len(laptops) * scale, **result}
+                    results.append(result)
+                    print(f"  {scale:>4}x {case:<18} {result['wall_s']:>9.3f}s "
+                          f"{result['profiles_per_sec'] or 0:>12,.0f} profiles/sec {result['peak_rss_mb']:>8.1f} MB")
+            shutil.rmtree(workspace)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Regressions against a baseline: throughput down or peak RSS up by more than `threshold`."""
+    previous = {(entry["case"], entry["scale"]): entry for entry in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = previous.get((result["case"], result["scale"]))
+        if not base:
+            continue
+        if base["profiles_per_sec"] and result["profiles_per_sec"] is not None:
+            change = result["profiles_per_sec"] / base["profiles_per_sec"] - 1
+            if change < -threshold:
+                regressions.append(f"{result['scale']}x {result['case']}: profiles/sec {base['profiles_per_sec']:,.0f} -> {result['profiles_per_sec']:,.0f} ({change:+.0%})")
+        if base["peak_rss_mb"]:
+            change = result["peak_rss_mb"] / base["peak_rss_mb"] - 1
+            if change > threshold:
+                regressions.append(f"{result['scale']}x {result['case']}: peak RSS {base['peak_rss_mb']:.1f} MB -> {result['peak_rss_mb']:.1f} MB ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark generation, search, filtering and export on synthetic catalogs.")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Comma-separated catalog multipliers of laptops.json (default: 1,10,100)")
+    parser.add_argument("--case", choices=CASES, action="append", help="Case to run (repeatable; default: all)")
+    parser.add_argument("--export-sample", type=int, default=1000, help="Profiles per export case (default: 1000)")
+    parser.add_argument("--output", "-o", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative change flagged as a regression (default: 0.10)")
+    parser.add_argument("--workdir", help="Directory for the temporary workspaces (default: system temp)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workspace", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        args.case = args.worker
+        worker(args)
+        return 0
+
+    try:
+        scales = [int(scale) for scale in args.scales.split(",")]
+    except ValueError:
+        parser.error(f"--scales must be comma-separated integers, got {args.scales!r}")
+
+    print(f"Benchmarking scales {', '.join(f'{scale}x' for scale in scales)}...")
+    results = run_suite(scales, args.case or CASES, args.export_sample, args.workdir)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f" - {regression}")
+            return 1
+        print(f"\nNo regressions against {args.compare} (threshold {args.threshold:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
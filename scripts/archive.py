@@ -0,0 +1,76 @@
+import io
+import shutil
+import tarfile
+import time
+import zipfile
+from typing import Any, BinaryIO
+
+# Suffix -> tarfile write mode
+TAR_MODES = {
+    '.tar': 'w',
+    '.tar.gz': 'w:gz',
+    '.tgz': 'w:gz',
+    '.tar.bz2': 'w:bz2',
+    '.tar.xz': 'w:xz',
+}
+ARCHIVE_SUFFIXES = ['.zip'] + list(TAR_MODES)
+
+
+class ArchiveWriter:
+    """Streams in-memory files into a .zip or .tar[.gz|.bz2|.xz] archive.
+
+    Each file is written as soon as it is added, so memory use does not grow
+    with the number of files, except for the per-file central directory entry
+    a zip has to keep until it is closed. Executable files get mode 0755,
+    others 0644.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = time.time()
+        lower = path.lower()
+        if lower.endswith('.zip'):
+            self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+            self._tar = None
+            return
+        for suffix, mode in TAR_MODES.items():
+            if lower.endswith(suffix):
+                self._tar = tarfile.open(path, mode)
+                self._zip = None
+                return
+        raise ValueError(f"Unsupported archive type: {path} (expected one of {', '.join(ARCHIVE_SUFFIXES)})")
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def add(self, name: str, content: bytes, executable: bool = False) -> None:
+        self.add_file(name, io.BytesIO(content), len(content), executable)
+
+    def add_file(self, name: str, fileobj: BinaryIO, size: int, executable: bool = False) -> None:
+        """Copies `size` bytes from an open binary file into the archive without reading it all into memory."""
+        mode = 0o755 if executable else 0o644
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, date_time=time.localtime(self.mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.create_system = 3  # Unix, so the permission bits below are honoured
+            info.external_attr = (0o100000 | mode) << 16
+            info.file_size = size
+            with self._zip.open(info, 'w', force_zip64=size > zipfile.ZIP64_LIMIT) as target:
+                shutil.copyfileobj(fileobj, target)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mode = mode
+            info.mtime = int(self.mtime)
+            self._tar.addfile(info, fileobj)
+            # TarFile keeps every member it writes, but nothing reads them back in write mode
+            self._tar.members.clear()
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
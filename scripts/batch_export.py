@@ -1,102 +1,709 @@
 import os
+import sys
 import json
 import argparse
+import contextlib
 import glob
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Tuple
+
+CACHE_NAME = ".export_cache.json"
+CACHE_VERSION = 1
+EXPORT_CHUNK = 16  # Profiles per task handed to a worker process
 
 # Import exporters from the existing script
 try:
-    from export import export_docker, export_vagrant, export_terraform, export_wsb, export_hyperv, export_vmware
+    from export import EXPORTERS, FORMATS, MODULE_FORMATS, profile_record, render_bake, write_artifacts
+    from archive import ARCHIVE_SUFFIXES, ArchiveWriter
 except ImportError:
     # Handle case where script is run from root directory
-    from scripts.export import export_docker, export_vagrant, export_terraform, export_wsb, export_hyperv, export_vmware
+    from scripts.export import EXPORTERS, FORMATS, MODULE_FORMATS, profile_record, render_bake, write_artifacts
+    from scripts.archive import ARCHIVE_SUFFIXES, ArchiveWriter
+
+try:
+    from profile_store import ProfileStore, config_hash, is_profile, open_store
+    from filter_expr import FilterExpression, FilterSyntaxError
+    from migrate_to_sqlite import DB_PATH, open_db, query_profiles, row_to_profile
+    from jsonl import open_stream, read_profiles
+    from profile_model import Profile
+    from instrument import STATS, add_arguments, instrumented
+    from shards import parse_shard, take_shard
+except ImportError:
+    from scripts.profile_store import ProfileStore, config_hash, is_profile, open_store
+    from scripts.filter_expr import FilterExpression, FilterSyntaxError
+    from scripts.migrate_to_sqlite import DB_PATH, open_db, query_profiles, row_to_profile
+    from scripts.jsonl import open_stream, read_profiles
+    from scripts.profile_model import Profile
+    from scripts.instrument import STATS, add_arguments, instrumented
+    from scripts.shards import parse_shard, take_shard
 
 
 def find_profiles(root_dir: str = "profiles") -> List[str]:
     """Recursively finding all JSON profile files."""
-    return glob.glob(os.path.join(root_dir, "**", "*.json"), recursive=True)
+    with STATS.phase("scan"):
+        paths = glob.glob(os.path.join(root_dir, "**", "*.json"), recursive=True)
+    STATS.count("files_scanned", len(paths))
+    return paths
 
-def filter_profiles(profile_paths: List[str], make_filter: str, os_filter: str) -> List[Dict[str, Any]]:
-    """Loads and filters profiles based on criteria."""
-    matches = []
-    
+def profile_matches(profile: Profile, make_filter: str, os_filter: str,
+                    where: Optional[FilterExpression] = None) -> bool:
+    """True if a profile passes the --make/--os substring filters and the --where expression."""
+    # Check Make Match
+    if make_filter and make_filter.lower() not in (profile.make or '').lower():
+        return False
+
+    # Check OS Match
+    if os_filter and os_filter.lower() not in (profile.os_target or '').lower():
+        return False
+
+    return where is None or where.matches(profile)
+
+def filter_profiles(profile_paths: Iterable[str], make_filter: str, os_filter: str,
+                    where: Optional[FilterExpression] = None) -> Iterator[Profile]:
+    """Lazily loads and filters profiles based on criteria.
+
+    Unreadable or malformed files are reported on stderr and skipped, and
+    JSON documents that are not profiles (e.g. profile_schema.json) are
+    skipped; both are counted in the run's stats.
+    """
     for path in profile_paths:
         try:
-            with open(path, 'r') as f:
-                data = json.load(f)
-                
-            # Check Make Match
-            make = data.get('metadata', {}).get('make', '') or data.get('make', '')
-            if make_filter and make_filter.lower() not in make.lower():
-                continue
-                
-            # Check OS Match
-            os_target = data.get('metadata', {}).get('os_target', '') or data.get('os', '')
-            if os_filter and os_filter.lower() not in os_target.lower():
-                continue
-            
-            # Store path for logging references if needed, but return data object
-            data['_source_path'] = path 
-            matches.append(data)
-            
-        except Exception as e:
-            # print(f"Warning: Could not load {path}: {e}")
-            pass
-            
-    return matches
-
-def main():
+            with STATS.phase("parse"):
+                with open(path, 'r') as f:
+                    data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not load {path}: {e}", file=sys.stderr)
+            STATS.count("files_failed")
+            continue
+        STATS.count("files_parsed")
+        if not is_profile(data):
+            STATS.count("files_skipped")
+            continue
+
+        with STATS.phase("filter"):
+            # Keep the path for logging references
+            profile = Profile.from_dict(data, source=path)
+            matched = profile_matches(profile, make_filter, os_filter, where)
+        if matched:
+            yield profile
+
+def filter_stream(profiles: Iterable[Dict[str, Any]], make_filter: str, os_filter: str,
+                  where: Optional[FilterExpression] = None) -> Iterator[Profile]:
+    """Lazily filters a profile stream (e.g. JSON Lines on stdin); nothing is read ahead of the export."""
+    for data in profiles:
+        STATS.count("profiles_read")
+        with STATS.phase("filter"):
+            profile = Profile.from_dict(data)
+            matched = profile_matches(profile, make_filter, os_filter, where)
+        if matched:
+            yield profile
+
+def filter_store(store: ProfileStore, make_filter: str, os_filter: str, root_dir: str = "profiles",
+                 where: Optional[FilterExpression] = None) -> Iterator[Profile]:
+    """Lazily filters a packed profile store, only materializing the rows that match.
+
+    A --where expression is evaluated as column masks over the whole store
+    first, so only its matching rows are visited. The store must stay open
+    until the iterator is exhausted.
+    """
+    make_codes = store.codes_matching(lambda text: make_filter.lower() in text.lower()) if make_filter else None
+    os_codes = store.codes_matching(lambda text: os_filter.lower() in text.lower()) if os_filter else None
+    makes = store.column('make')
+    os_targets = store.column('os_target')
+
+    for row in (where.rows(store) if where is not None else range(len(store))):
+        if make_codes is not None and makes[row] not in make_codes:
+            continue
+        if os_codes is not None and os_targets[row] not in os_codes:
+            continue
+        yield Profile.from_dict(store.profile(row), source=os.path.join(root_dir, store.relative_path(row)),
+                                config_hash=store.config_hash(row))
+
+def filter_db(conn, make_filter: str, os_filter: str, root_dir: str = "profiles",
+              where: Optional[FilterExpression] = None) -> Iterator[Profile]:
+    """Lazily filters the profiles table of the hardware database with indexed SQL lookups.
+
+    Rows are fetched from the cursor as the iterator is consumed, so the
+    connection must stay open until it is exhausted.
+    """
+    contains = {}
+    if make_filter:
+        contains['make'] = make_filter
+    if os_filter:
+        contains['os_target'] = os_filter
+
+    for row in query_profiles(conn, contains=contains, where=where.to_sql() if where is not None else None):
+        source = os.path.join(root_dir, row['path'])
+        yield Profile.from_dict(row_to_profile(row), source=source)
+
+def config_id(profile: Profile, digest: str) -> str:
+    """Readable id for a hardware configuration: make-model-os slug plus the config hash."""
+    record = profile_record(profile)
+    slug = f"{record['make']}-{record['model']}-{record['os']}".lower()
+    return f"{slug.replace(' ', '-').replace('.', '')}-{digest[:12]}"
+
+def dedupe_profiles(profiles: Iterable[Profile], mapping: Dict[str, str]) -> Iterator[Profile]:
+    """Collapses profiles that share a hardware configuration.
+
+    Variants that differ only in environment/software render identical
+    artifacts, so each distinct config is exported once under its config id.
+    Yields each representative as soon as its config is first seen, and
+    records every profile id -> config id in `mapping` as profiles go by.
+    """
+    seen: Dict[str, str] = {}
+    for profile in profiles:
+        digest = profile.config_hash or config_hash(profile.to_dict())
+        representative_id = seen.get(digest)
+        if representative_id is None:
+            representative_id = seen[digest] = config_id(profile, digest)
+            yield profile.replace(id=representative_id, config_hash=digest)
+        mapping[profile.id] = representative_id
+
+def export_one(profile: Profile, export_format: str, output_root: str,
+               cached: Optional[Dict[str, Any]] = None, record: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Exports a profile into its own <output_root>/<profile_id>/ directory.
+
+    Each profile gets a private directory so its launch.ps1/launch.sh are not
+    overwritten by the next profile. If `cached` (the profile's export cache
+    entry) has the same key and its files exist, nothing is rendered;
+    otherwise only files whose bytes differ are rewritten. Failures are
+    captured in the returned result instead of raised, so one bad profile
+    cannot abort the batch. `record` is the profile's already extracted
+    profile_record(), shared when one profile goes to several formats.
+    """
+    profile_id = profile.id
+    result = new_result(profile)
+    try:
+        spec = FORMATS[export_format]
+        if record is None:
+            record = profile_record(profile)
+        key = spec.cache_key(record)
+        if cached and cached.get("key") == key and all(os.path.exists(os.path.join(output_root, path)) for path in cached["files"]):
+            result.update(status="ok", key=key, files=cached["files"], changed=[], cached=True)
+            STATS.count("profiles_cached")
+            return result
+
+        with STATS.phase("render"):
+            artifacts = spec.render(record)
+        with STATS.phase("write"):
+            profile_dir = os.path.join(output_root, profile_id)
+            os.makedirs(profile_dir, exist_ok=True)
+            changed: List[str] = []
+            files = write_artifacts(profile_dir, artifacts, changed)
+        result["status"] = "ok"
+        result["key"] = key
+        result["files"] = [os.path.relpath(path, output_root) for path in files]
+        result["changed"] = [os.path.relpath(path, output_root) for path in changed]
+    except Exception as e:
+        print(f"Failed to export {profile_id}: {e}", file=sys.stderr)
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+def new_result(profile: Profile) -> Dict[str, Any]:
+    return {"id": profile.id, "source": profile.source}
+
+def export_formats(profile: Profile, targets: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """Exports one profile to every (format, output root, cache entry) target, extracting its record once."""
+    try:
+        record = profile_record(profile)
+    except Exception:
+        record = None  # export_one retries and records the failure per format
+    return [export_one(profile, export_format, output_root, cached, record) for export_format, output_root, cached in targets]
+
+def export_chunk(items: List[Tuple[Profile, List[Tuple[str, str, Optional[Dict[str, Any]]]]]],
+                 collect_stats: bool = False) -> Tuple[List[List[Dict[str, Any]]], Optional[Dict[str, Any]]]:
+    """Runs in a pool worker; also returns the worker's stats for this chunk when the parent collects them."""
+    STATS.reset(enabled=collect_stats)
+    exported = [export_formats(profile, targets) for profile, targets in items]
+    return exported, STATS.snapshot() if collect_stats else None
+
+def export_multi(profiles: Iterable[Profile], output_roots: Dict[str, str], jobs: int = 1,
+                 caches: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Exports every profile to each format of `output_roots` ({format: output root}) in a single pass.
+
+    Each profile is read and filtered once upstream and its record extracted
+    once, then rendered for every format. Returns {format: results}, each in
+    input order. `profiles` may be a lazy iterator: it is consumed one chunk
+    at a time and at most two chunks per worker are in flight, so a slow
+    export holds back the producer instead of buffering the whole input.
+    """
+    caches = caches or {}
+    targets = [(export_format, output_root, caches.get(export_format) or {}) for export_format, output_root in output_roots.items()]
+    items = (
+        (profile, [(export_format, output_root, cache.get(profile.id)) for export_format, output_root, cache in targets])
+        for profile in profiles
+    )
+    results: Dict[str, List[Dict[str, Any]]] = {export_format: [] for export_format in output_roots}
+
+    def collect(exported: List[List[Dict[str, Any]]]) -> None:
+        for per_format in exported:
+            for export_format, result in zip(output_roots, per_format):
+                results[export_format].append(result)
+
+    if jobs <= 1:
+        for profile, profile_targets in items:
+            collect([export_formats(profile, profile_targets)])
+        return results
+
+    def finish(future: Any) -> None:
+        exported, stats = future.result()
+        collect(exported)
+        STATS.merge(stats)
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending: deque = deque()
+        for chunk in iter(lambda: list(islice(items, EXPORT_CHUNK)), []):
+            pending.append(pool.submit(export_chunk, chunk, STATS.enabled))
+            if len(pending) >= 2 * jobs:
+                finish(pending.popleft())
+        while pending:
+            finish(pending.popleft())
+    return results
+
+def add_module_entry(profile: Profile, export_format: str, entries: Dict[str, Any],
+                     record: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Adds a profile to a batch-only module format (e.g. terraform-module).
+
+    Nothing is written per profile: the entry goes into `entries`
+    ({profile id: entry}) and the module's files are rendered once from all
+    of them by batch_artifacts(). The result keeps the entry too, so
+    merge_shards.py can re-render the module from shard manifests.
+    Failures are captured in the result.
+    """
+    result = new_result(profile)
+    try:
+        entry, _ = MODULE_FORMATS[export_format]
+        entries[profile.id] = entry(record if record is not None else profile_record(profile))
+        result["status"] = "ok"
+        result["files"] = []
+        result["entry"] = entries[profile.id]
+    except Exception as e:
+        print(f"Failed to export {profile.id}: {e}", file=sys.stderr)
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+def collect_modules(profiles: Iterable[Profile], results: Dict[str, List[Dict[str, Any]]],
+                    entries: Dict[str, Dict[str, Any]]) -> Iterator[Profile]:
+    """Passes profiles through, adding each one to every module format of `results` on the way."""
+    for profile in profiles:
+        try:
+            record = profile_record(profile)
+        except Exception:
+            record = None  # add_module_entry retries and records the failure per format
+        for export_format, format_results in results.items():
+            format_results.append(add_module_entry(profile, export_format, entries[export_format], record))
+        yield profile
+
+def export_batch(profiles: Iterable[Profile], export_format: str, output_root: str, jobs: int = 1,
+                 cache: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Exports profiles in one format, fanning out across a process pool when jobs > 1. Results keep input order."""
+    return export_multi(profiles, {export_format: output_root}, jobs, {export_format: cache or {}})[export_format]
+
+def load_export_cache(output_root: str, export_format: str) -> Dict[str, Any]:
+    """Export cache entries ({profile id: {key, files}}) for one format; empty if missing or outdated."""
+    try:
+        with open(os.path.join(output_root, CACHE_NAME), 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('formats', {}).get(export_format, {})
+
+def save_export_cache(output_root: str, export_format: str, results: List[Dict[str, Any]]) -> None:
+    """Records the cache key and files of every successful export, keeping other formats' entries."""
+    path = os.path.join(output_root, CACHE_NAME)
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if cache.get('version') != CACHE_VERSION:
+        cache = {"version": CACHE_VERSION, "formats": {}}
+    entries = cache["formats"].setdefault(export_format, {})
+    for result in results:
+        if result["status"] == "ok":
+            entries[result["id"]] = {"key": result["key"], "files": result["files"]}
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+class ResultSpool:
+    """Per-profile results of a streamed export, spooled to a temporary file as they arrive.
+
+    Only the counts stay in memory; iterating reads the results back in order.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.total = 0
+        self.succeeded = 0
+
+    def __enter__(self) -> 'ResultSpool':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._file.close()
+
+    def append(self, result: Dict[str, Any]) -> None:
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(json.dumps(result) + "\n")
+        self.total += 1
+        if result["status"] == "ok":
+            self.succeeded += 1
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        self._file.flush()
+        self._file.seek(0)
+        for line in self._file:
+            yield json.loads(line)
+
+def export_archive(profiles: Iterable[Profile], export_formats: List[str], archive_path: str,
+                   config_map: Optional[Dict[str, str]] = None,
+                   shard: Optional[Dict[str, Any]] = None) -> Dict[str, Tuple[int, int]]:
+    """Renders profiles in memory and streams them into a tar/zip archive, one profile at a time.
+
+    The archive mirrors the directory layout (<profile_id>/<file>, under a
+    <format>/ prefix when several formats are exported) and ends with a
+    batch_manifest.json per format; no intermediate files are written to the
+    output. Each profile's results are spooled to a temporary file once its
+    files are in the archive, and the manifests are streamed back from the
+    spools, so memory use does not grow with the selection. Module formats
+    are the exception: their single module is rendered from every profile's
+    entry. Returns {format: (exported, succeeded)}.
+    """
+    prefixes = {export_format: f"{export_format}/" if len(export_formats) > 1 else "" for export_format in export_formats}
+    entries: Dict[str, Dict[str, Any]] = {export_format: {} for export_format in export_formats if export_format in MODULE_FORMATS}
+    with ArchiveWriter(archive_path) as archive, contextlib.ExitStack() as spools:
+        results = {export_format: spools.enter_context(ResultSpool()) for export_format in export_formats}
+        for profile in profiles:
+            profile_id = profile.id
+            try:
+                record = profile_record(profile)
+            except Exception:
+                record = None
+            for export_format, prefix in prefixes.items():
+                if export_format in MODULE_FORMATS:
+                    results[export_format].append(add_module_entry(profile, export_format, entries[export_format], record))
+                    continue
+                result = new_result(profile)
+                try:
+                    artifacts = FORMATS[export_format].render(record if record is not None else profile_record(profile))
+                    for filename, content, executable in artifacts:
+                        archive.add(f"{prefix}{profile_id}/{filename}", content.encode('utf-8'), executable)
+                    result["status"] = "ok"
+                    result["files"] = [f"{profile_id}/{filename}" for filename, _, _ in artifacts]
+                except Exception as e:
+                    print(f"Failed to export {profile_id}: {e}", file=sys.stderr)
+                    result["status"] = "failed"
+                    result["error"] = f"{type(e).__name__}: {e}"
+                results[export_format].append(result)
+        for export_format, prefix in prefixes.items():
+            spool = results[export_format]
+            for filename, content, executable in batch_artifacts(spool, export_format, entries.get(export_format)):
+                archive.add(f"{prefix}{filename}", content.encode('utf-8'), executable)
+            with tempfile.TemporaryFile() as manifest:
+                stream_manifest(manifest, spool, export_format, config_map, shard)
+                size = manifest.tell()
+                manifest.seek(0)
+                archive.add_file(f"{prefix}batch_manifest.json", manifest, size)
+        return {export_format: (spool.total, spool.succeeded) for export_format, spool in results.items()}
+
+def batch_artifacts(results: Iterable[Dict[str, Any]], export_format: str,
+                    entries: Optional[Dict[str, Any]] = None) -> List[Tuple[str, str, bool]]:
+    """Files a format needs at the batch root, built from every profile's result.
+
+    docker-bake adds the shared base Dockerfile and the bake file declaring
+    one target per exported profile; module formats render their whole
+    output from `entries` ({profile id: entry}).
+    """
+    if export_format in MODULE_FORMATS:
+        _, render = MODULE_FORMATS[export_format]
+        return render(entries or {})
+    if export_format != "docker-bake":
+        return []
+    return render_bake([(result["id"], result["files"][0]) for result in results if result["status"] == "ok"])
+
+def build_manifest(results: List[Dict[str, Any]], export_format: str,
+                   config_map: Optional[Dict[str, str]] = None,
+                   shard: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+    manifest = {
+        "format": export_format,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "profiles": results,
+    }
+    if config_map is not None:
+        # With --dedupe each result is a hardware config; list its profiles and map every profile id to its config id
+        members: Dict[str, List[str]] = {}
+        for profile_id, config in config_map.items():
+            members.setdefault(config, []).append(profile_id)
+        for result in results:
+            result["profiles"] = members.get(result["id"], [])
+        manifest["config_map"] = config_map
+    if shard is not None:
+        # With --shard: index, count and how many profiles were selected before the split
+        manifest["shard"] = dict(shard)
+    return manifest
+
+def write_manifest(results: List[Dict[str, Any]], export_format: str, output_root: str,
+                   config_map: Optional[Dict[str, str]] = None, shard: Optional[Dict[str, Any]] = None) -> str:
+    """Writes batch_manifest.json summarizing what each profile produced."""
+    manifest_path = os.path.join(output_root, "batch_manifest.json")
+    with open(manifest_path, 'w') as f:
+        json.dump(build_manifest(results, export_format, config_map, shard), f, indent=2)
+    return manifest_path
+
+def stream_manifest(out: BinaryIO, results: ResultSpool, export_format: str,
+                    config_map: Optional[Dict[str, str]] = None, shard: Optional[Dict[str, Any]] = None) -> None:
+    """Writes the same batch_manifest.json as build_manifest(), one spooled result at a time."""
+    members: Optional[Dict[str, List[str]]] = None
+    if config_map is not None:
+        members = {}
+        for profile_id, config in config_map.items():
+            members.setdefault(config, []).append(profile_id)
+    head = {"format": export_format, "total": results.total, "succeeded": results.succeeded,
+            "failed": results.total - results.succeeded}
+    # json.dumps(indent=2) of the whole manifest, without building it: the header's closing brace is
+    # replaced by the profiles list, whose items are the results dumped one level deeper
+    out.write((json.dumps(head, indent=2)[:-2] + ',\n  "profiles": [').encode('utf-8'))
+    for position, result in enumerate(results):
+        if members is not None:
+            result["profiles"] = members.get(result["id"], [])
+        item = json.dumps(result, indent=2).replace("\n", "\n    ")
+        out.write((f"{',' if position else ''}\n    {item}").encode('utf-8'))
+    out.write(("\n  ]" if results.total else "]").encode('utf-8'))
+    tail: Dict[str, Any] = {}
+    if config_map is not None:
+        tail["config_map"] = config_map
+    if shard is not None:
+        tail["shard"] = dict(shard)
+    if tail:
+        out.write(("," + json.dumps(tail, indent=2)[1:-2]).encode('utf-8'))
+    out.write(b"\n}")
+
+def select_profiles(args, where: Optional[FilterExpression], inputs: contextlib.ExitStack) -> Iterator[Profile]:
+    """Finds and filters the profiles to export, lazily from every source.
+
+    Profiles are read and filtered only as the export consumes them, so the
+    selection is never held in memory. The store or database connection a
+    source reads from is registered on `inputs` and stays open until the
+    export is done.
+    """
+    if args.input:
+        # 1+2. Filter profiles as they arrive; the profiles tree is never read
+        print(f"Streaming profiles from {'stdin' if args.input == '-' else args.input}...")
+        stream = inputs.enter_context(open_stream(args.input))
+        return filter_stream(read_profiles(stream), args.make, args.os, where)
+
+    store = None if args.no_store or args.db else open_store("profiles")
+    if args.db:
+        # 1+2. Run the filters as indexed SQL
+        conn = open_db(args.db)
+        inputs.callback(conn.close)
+        print(f"Querying hardware database {args.db}...")
+        matches = filter_db(conn, args.make, args.os, where=where)
+    elif store is not None:
+        # 1+2. Filter the packed store directly
+        inputs.enter_context(store)
+        print(f"Filtering packed profile store ({len(store)} profiles)...")
+        matches = filter_store(store, args.make, args.os, where=where)
+    else:
+        # 1. Find all profiles
+        print("Scanning for profiles...")
+        all_files = find_profiles()
+        print(f"Found {len(all_files)} profile files.")
+
+        # 2. Filter
+        print("Filtering...")
+        matches = filter_profiles(all_files, args.make, args.os, where)
+    return count_matches(matches)
+
+def count_matches(matches: Iterable[Profile]) -> Iterator[Profile]:
+    """Passes the selection through, reporting how many profiles matched once it is exhausted."""
+    matched = 0
+    for profile in matches:
+        matched += 1
+        yield profile
+    STATS.count("profiles_matched", matched)
+    print(f"Matched {matched} profiles.")
+
+# Per-profile formats plus the batch-only module formats
+ALL_FORMATS = list(FORMATS) + list(MODULE_FORMATS)
+
+def parse_formats(value: str) -> List[str]:
+    """--format value: one format, a comma-separated list, or 'all'."""
+    if value == "all":
+        return list(EXPORTERS)
+    formats = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in formats if name not in ALL_FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(
+            f"invalid format {', '.join(unknown) or repr(value)} (choose from {', '.join(ALL_FORMATS)}, or all)")
+    return list(dict.fromkeys(formats))
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Batch export TestKit profiles.")
-    parser.add_argument("--format", choices=["docker", "vagrant", "terraform", "wsb", "hyperv", "vmware"], required=True)
+    parser.add_argument("--format", type=parse_formats, required=True,
+                        help=f"Format, comma-separated formats or 'all' ({', '.join(ALL_FORMATS)}); several formats export into <output>/<format>/. "
+                             "docker-bake writes thin per-profile stages on a shared base plus one docker-bake.hcl; "
+                             "terraform-module writes one for_each Terraform module for the whole batch")
     parser.add_argument("--output", default="exports/batch", help="Output directory")
+    parser.add_argument("--input", "-i", metavar="FILE", help="Export a JSON Lines profile stream instead of the profiles tree ('-' for stdin)")
     parser.add_argument("--make", help="Filter by manufacturer (case-insensitive substring)")
     parser.add_argument("--os", help="Filter by OS name (case-insensitive substring)")
+    parser.add_argument("--where", help='Filter expression, e.g. \'ram_mb >= 8192 and gpu_vram_mb > 0 and os_target ~ "11"\'')
     parser.add_argument("--limit", type=int, help="Maximum number of profiles to export")
+    parser.add_argument("--no-store", action="store_true", help="Scan JSON files even if a packed profile store exists")
+    parser.add_argument("--db", nargs="?", const=DB_PATH, help="Filter via the SQLite hardware database (default: scripts/db/hardware.db)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Worker processes for concurrent export (default: 1)")
+    parser.add_argument("--dedupe", action="store_true", help="Export one artifact per distinct hardware configuration")
+    parser.add_argument("--no-cache", action="store_true", help="Re-render every profile, ignoring the export cache")
+    parser.add_argument("--changed-only", action="store_true", help="List only the artifacts whose content changed in this run")
+    parser.add_argument("--archive", help="Stream artifacts into this .tar.gz/.tgz/.tar/.zip instead of --output")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help="Only export shard I of N of the selection, split by a stable hash of the profile id (combine with merge_shards.py)")
+    add_arguments(parser)
     
-    args = parser.parse_args()
-    
-    # 1. Find all profiles
-    print("Scanning for profiles...")
-    all_files = find_profiles()
-    print(f"Found {len(all_files)} profile files.")
-    
-    # 2. Filter
-    print("Filtering...")
-    matches = filter_profiles(all_files, args.make, args.os)
-    print(f"Matched {len(matches)} profiles.")
-    
-    if args.limit and len(matches) > args.limit:
-        print(f"Limiting export to {args.limit} profiles.")
-        matches = matches[:args.limit]
-        
-    # 3. Export
-    if not os.path.exists(args.output):
-        os.makedirs(args.output)
+    args = parser.parse_args(argv)
+    if args.archive and not args.archive.lower().endswith(tuple(ARCHIVE_SUFFIXES)):
+        parser.error(f"--archive must end in one of: {', '.join(ARCHIVE_SUFFIXES)}")
+    if args.archive and args.changed_only:
+        parser.error("--changed-only applies to directory exports, not --archive")
+    if args.input and (args.db or args.no_store):
+        parser.error("--input cannot be combined with --db or --no-store")
+    try:
+        where = FilterExpression(args.where) if args.where else None
+    except FilterSyntaxError as e:
+        parser.error(f"--where: {e}")
+
+    with instrumented(args, "batch_export"), contextlib.ExitStack() as inputs:
+        try:
+            matches = select_profiles(args, where, inputs)
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"Error: {e}")
+            return
+
+        if args.limit:
+            print(f"Limiting export to {args.limit} profiles.")
+            matches = islice(matches, args.limit)
+
+        config_map = None
+        if args.dedupe:
+            config_map = {}
+            matches = dedupe_profiles(matches, config_map)
+
+        shard = None
+        if args.shard:
+            # After --limit/--dedupe, so every shard splits the same selection (by config id with --dedupe)
+            shard = args.shard.to_dict()
+            matches = take_shard(matches, args.shard, shard)
+
+        try:
+            export(args, matches, config_map, shard)
+        except ValueError as e:
+            # Malformed --input lines surface here, as the stream is read during export
+            print(f"Error: {e}")
+            sys.exit(1)
+
+def export(args, matches: Iterable[Profile], config_map: Optional[Dict[str, str]],
+           shard: Optional[Dict[str, Any]] = None) -> None:
+    """Step 3: exports the selected profiles into --archive or --output and reports the outcome.
+
+    Every profile is rendered for all requested formats as it goes by; with
+    several formats each one gets its own <output>/<format>/ subtree, cache
+    and manifest. `shard` (with --shard) is filled in by take_shard() as
+    the selection is read and stamped into every manifest.
+    """
+    formats = args.format
+    label = f"'{formats[0]}' format" if len(formats) == 1 else f"{len(formats)} formats ({', '.join(formats)})"
+    if args.archive:
+        archive_dir = os.path.dirname(args.archive)
+        if archive_dir and not os.path.exists(archive_dir):
+            os.makedirs(archive_dir)
+        print(f"Exporting to {label} into archive '{args.archive}'...")
+        with STATS.phase("export"):
+            counts = export_archive(matches, formats, args.archive, config_map, shard)
+        report_shard(shard)
+        for export_format, (total, success_count) in counts.items():
+            if len(formats) > 1:
+                print(f"\n[{export_format}]")
+            report_dedupe(total, config_map)
+            print(f"\nBatch Completed: {success_count}/{total} exported successfully.")
+        print(f"Archive: {args.archive}")
+        return
+
+    output_roots = {
+        export_format: os.path.join(args.output, export_format) if len(formats) > 1 else args.output
+        for export_format in formats
+    }
+    for output_root in output_roots.values():
+        if not os.path.exists(output_root):
+            os.makedirs(output_root)
         
-    print(f"Exporting {len(matches)} profiles to '{args.format}' format in '{args.output}'...")
+    print(f"Exporting to {label} in '{args.output}'...")
     
-    success_count = 0
-    for profile in matches:
-        try:
-            if args.format == "docker":
-                export_docker(profile, args.output)
-            elif args.format == "vagrant":
-                export_vagrant(profile, args.output)
-            elif args.format == "terraform":
-                export_terraform(profile, args.output)
-            elif args.format == "wsb":
-                export_wsb(profile, args.output)
-            elif args.format == "hyperv":
-                export_hyperv(profile, args.output)
-            elif args.format == "vmware":
-                export_vmware(profile, args.output)
-            
-            success_count += 1
-        except Exception as e:
-            print(f"Failed to export {profile.get('id')}: {e}")
-            
-    print(f"\nBatch Completed: {success_count}/{len(matches)} exported successfully.")
+    # Module formats collect entries as profiles stream past the per-profile export
+    profile_roots = {export_format: root for export_format, root in output_roots.items() if export_format not in MODULE_FORMATS}
+    module_results: Dict[str, List[Dict[str, Any]]] = {export_format: [] for export_format in formats if export_format in MODULE_FORMATS}
+    entries: Dict[str, Dict[str, Any]] = {export_format: {} for export_format in module_results}
+    if module_results:
+        matches = collect_modules(matches, module_results, entries)
+
+    with STATS.phase("cache"):
+        caches = {
+            export_format: {} if args.no_cache else load_export_cache(output_root, export_format)
+            for export_format, output_root in profile_roots.items()
+        }
+    with STATS.phase("export"):
+        results = export_multi(matches, profile_roots, args.jobs if profile_roots else 1, caches)
+    results.update(module_results)
+    report_shard(shard)
+    for export_format, output_root in output_roots.items():
+        format_results = results[export_format]
+        success_count = sum(1 for result in format_results if result["status"] == "ok")
+        cached_count = sum(1 for result in format_results if result.get("cached"))
+        changed = [path for result in format_results for path in result.get("changed", [])]
+        if export_format in profile_roots:
+            with STATS.phase("cache"):
+                save_export_cache(output_root, export_format, format_results)
+        with STATS.phase("write"):
+            # Batch-level files are rewritten only when their content changes, like the per-profile ones
+            changed_batch: List[str] = []
+            write_artifacts(output_root, batch_artifacts(format_results, export_format, entries.get(export_format)), changed_batch)
+            changed += [os.path.relpath(path, output_root) for path in changed_batch]
+        with STATS.phase("manifest"):
+            manifest_path = write_manifest(format_results, export_format, output_root, config_map, shard)
+
+        if len(formats) > 1:
+            print(f"\n[{export_format}]")
+        report_dedupe(len(format_results), config_map)
+        if args.changed_only:
+            print(f"\nChanged artifacts ({len(changed)}):")
+            for path in changed:
+                print(f" - {os.path.relpath(os.path.join(output_root, path), args.output)}")
+                
+        print(f"\nBatch Completed: {success_count}/{len(format_results)} exported successfully.")
+        print(f"Unchanged (cached): {cached_count}. Artifacts rewritten: {len(changed)}.")
+        print(f"Manifest: {manifest_path}")
+
+def report_shard(shard: Optional[Dict[str, Any]]) -> None:
+    if shard is not None:
+        print(f"Shard {shard['index']}/{shard['count']}: {shard['kept']} of {shard['selected']} selected profiles.")
+
+def report_dedupe(exported: int, config_map: Optional[Dict[str, str]]) -> None:
+    if config_map is not None:
+        print(f"Deduplicated {len(config_map)} profiles into {exported} hardware configurations.")
 
 if __name__ == "__main__":
     main()
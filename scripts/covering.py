@@ -0,0 +1,78 @@
+import itertools
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def covering_array(sizes: Sequence[int], strength: int) -> List[Tuple[int, ...]]:
+    """Rows of value indices in which every `strength`-way combination of values appears at least once.
+
+    Built with the deterministic IPOG strategy: start from the full product
+    of the first `strength` parameters, then add one parameter at a time,
+    extending existing rows with the value that covers the most missing
+    combinations (horizontal growth) and adding rows only for combinations
+    still uncovered (vertical growth). The same sizes always give the same
+    rows. With strength >= len(sizes) this is the full product.
+    """
+    n = len(sizes)
+    if strength < 1:
+        raise ValueError(f"Strength must be at least 1, got {strength}")
+    if strength >= n:
+        return list(itertools.product(*(range(size) for size in sizes)))
+
+    # Adding the largest parameters first keeps the array smaller
+    order = sorted(range(n), key=lambda p: (-sizes[p], p))
+    ordered = [sizes[p] for p in order]
+
+    rows: List[List[Optional[int]]] = [
+        list(combination) + [None] * (n - strength)
+        for combination in itertools.product(*(range(size) for size in ordered[:strength]))
+    ]
+
+    for i in range(strength, n):
+        groups = list(itertools.combinations(range(i), strength - 1))
+        uncovered = {
+            (group, values, value)
+            for group in groups
+            for values in itertools.product(*(range(ordered[p]) for p in group))
+            for value in range(ordered[i])
+        }
+
+        # Horizontal growth: give each row the value that covers the most missing tuples
+        for row in rows:
+            known = [group for group in groups if all(row[p] is not None for p in group)]
+            best_value, best_gain = 0, -1
+            for value in range(ordered[i]):
+                gain = sum(1 for group in known if (group, tuple(row[p] for p in group), value) in uncovered)
+                if gain > best_gain:
+                    best_value, best_gain = value, gain
+            row[i] = best_value
+            for group in known:
+                uncovered.discard((group, tuple(row[p] for p in group), best_value))
+
+        # Vertical growth: fill don't-care slots of existing rows, or add a row, for what is left
+        for group, values, value in sorted(uncovered):
+            candidates = [row for row in rows if row[i] == value]
+            if any(all(row[p] == v for p, v in zip(group, values)) for row in candidates):
+                continue  # Covered as a side effect of an earlier fill
+            for row in candidates:
+                if all(row[p] is None or row[p] == v for p, v in zip(group, values)):
+                    break
+            else:
+                row = [None] * n
+                row[i] = value
+                rows.append(row)
+            for p, v in zip(group, values):
+                row[p] = v
+
+    # Remaining don't-care slots take the first value; map columns back to the caller's order
+    position: Dict[int, int] = {p: k for k, p in enumerate(order)}
+    return [tuple(row[position[p]] or 0 for p in range(n)) for row in rows]
+
+
+def covers(rows: Sequence[Sequence[int]], sizes: Sequence[int], strength: int) -> bool:
+    """True if every `strength`-way combination of values appears in some row."""
+    for group in itertools.combinations(range(len(sizes)), min(strength, len(sizes))):
+        seen = {tuple(row[p] for p in group) for row in rows}
+        if len(seen) != math.prod(sizes[p] for p in group):
+            return False
+    return True
@@ -1,82 +1,194 @@
+import hashlib
 import json
 import os
+import re
 import argparse
+import sys
 from pathlib import Path
 
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 
-def generate_launch_script(output_dir: str, profile_id: str, commands: Dict[str, str], description: str) -> None:
-    """Generates cross-platform launch scripts (.ps1 and .sh)."""
-    
-    # PowerShell Script
-    ps1_content = f"""# Launch Script for {profile_id}
+try:
+    from generate_profiles import ProfileCatalog
+    from instrument import STATS, add_arguments, instrumented
+    from profile_model import Profile
+    from templates import Template
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.generate_profiles import ProfileCatalog
+    from scripts.instrument import STATS, add_arguments, instrumented
+    from scripts.profile_model import Profile
+    from scripts.templates import Template
+
+# Exporters take a parsed Profile or a profile dict in either layout
+ProfileLike = Union[Profile, Dict[str, Any]]
+
+# Bump when profile_record() or rendering changes in a way the template text does not show;
+# it is part of every export cache key, so cached artifacts are re-rendered.
+EXPORTER_VERSION = 1
+
+# Launch script templates shared by every format
+LAUNCH_PS1 = Template("""# Launch Script for {profile_id}
 # {description}
 Write-Host "Starting {profile_id} environment..." -ForegroundColor Cyan
-{commands['ps1']}
-"""
-    ps1_path = os.path.join(output_dir, "launch.ps1")
-    with open(ps1_path, 'w') as f:
-        f.write(ps1_content)
-        
-    # Bash Script
-    sh_content = f"""#!/bin/bash
+{commands}
+""")
+
+LAUNCH_SH = Template("""#!/bin/bash
 # Launch Script for {profile_id}
 # {description}
 echo "Starting {profile_id} environment..."
-{commands['sh']}
-"""
-    sh_path = os.path.join(output_dir, "launch.sh")
-    with open(sh_path, 'w') as f:
-        f.write(sh_content)
-    
-    # Make bash script executable
-    try:
-        os.chmod(sh_path, 0o755)
-    except:
-        pass
-        
-    print(f"Generated launch scripts: {ps1_path}, {sh_path}")
+{commands}
+""")
+
+# Map RAM (GB) to AWS instance types (simplified)
+INSTANCE_TYPE_MAP = {
+    1: "t2.micro",
+    2: "t2.small",
+    4: "t2.medium",
+    8: "t2.large",
+    16: "t2.xlarge"
+}
+DEFAULT_INSTANCE_TYPE = "t2.medium"
+
+def image_name(profile_id: str) -> str:
+    """Docker image tag / bake target name for a profile id.
+
+    Most ids are already valid. Ids with other characters (e.g.
+    "odroid-h3+-windows-11-v1") are sanitized and suffixed with a short hash
+    of the id, so two ids never map to the same name.
+    """
+    name = re.sub(r'[^a-z0-9_-]+', '-', profile_id.lower())
+    name = re.sub(r'-{2,}', '-', name).strip('-_')
+    if name != profile_id:
+        name = f"{name}-{hashlib.sha256(profile_id.encode('utf-8')).hexdigest()[:6]}"
+    return name
+
+def profile_record(profile: ProfileLike) -> Dict[str, Any]:
+    """Extracts every field the exporters use into one flat record.
+
+    Dicts in either layout are parsed into a Profile first, so this only
+    reads attributes.
+    """
+    if not isinstance(profile, Profile):
+        profile = Profile.from_dict(profile)
+    profile_id = profile.id
+    ram_mb = profile.ram_mb if profile.ram_mb is not None else 2048
+    cpu_cores = profile.cpu_cores if profile.cpu_cores is not None else 2
+    gpu_vram = profile.gpu_vram_mb if profile.gpu_vram_mb is not None else 0
+
+    # Convert RAM to GB for cloud instances
+    ram_gb = max(1, ram_mb // 1024)
+
+    return {
+        "profile_id": profile_id,
+        "make": profile.make,
+        "model": profile.model,
+        "os": profile.os_target or 'windows-10',
+        "cpu_cores": cpu_cores,
+        "ram_mb": ram_mb,
+        "gpu_vram_mb": gpu_vram,
+        "screen_resolution": profile.screen_resolution,
+        "ram_gb": ram_gb,
+        "instance_type": INSTANCE_TYPE_MAP.get(ram_gb, DEFAULT_INSTANCE_TYPE),
+        "tf_name": profile_id.replace('-', '_'),
+        "image_name": image_name(profile_id),
+        # Windows Sandbox supports vGPU (Enable/Disable)
+        "vgpu_enabled": "Enable" if gpu_vram > 0 else "Disable",
+        # Determine generation based on OS year/type if possible, default to 2 for modern validation
+        "generation": 2,
+    }
+
+class ExportFormat:
+    """One export target: its artifact template, launch commands and log label."""
+
+    def __init__(self, label: str, filename: str, template: str, commands: Dict[str, str], description: str):
+        self.label = label
+        self.filename = Template(filename)
+        self.template = Template(template)
+        self.commands = {shell: Template(command) for shell, command in commands.items()}
+        self.description = description
+        sources = [filename, template, description] + [commands[shell] for shell in sorted(commands)]
+        self.fingerprint = hashlib.sha256('\0'.join(sources).encode('utf-8')).hexdigest()
 
-def export_docker(profile: Dict[str, Any], output_dir: str) -> None:
-    """Generates a Dockerfile for the given profile."""
-    profile_id = profile.get('id', 'unknown')
-    dockerfile_content = f"""# TestKit Profile: {profile.get('make')} {profile.get('model')}
-# OS: {profile.get('os')}
-# Hardware: {profile.get('hardware', {}).get('cpu_count')} Cores, {profile.get('hardware', {}).get('ram_mb')}MB RAM
+    def cache_key(self, record: Dict[str, Any]) -> str:
+        """Content hash of everything this format's output depends on: the record, templates and exporter version."""
+        content = json.dumps(record, sort_keys=True) + self.fingerprint + str(EXPORTER_VERSION)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def render(self, record: Dict[str, Any]) -> List[Tuple[str, str, bool]]:
+        """(filename, content, executable) for the artifact and its launch scripts."""
+        profile_id = record['profile_id']
+        ps1 = {"profile_id": profile_id, "description": self.description, "commands": self.commands['ps1'].render(record)}
+        sh = {"profile_id": profile_id, "description": self.description, "commands": self.commands['sh'].render(record)}
+        return [
+            (self.filename.render(record), self.template.render(record), False),
+            ("launch.ps1", LAUNCH_PS1.render(ps1), False),
+            ("launch.sh", LAUNCH_SH.render(sh), True),
+        ]
+
+FORMATS: Dict[str, ExportFormat] = {}
+
+FORMATS["docker"] = ExportFormat(
+    label="Dockerfile",
+    filename="{profile_id}.Dockerfile",
+    template="""# TestKit Profile: {make} {model}
+# OS: {os}
+# Hardware: {cpu_cores} Cores, {ram_mb}MB RAM
 
 FROM mcr.microsoft.com/windows/servercore:ltsc2022
 
 # Set Environment Variables to simulate hardware specs
 ENV TESTKIT_PROFILE_ID="{profile_id}"
-ENV TESTKIT_MAKE="{profile.get('make')}"
-ENV TESTKIT_MODEL="{profile.get('model')}"
-ENV TESTKIT_CPU_CORES="{profile.get('hardware', {}).get('cpu_count')}"
-ENV TESTKIT_RAM_MB="{profile.get('hardware', {}).get('ram_mb')}"
-ENV TESTKIT_GPU_VRAM_MB="{profile.get('hardware', {}).get('gpu_vram_mb')}"
-ENV TESTKIT_RESOLUTION="{profile.get('hardware', {}).get('screen_resolution')}"
+ENV TESTKIT_MAKE="{make}"
+ENV TESTKIT_MODEL="{model}"
+ENV TESTKIT_CPU_CORES="{cpu_cores}"
+ENV TESTKIT_RAM_MB="{ram_mb}"
+ENV TESTKIT_GPU_VRAM_MB="{gpu_vram_mb}"
+ENV TESTKIT_RESOLUTION="{screen_resolution}"
 
 # Placeholder for actual simulation logic
 RUN echo "Initializing TestKit Environment for {profile_id}"
-"""
-    output_path = os.path.join(output_dir, f"{profile_id}.Dockerfile")
-    with open(output_path, 'w') as f:
-        f.write(dockerfile_content)
-    print(f"Exported Dockerfile: {output_path}")
-    
-    # Generate Launch Scripts
-    commands = {
-        'ps1': f'docker build -t testkit-{profile_id} -f {profile_id}.Dockerfile .\ndocker run -it --rm testkit-{profile_id}',
-        'sh': f'docker build -t testkit-{profile_id} -f {profile_id}.Dockerfile .\ndocker run -it --rm testkit-{profile_id}'
-    }
-    generate_launch_script(output_dir, profile_id, commands, "Builds and runs the Docker container")
+""",
+    commands={
+        'ps1': 'docker build -t testkit-{image_name} -f {profile_id}.Dockerfile .\ndocker run -it --rm testkit-{image_name}',
+        'sh': 'docker build -t testkit-{image_name} -f {profile_id}.Dockerfile .\ndocker run -it --rm testkit-{image_name}'
+    },
+    description="Builds and runs the Docker container",
+)
 
-def export_vagrant(profile: Dict[str, Any], output_dir: str) -> None:
-    """Generates a Vagrantfile for the given profile."""
-    profile_id = profile.get('id', 'unknown')
-    ram_mb = profile.get('hardware', {}).get('ram_mb', 2048)
-    cpu_cores = profile.get('hardware', {}).get('cpu_count', 2)
-    
-    vagrantfile_content = f"""# -*- mode: ruby -*-
+# Batch-only variant of "docker": a thin stage on the shared testkit-base image,
+# built through the docker-bake.hcl that batch_export.py writes next to it (see render_bake)
+FORMATS["docker-bake"] = ExportFormat(
+    label="Dockerfile (bake stage)",
+    filename="{profile_id}.Dockerfile",
+    template="""# TestKit Profile: {make} {model}
+# OS: {os}
+# Hardware: {cpu_cores} Cores, {ram_mb}MB RAM
+# Bake target "{image_name}"; the testkit-base image comes from ../Dockerfile.base
+
+FROM testkit-base
+
+# Set Environment Variables to simulate hardware specs
+ENV TESTKIT_PROFILE_ID="{profile_id}" \\
+    TESTKIT_MAKE="{make}" \\
+    TESTKIT_MODEL="{model}" \\
+    TESTKIT_CPU_CORES="{cpu_cores}" \\
+    TESTKIT_RAM_MB="{ram_mb}" \\
+    TESTKIT_GPU_VRAM_MB="{gpu_vram_mb}" \\
+    TESTKIT_RESOLUTION="{screen_resolution}"
+""",
+    commands={
+        'ps1': 'Set-Location (Join-Path $PSScriptRoot "..")\ndocker buildx bake {image_name}\ndocker run -it --rm testkit-{image_name}',
+        'sh': 'cd "$(dirname "$0")/.."\ndocker buildx bake {image_name}\ndocker run -it --rm testkit-{image_name}'
+    },
+    description="Builds the profile's bake target and runs the container",
+)
+
+FORMATS["vagrant"] = ExportFormat(
+    label="Vagrantfile",
+    filename="{profile_id}.Vagrantfile",
+    template="""# -*- mode: ruby -*-
 # vi: set ft=ruby :
 
 Vagrant.configure("2") do |config|
@@ -93,40 +205,18 @@ Vagrant.configure("2") do |config|
     SHELL
   end
 end
-"""
-    output_path = os.path.join(output_dir, f"{profile_id}.Vagrantfile")
-    with open(output_path, 'w') as f:
-        f.write(vagrantfile_content)
-    print(f"Exported Vagrantfile: {output_path}")
-    
-    # Generate Launch Scripts
-    commands = {
+""",
+    commands={
         'ps1': 'vagrant up\nvagrant ssh',
         'sh': 'vagrant up\nvagrant ssh'
-    }
-    generate_launch_script(output_dir, profile_id, commands, "Provisions and connects to the Vagrant VM")
-
-def export_terraform(profile: Dict[str, Any], output_dir: str) -> None:
-    """Generates a Terraform configuration for the given profile."""
-    profile_id = profile.get('id', 'unknown')
-    ram_mb = profile.get('hardware', {}).get('ram_mb', 2048)
-    cpu_cores = profile.get('hardware', {}).get('cpu_count', 2)
-    os_target = profile.get('os', 'windows-10')
-    
-    # Convert RAM to GB for cloud instances
-    ram_gb = max(1, ram_mb // 1024)
-    
-    # Map to AWS instance types (simplified)
-    instance_type_map = {
-        1: "t2.micro",
-        2: "t2.small",
-        4: "t2.medium",
-        8: "t2.large",
-        16: "t2.xlarge"
-    }
-    instance_type = instance_type_map.get(ram_gb, "t2.medium")
-    
-    terraform_content = f"""# TestKit Profile: {profile_id}
+    },
+    description="Provisions and connects to the Vagrant VM",
+)
+
+FORMATS["terraform"] = ExportFormat(
+    label="Terraform",
+    filename="{profile_id}.tf",
+    template="""# TestKit Profile: {profile_id}
 # Generated Terraform configuration for cloud deployment
 
 terraform {{
@@ -148,7 +238,7 @@ variable "aws_region" {{
   default     = "us-east-1"
 }}
 
-resource "aws_instance" "testkit_{profile_id.replace('-', '_')}" {{
+resource "aws_instance" "testkit_{tf_name}" {{
   ami           = data.aws_ami.windows.id
   instance_type = "{instance_type}"
   
@@ -157,7 +247,7 @@ resource "aws_instance" "testkit_{profile_id.replace('-', '_')}" {{
     TestKitProfileID   = "{profile_id}"
     TestKitCPUCores    = "{cpu_cores}"
     TestKitRAM_MB      = "{ram_mb}"
-    TestKitOS          = "{os_target}"
+    TestKitOS          = "{os}"
   }}
   
   user_data = <<-EOT
@@ -181,65 +271,42 @@ data "aws_ami" "windows" {{
 }}
 
 output "instance_id" {{
-  value = aws_instance.testkit_{profile_id.replace('-', '_')}.id
+  value = aws_instance.testkit_{tf_name}.id
 }}
 
 output "public_ip" {{
-  value = aws_instance.testkit_{profile_id.replace('-', '_')}.public_ip
+  value = aws_instance.testkit_{tf_name}.public_ip
 }}
-"""
-    output_path = os.path.join(output_dir, f"{profile_id}.tf")
-    with open(output_path, 'w') as f:
-        f.write(terraform_content)
-    print(f"Exported Terraform: {output_path}")
-    
-    # Generate Launch Scripts
-    commands = {
+""",
+    commands={
         'ps1': 'terraform init\nterraform apply -auto-approve',
         'sh': 'terraform init\nterraform apply -auto-approve'
-    }
-    generate_launch_script(output_dir, profile_id, commands, "Initializes and applies Terraform configuration")
-
-def export_wsb(profile: Dict[str, Any], output_dir: str) -> None:
-    """Generates a Windows Sandbox configuration (.wsb) for the given profile."""
-    profile_id = profile.get('id', 'unknown')
-    ram_mb = profile.get('hardware', {}).get('ram_mb', 2048)
-    cpu_cores = profile.get('hardware', {}).get('cpu_count', 2)
-    gpu_vram = profile.get('hardware', {}).get('gpu_vram_mb', 0)
-    
-    # Windows Sandbox supports vGPU (Enable/Disable)
-    vgpu_enabled = "Enable" if gpu_vram > 0 else "Disable"
-    
-    wsb_content = f"""<Configuration>
+    },
+    description="Initializes and applies Terraform configuration",
+)
+
+FORMATS["wsb"] = ExportFormat(
+    label="Windows Sandbox",
+    filename="{profile_id}.wsb",
+    template="""<Configuration>
   <VGpu>{vgpu_enabled}</VGpu>
   <MemoryInMB>{ram_mb}</MemoryInMB>
   <LogonCommand>
-    <Command>powershell -ExecutionPolicy Bypass -Command "Write-Host 'TestKit Profile: {profile_id}' -ForegroundColor Green; [Environment]::SetEnvironmentVariable('TESTKIT_PROFILE_ID', '{profile_id}', 'Machine'); [Environment]::SetEnvironmentVariable('TESTKIT_CPU_CORES', '{cpu_cores}', 'Machine'); [Environment]::SetEnvironmentVariable('TESTKIT_RAM_MB', '{ram_mb}', 'Machine'); [Environment]::SetEnvironmentVariable('TESTKIT_GPU_VRAM_MB', '{gpu_vram}', 'Machine'); Write-Host 'Environment configured for testing.' -ForegroundColor Cyan"</Command>
+    <Command>powershell -ExecutionPolicy Bypass -Command "Write-Host 'TestKit Profile: {profile_id}' -ForegroundColor Green; [Environment]::SetEnvironmentVariable('TESTKIT_PROFILE_ID', '{profile_id}', 'Machine'); [Environment]::SetEnvironmentVariable('TESTKIT_CPU_CORES', '{cpu_cores}', 'Machine'); [Environment]::SetEnvironmentVariable('TESTKIT_RAM_MB', '{ram_mb}', 'Machine'); [Environment]::SetEnvironmentVariable('TESTKIT_GPU_VRAM_MB', '{gpu_vram_mb}', 'Machine'); Write-Host 'Environment configured for testing.' -ForegroundColor Cyan"</Command>
   </LogonCommand>
 </Configuration>
-"""
-    output_path = os.path.join(output_dir, f"{profile_id}.wsb")
-    with open(output_path, 'w') as f:
-        f.write(wsb_content)
-    print(f"Exported Windows Sandbox: {output_path}")
-    
-    # Generate Launch Scripts
-    commands = {
-        'ps1': f'Start-Process "{profile_id}.wsb"',
-        'sh': f'cmd.exe /c start {profile_id}.wsb'
-    }
-    generate_launch_script(output_dir, profile_id, commands, "Launches Windows Sandbox")
+""",
+    commands={
+        'ps1': 'Start-Process "{profile_id}.wsb"',
+        'sh': 'cmd.exe /c start {profile_id}.wsb'
+    },
+    description="Launches Windows Sandbox",
+)
 
-def export_hyperv(profile: Dict[str, Any], output_dir: str) -> None:
-    """Generates a Hyper-V VM creation script (.ps1) for the given profile."""
-    profile_id = profile.get('id', 'unknown')
-    ram_mb = profile.get('hardware', {}).get('ram_mb', 2048)
-    cpu_cores = profile.get('hardware', {}).get('cpu_count', 2)
-    
-    # Determine generation based on OS year/type if possible, default to 2 for modern validation
-    generation = 2 
-    
-    hyperv_content = f"""# TestKit Hyper-V Creator for Profile: {profile_id}
+FORMATS["hyperv"] = ExportFormat(
+    label="Hyper-V Setup Script",
+    filename="{profile_id}_setup.ps1",
+    template="""# TestKit Hyper-V Creator for Profile: {profile_id}
 # Requires Administrator privileges and Hyper-V Module
 
 $VMName = "TestKit-{profile_id}"
@@ -269,27 +336,19 @@ if (Get-VM -Name $VMName -ErrorAction SilentlyContinue) {{
     Write-Host "VM '$VMName' created successfully." -ForegroundColor Green
     Write-Host "To install an OS, mount an ISO: Set-VMDvdDrive -VMName '$VMName' -Path 'C:\\Path\\To\\Install.iso'" -ForegroundColor Yellow
 }}
-"""
-    output_path = os.path.join(output_dir, f"{profile_id}_setup.ps1")
-    with open(output_path, 'w') as f:
-        f.write(hyperv_content)
-    print(f"Exported Hyper-V Setup Script: {output_path}")
-
-    # Generate Launch Scripts (To run the setup logic)
-    commands = {
-        'ps1': f'powershell -ExecutionPolicy Bypass -File "{profile_id}_setup.ps1"',
-        'sh': f'echo "Hyper-V export requires PowerShell. Please run {profile_id}_setup.ps1 directly."'
-    }
-    generate_launch_script(output_dir, profile_id, commands, "Creates the Hyper-V Virtual Machine")
-
+""",
+    commands={
+        'ps1': 'powershell -ExecutionPolicy Bypass -File "{profile_id}_setup.ps1"',
+        'sh': 'echo "Hyper-V export requires PowerShell. Please run {profile_id}_setup.ps1 directly."'
+    },
+    description="Creates the Hyper-V Virtual Machine",
+)
 
-def export_vmware(profile: Dict[str, Any], output_dir: str) -> None:
-    """Generates a VMware Workstation/Player configuration (.vmx) for the given profile."""
-    profile_id = profile.get('id', 'unknown')
-    ram_mb = profile.get('hardware', {}).get('ram_mb', 2048)
-    cpu_cores = profile.get('hardware', {}).get('cpu_count', 2)
-    
-    vmx_content = f"""# TestKit Profile: {profile_id}
+# Assumes 'vmrun' is in PATH or file association works
+FORMATS["vmware"] = ExportFormat(
+    label="VMware Config",
+    filename="{profile_id}.vmx",
+    template="""# TestKit Profile: {profile_id}
 .encoding = "UTF-8"
 displayname = "TestKit-{profile_id}"
 guestos = "windows9-64"
@@ -310,52 +369,345 @@ sound.present = "TRUE"
 sound.virtualDev = "hdaudio"
 sound.fileName = "-1"
 sound.autodetect = "TRUE"
+""",
+    commands={
+        'ps1': 'Start-Process "{profile_id}.vmx"',
+        'sh': 'vmrun start "{profile_id}.vmx"'
+    },
+    description="Launches VMware Workstation/Player",
+)
+
+# Shared files of a docker-bake batch, written at the batch output root
+DOCKER_BASE = """# TestKit shared base image: every profile stage in docker-bake.hcl builds FROM it
+ARG BASE_IMAGE=mcr.microsoft.com/windows/servercore:ltsc2022
+FROM ${BASE_IMAGE}
+
+# Placeholder for actual simulation logic, run once for the whole batch
+RUN echo "Initializing TestKit Environment"
 """
-    output_path = os.path.join(output_dir, f"{profile_id}.vmx")
-    with open(output_path, 'w') as f:
-        f.write(vmx_content)
-    print(f"Exported VMware Config: {output_path}")
-
-    # Generate Launch Scripts
-    # Assumes 'vmrun' is in PATH or file association works
-    commands = {
-        'ps1': f'Start-Process "{profile_id}.vmx"',
-        'sh': f'vmrun start "{profile_id}.vmx"' 
+
+BAKE_HEADER = Template("""# TestKit batch build: {count} profile targets on one shared base image.
+# Generated by batch_export.py --format docker-bake; regenerate instead of editing.
+#
+#   docker buildx bake                         build every profile concurrently
+#   docker buildx bake <target>                build one profile
+#   docker buildx bake --print                 resolve the build graph without building
+#   BASE_IMAGE=busybox docker buildx bake      build on a Linux host to check the stages
+
+variable "BASE_IMAGE" {{
+  default = "mcr.microsoft.com/windows/servercore:ltsc2022"
+}}
+
+group "default" {{
+  targets = [
+{targets}
+  ]
+}}
+
+target "testkit-base" {{
+  dockerfile = "Dockerfile.base"
+  args = {{
+    BASE_IMAGE = BASE_IMAGE
+  }}
+  tags = ["testkit-base"]
+}}
+
+# Profile stages resolve "FROM testkit-base" to the target above, so it is built once and shared
+target "_profile" {{
+  contexts = {{
+    "testkit-base" = "target:testkit-base"
+  }}
+}}
+""")
+
+BAKE_TARGET = Template("""
+target {name} {{
+  inherits = ["_profile"]
+  dockerfile = {dockerfile}
+  tags = [{tag}]
+}}
+""")
+
+def hcl_string(value: str) -> str:
+    """A quoted HCL string literal; ${ and %{ would otherwise start template interpolation."""
+    escaped = json.dumps(value)[1:-1].replace('${', '$${').replace('%{', '%%{')
+    return f'"{escaped}"'
+
+def render_bake(dockerfiles: List[Tuple[str, str]]) -> List[Tuple[str, str, bool]]:
+    """Dockerfile.base and docker-bake.hcl for (profile id, Dockerfile path relative to the batch root) pairs.
+
+    Targets are listed in profile id order, so the bake file does not depend
+    on selection order and a merged sharded export matches an unsharded one.
+    """
+    dockerfiles = sorted(dockerfiles)
+    names = [image_name(profile_id) for profile_id, _ in dockerfiles]
+    targets = [
+        BAKE_TARGET.render({
+            "name": hcl_string(name),
+            "dockerfile": hcl_string(path.replace(os.sep, '/')),
+            "tag": hcl_string(f"testkit-{name}"),
+        })
+        for name, (_, path) in zip(names, dockerfiles)
+    ]
+    header = BAKE_HEADER.render({
+        "count": len(dockerfiles),
+        "targets": ",\n".join(f"    {hcl_string(name)}" for name in names),
+    })
+    return [
+        ("Dockerfile.base", DOCKER_BASE, False),
+        ("docker-bake.hcl", header + "".join(targets), False),
+    ]
+
+# Batch-only Terraform root module: one for_each instance resource over every profile
+TERRAFORM_MODULE = Template("""# TestKit lab: one aws_instance per profile in profiles.auto.tfvars.json ({count} profiles)
+# Generated by batch_export.py --format terraform-module; regenerate instead of editing.
+#
+#   terraform init && terraform apply                                provision the whole lab in one run
+#   terraform apply -parallelism=50                                  raise Terraform's concurrency (default 10)
+#   terraform apply -target='aws_instance.testkit["<profile-id>"]'   provision one profile
+
+terraform {{
+  required_providers {{
+    aws = {{
+      source  = "hashicorp/aws"
+      version = "~> 5.0"
+    }}
+  }}
+}}
+
+provider "aws" {{
+  region = var.aws_region
+}}
+
+variable "aws_region" {{
+  description = "AWS region for deployment"
+  type        = string
+  default     = "us-east-1"
+}}
+
+variable "profiles" {{
+  description = "TestKit profiles to provision, keyed by profile id"
+  type = map(object({{
+    make      = string
+    model     = string
+    os        = string
+    cpu_cores = number
+    ram_mb    = number
+    ram_gb    = number
+  }}))
+}}
+
+variable "instance_types" {{
+  description = "Instance type by RAM in GB; other sizes get default_instance_type"
+  type        = map(string)
+  default = {{
+{instance_types}
+  }}
+}}
+
+variable "default_instance_type" {{
+  description = "Instance type for RAM sizes missing from instance_types"
+  type        = string
+  default     = "{default_instance_type}"
+}}
+
+# Looked up once for the whole lab
+data "aws_ami" "windows" {{
+  most_recent = true
+  owners      = ["amazon"]
+
+  filter {{
+    name   = "name"
+    values = ["Windows_Server-2019-English-Full-Base-*"]
+  }}
+}}
+
+resource "aws_instance" "testkit" {{
+  for_each = var.profiles
+
+  ami           = data.aws_ami.windows.id
+  instance_type = lookup(var.instance_types, tostring(each.value.ram_gb), var.default_instance_type)
+
+  tags = {{
+    Name               = "TestKit-${{each.key}}"
+    TestKitProfileID   = each.key
+    TestKitCPUCores    = tostring(each.value.cpu_cores)
+    TestKitRAM_MB      = tostring(each.value.ram_mb)
+    TestKitOS          = each.value.os
+  }}
+
+  user_data = <<-EOT
+    <powershell>
+    Write-Host "Initializing TestKit Profile: ${{each.key}}"
+    [Environment]::SetEnvironmentVariable("TESTKIT_PROFILE_ID", "${{each.key}}", "Machine")
+    [Environment]::SetEnvironmentVariable("TESTKIT_CPU_CORES", "${{each.value.cpu_cores}}", "Machine")
+    [Environment]::SetEnvironmentVariable("TESTKIT_RAM_MB", "${{each.value.ram_mb}}", "Machine")
+    </powershell>
+  EOT
+}}
+
+output "instance_ids" {{
+  value = {{ for id, instance in aws_instance.testkit : id => instance.id }}
+}}
+
+output "public_ips" {{
+  value = {{ for id, instance in aws_instance.testkit : id => instance.public_ip }}
+}}
+""")
+
+TERRAFORM_MODULE_COMMANDS = 'terraform init\nterraform apply -auto-approve'
+
+def terraform_entry(record: Dict[str, Any]) -> Dict[str, Any]:
+    """A profile's value in the module's `profiles` map."""
+    return {
+        "make": record["make"],
+        "model": record["model"],
+        "os": record["os"],
+        "cpu_cores": record["cpu_cores"],
+        "ram_mb": record["ram_mb"],
+        "ram_gb": record["ram_gb"],
     }
-    generate_launch_script(output_dir, profile_id, commands, "Launches VMware Workstation/Player")
 
+def render_terraform_module(entries: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str, bool]]:
+    """main.tf, profiles.auto.tfvars.json and launch scripts for {profile id: terraform_entry()}."""
+    instance_types = "\n".join(f'    "{ram_gb}" = "{instance_type}"' for ram_gb, instance_type in sorted(INSTANCE_TYPE_MAP.items()))
+    description = f"Initializes and applies the Terraform module for {len(entries)} profiles"
+    launch = {"profile_id": "testkit-lab", "description": description, "commands": TERRAFORM_MODULE_COMMANDS}
+    return [
+        ("main.tf", TERRAFORM_MODULE.render({
+            "count": len(entries),
+            "instance_types": instance_types,
+            "default_instance_type": DEFAULT_INSTANCE_TYPE,
+        }), False),
+        ("profiles.auto.tfvars.json", json.dumps({"profiles": entries}, indent=2, sort_keys=True) + "\n", False),
+        ("launch.ps1", LAUNCH_PS1.render(launch), False),
+        ("launch.sh", LAUNCH_SH.render(launch), True),
+    ]
+
+# Batch-only formats rendered from the whole selection at once: name -> (per-profile entry, renderer)
+MODULE_FORMATS: Dict[str, Tuple[Callable[[Dict[str, Any]], Any], Callable[[Dict[str, Any]], List[Tuple[str, str, bool]]]]] = {
+    "terraform-module": (terraform_entry, render_terraform_module),
+}
+
+def write_if_changed(path: str, content: str) -> bool:
+    """Writes content unless the file already holds exactly it, so unchanged files keep their mtime."""
+    try:
+        with open(path, 'r') as f:
+            if f.read() == content:
+                STATS.count("files_unchanged")
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    with open(path, 'w') as f:
+        f.write(content)
+    STATS.count("files_written")
+    STATS.count("bytes_written", len(content))
+    return True
+
+def write_artifacts(output_dir: str, artifacts: List[Tuple[str, str, bool]], changed: Optional[List[str]] = None) -> List[str]:
+    """Writes rendered artifacts into output_dir, skipping identical files. Returns the paths.
+
+    Paths whose content actually changed are appended to `changed` if given.
+    """
+    paths = []
+    for filename, content, executable in artifacts:
+        path = os.path.join(output_dir, filename)
+        if write_if_changed(path, content) and changed is not None:
+            changed.append(path)
+        if executable:
+            # Make bash script executable
+            try:
+                os.chmod(path, 0o755)
+            except OSError:
+                pass
+        paths.append(path)
+    return paths
+
+def export_profile(profile: ProfileLike, export_format: str, output_dir: str, verbose: bool = True) -> List[str]:
+    """Renders a profile in one format and writes it to output_dir. Returns the paths written."""
+    spec = FORMATS[export_format]
+    with STATS.phase("render"):
+        artifacts = spec.render(profile_record(profile))
+    with STATS.phase("write"):
+        paths = write_artifacts(output_dir, artifacts)
+    if verbose:
+        print(f"Exported {spec.label}: {paths[0]}")
+        print(f"Generated launch scripts: {paths[1]}, {paths[2]}")
+    return paths
 
+def generate_launch_script(output_dir: str, profile_id: str, commands: Dict[str, str], description: str) -> List[str]:
+    """Generates cross-platform launch scripts (.ps1 and .sh). Returns the paths written."""
+    paths = write_artifacts(output_dir, [
+        ("launch.ps1", LAUNCH_PS1.render({"profile_id": profile_id, "description": description, "commands": commands['ps1']}), False),
+        ("launch.sh", LAUNCH_SH.render({"profile_id": profile_id, "description": description, "commands": commands['sh']}), True),
+    ])
+    print(f"Generated launch scripts: {paths[0]}, {paths[1]}")
+    return paths
+
+def export_docker(profile: ProfileLike, output_dir: str) -> List[str]:
+    """Generates a Dockerfile for the given profile. Returns the paths written."""
+    return export_profile(profile, "docker", output_dir)
+
+def export_vagrant(profile: ProfileLike, output_dir: str) -> List[str]:
+    """Generates a Vagrantfile for the given profile. Returns the paths written."""
+    return export_profile(profile, "vagrant", output_dir)
+
+def export_terraform(profile: ProfileLike, output_dir: str) -> List[str]:
+    """Generates a Terraform configuration for the given profile. Returns the paths written."""
+    return export_profile(profile, "terraform", output_dir)
+
+def export_wsb(profile: ProfileLike, output_dir: str) -> List[str]:
+    """Generates a Windows Sandbox configuration (.wsb) for the given profile. Returns the paths written."""
+    return export_profile(profile, "wsb", output_dir)
+
+def export_hyperv(profile: ProfileLike, output_dir: str) -> List[str]:
+    """Generates a Hyper-V VM creation script (.ps1) for the given profile. Returns the paths written."""
+    return export_profile(profile, "hyperv", output_dir)
+
+def export_vmware(profile: ProfileLike, output_dir: str) -> List[str]:
+    """Generates a VMware Workstation/Player configuration (.vmx) for the given profile. Returns the paths written."""
+    return export_profile(profile, "vmware", output_dir)
+
+# Format name -> exporter, shared by export.py and batch_export.py
+EXPORTERS: Dict[str, Callable[[ProfileLike, str], List[str]]] = {
+    "docker": export_docker,
+    "vagrant": export_vagrant,
+    "terraform": export_terraform,
+    "wsb": export_wsb,
+    "hyperv": export_hyperv,
+    "vmware": export_vmware,
+}
 
 def main():
     parser = argparse.ArgumentParser(description="Export TestKit profiles to various formats.")
-    parser.add_argument("--profile", help="Path to a specific profile JSON file", required=True)
-    parser.add_argument("--format", choices=["docker", "vagrant", "terraform", "wsb", "hyperv", "vmware"], required=True, help="Export format")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--profile", help="Path to a specific profile JSON file")
+    source.add_argument("--id", help="Profile id resolved directly from laptops.json (no profiles/ tree needed)")
+    parser.add_argument("--format", choices=list(EXPORTERS), required=True, help="Export format")
     parser.add_argument("--output", default="exports", help="Output directory")
+    add_arguments(parser)
     
     args = parser.parse_args()
     
     if not os.path.exists(args.output):
         os.makedirs(args.output)
         
-    try:
-        with open(args.profile, 'r') as f:
-            profile_data = json.load(f)
-            
-        if args.format == "docker":
-            export_docker(profile_data, args.output)
-        elif args.format == "vagrant":
-            export_vagrant(profile_data, args.output)
-        elif args.format == "terraform":
-            export_terraform(profile_data, args.output)
-        elif args.format == "wsb":
-            export_wsb(profile_data, args.output)
-        elif args.format == "hyperv":
-            export_hyperv(profile_data, args.output)
-        elif args.format == "vmware":
-            export_vmware(profile_data, args.output)
-            
-    except Exception as e:
-        print(f"Error exporting profile: {e}")
+    with instrumented(args, "export"):
+        try:
+            with STATS.phase("load"):
+                if args.id:
+                    profile_data = ProfileCatalog().get(args.id)
+                    if profile_data is None:
+                        print(f"Error: No profile with id '{args.id}' in the hardware database.")
+                        sys.exit(1)
+                else:
+                    with open(args.profile, 'r') as f:
+                        profile_data = json.load(f)
+                
+            EXPORTERS[args.format](Profile.from_dict(profile_data, source=args.profile), args.output)
+
+        except Exception as e:
+            print(f"Error exporting profile: {e}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,322 @@
+import ast
+import operator
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:
+    # Pure-Python bytearray masks are used instead
+    np = None
+
+try:
+    from profile_store import COLUMNS, CONFIG_COLUMNS, MISSING, ProfileStore, _decode_number
+    from profile_model import Profile
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.profile_store import COLUMNS, CONFIG_COLUMNS, MISSING, ProfileStore, _decode_number
+    from scripts.profile_model import Profile
+
+# Expression field aliases, matching the CLI names used elsewhere
+FIELD_ALIASES = {"os": "os_target", "manufacturer": "make"}
+FIELD_KINDS: Dict[str, str] = {name: kind for name, (_, kind) in COLUMNS.items() if name != "dir"}
+FIELD_KINDS["id"] = "str"
+SECTIONS = ("metadata", "hardware", "environment", "software")
+
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+SUBSTRING_OPS = ("~", "!~")
+
+_TOKEN = re.compile(r'''\s*(?:
+    (?P<number>-?\d+(?:\.\d+)?)(?![\w.])
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op>==|!=|<=|>=|!~|[<>~=()])
+  | (?P<word>[A-Za-z_][\w.\-]*)
+)''', re.VERBOSE)
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+def tokenize(source: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    pos = 0
+    source = source.rstrip()
+    while pos < len(source):
+        match = _TOKEN.match(source, pos)
+        if not match or match.end() == pos:
+            raise FilterSyntaxError(f"Unexpected character at position {pos}: {source[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "number":
+            tokens.append(("value", float(text) if "." in text else int(text)))
+        elif kind == "string":
+            tokens.append(("value", ast.literal_eval(text)))
+        elif kind == "op":
+            tokens.append(("op", "==" if text == "=" else text))
+        elif text.lower() in ("and", "or", "not"):
+            tokens.append(("keyword", text.lower()))
+        else:
+            tokens.append(("word", text))
+        pos = match.end()
+    return tokens
+
+
+def field_value(profile: Union[Profile, Dict[str, Any]], field: str) -> Any:
+    """Reads a field from a Profile or a dict in either layout (flat or metadata/hardware/...); None if absent."""
+    if isinstance(profile, Profile):
+        return getattr(profile, field)
+    if field in profile:
+        return profile[field]
+    for section in SECTIONS:
+        value = (profile.get(section) or {}).get(field)
+        if value is not None:
+            return value
+    return None
+
+
+def value_predicate(kind: str, op: str, value: Any) -> Callable[[Any], bool]:
+    """Predicate over one decoded field value. Missing values (None) never match."""
+    if op in SUBSTRING_OPS:
+        needle = str(value).lower()
+        if op == "~":
+            return lambda v: v is not None and needle in str(v).lower()
+        return lambda v: v is not None and needle not in str(v).lower()
+    compare = COMPARISONS[op]
+    if kind == "str":
+        target = str(value).lower()
+        return lambda v: v is not None and compare(str(v).lower(), target)
+    return lambda v: v is not None and compare(v, value)
+
+
+class FilterExpression:
+    """A filter such as `ram_mb >= 8192 and gpu_vram_mb > 0 and os ~ "11"`, parsed once.
+
+    Comparisons are `field OP value` with OP one of == != < <= > >= (numeric
+    fields; == and != also compare text case-insensitively) or ~ / !~ (case-
+    insensitive substring). They combine with and, or, not and parentheses.
+    The same compiled expression can test a Profile or profile dict
+    (matches), select rows of a packed store with vectorized masks (rows),
+    or become an SQL WHERE clause (to_sql). All three treat a comparison
+    with a missing value as false, so `not gpu_vram_mb > 4096` keeps the
+    profiles that have no VRAM value.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._tokens = tokenize(source)
+        self._pos = 0
+        if not self._tokens:
+            raise FilterSyntaxError("Empty filter expression")
+        self.tree = self._parse_or()
+        if self._pos != len(self._tokens):
+            raise FilterSyntaxError(f"Unexpected {self._tokens[self._pos][1]!r} in filter expression")
+        self.fields = sorted(self._fields(self.tree))
+        self.matches: Callable[[Dict[str, Any]], bool] = self._compile(self.tree)
+
+    # Parsing: or_expr := and_expr ("or" and_expr)*, and_expr := not_expr ("and" not_expr)*,
+    # not_expr := "not" not_expr | "(" or_expr ")" | field OP value
+
+    def _peek(self) -> Optional[Tuple[str, Any]]:
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _take(self) -> Tuple[str, Any]:
+        token = self._peek()
+        if token is None:
+            raise FilterSyntaxError("Filter expression ends unexpectedly")
+        self._pos += 1
+        return token
+
+    def _parse_or(self) -> Tuple[Any, ...]:
+        terms = [self._parse_and()]
+        while self._peek() == ("keyword", "or"):
+            self._pos += 1
+            terms.append(self._parse_and())
+        return terms[0] if len(terms) == 1 else ("or", terms)
+
+    def _parse_and(self) -> Tuple[Any, ...]:
+        terms = [self._parse_not()]
+        while self._peek() == ("keyword", "and"):
+            self._pos += 1
+            terms.append(self._parse_not())
+        return terms[0] if len(terms) == 1 else ("and", terms)
+
+    def _parse_not(self) -> Tuple[Any, ...]:
+        token = self._take()
+        if token == ("keyword", "not"):
+            return ("not", self._parse_not())
+        if token == ("op", "("):
+            tree = self._parse_or()
+            if self._take() != ("op", ")"):
+                raise FilterSyntaxError("Missing closing parenthesis")
+            return tree
+        if token[0] != "word":
+            raise FilterSyntaxError(f"Expected a field name, got {token[1]!r}")
+
+        field = FIELD_ALIASES.get(token[1], token[1])
+        if field not in FIELD_KINDS:
+            raise FilterSyntaxError(f"Unknown field '{token[1]}' (expected one of {', '.join(sorted(FIELD_KINDS))})")
+        kind = FIELD_KINDS[field]
+        op_token = self._take()
+        if op_token[0] != "op" or (op_token[1] not in COMPARISONS and op_token[1] not in SUBSTRING_OPS):
+            raise FilterSyntaxError(f"Expected a comparison operator after '{token[1]}', got {op_token[1]!r}")
+        op = op_token[1]
+        value_token = self._take()
+        if value_token[0] == "word" and kind == "str":
+            value = value_token[1]  # Bare words are accepted as text values
+        elif value_token[0] == "value":
+            value = value_token[1]
+        else:
+            raise FilterSyntaxError(f"Expected a value after '{token[1]} {op}', got {value_token[1]!r}")
+
+        if op not in SUBSTRING_OPS:
+            if kind == "int" and not isinstance(value, (int, float)):
+                raise FilterSyntaxError(f"'{field}' is numeric; compare it with a number or use ~")
+            if kind == "str" and op not in ("==", "!="):
+                raise FilterSyntaxError(f"'{field}' is text; use ==, != or ~")
+        return ("cmp", field, op, value)
+
+    def _fields(self, tree: Tuple[Any, ...]) -> set:
+        if tree[0] == "cmp":
+            return {tree[1]}
+        if tree[0] == "not":
+            return self._fields(tree[1])
+        return set().union(*(self._fields(term) for term in tree[1]))
+
+    # Per-profile evaluation
+
+    def _compile(self, tree: Tuple[Any, ...]) -> Callable[[Dict[str, Any]], bool]:
+        if tree[0] == "cmp":
+            _, field, op, value = tree
+            predicate = value_predicate(FIELD_KINDS[field], op, value)
+            return lambda profile: predicate(field_value(profile, field))
+        if tree[0] == "not":
+            inner = self._compile(tree[1])
+            return lambda profile: not inner(profile)
+        terms = [self._compile(term) for term in tree[1]]
+        if tree[0] == "and":
+            return lambda profile: all(term(profile) for term in terms)
+        return lambda profile: any(term(profile) for term in terms)
+
+    # Columnar evaluation over a packed store
+
+    def rows(self, store: ProfileStore) -> List[int]:
+        """Row numbers of the store that match, in row order."""
+        mask = self.mask(store)
+        if np is not None:
+            return np.flatnonzero(mask).tolist()
+        return [row for row, hit in enumerate(mask) if hit]
+
+    def mask(self, store: ProfileStore) -> Any:
+        """Per-row boolean mask (a NumPy array, or a bytearray without NumPy)."""
+        return self._mask(self.tree, store, "row")
+
+    def _domain(self, tree: Tuple[Any, ...]) -> str:
+        # Subtrees touching only hardware-config fields are evaluated once per distinct config
+        return "config" if all(field in CONFIG_COLUMNS for field in self._fields(tree)) else "row"
+
+    def _mask(self, tree: Tuple[Any, ...], store: ProfileStore, domain: str) -> Any:
+        if domain == "row" and self._domain(tree) == "config":
+            return _expand(self._mask(tree, store, "config"), store.configs())
+        if tree[0] == "not":
+            return _not(self._mask(tree[1], store, domain))
+        if tree[0] in ("and", "or"):
+            combine = _and if tree[0] == "and" else _or
+            result = self._mask(tree[1][0], store, domain)
+            for term in tree[1][1:]:
+                result = combine(result, self._mask(term, store, domain))
+            return result
+
+        _, field, op, value = tree
+        kind = FIELD_KINDS[field]
+        predicate = value_predicate(kind, op, value)
+        if field == "id":
+            return _from_values((store.id_at(row) for row in range(len(store))), predicate)
+        column = store.config_column(field) if domain == "config" else store.column(field)
+        if kind == "str":
+            return _isin(column, store.codes_matching(predicate))
+        if np is not None and op in COMPARISONS:
+            values = np.asarray(column)
+            present = ~np.isnan(values) if values.dtype.kind == "f" else values != MISSING
+            return COMPARISONS[op](values, value) & present
+        return _from_numbers(column, predicate)
+
+    # SQL
+
+    def to_sql(self, columns: Optional[Dict[str, str]] = None) -> Tuple[str, List[Any]]:
+        """(WHERE clause, parameters) for the profiles table of the hardware database."""
+        params: List[Any] = []
+        return self._sql(self.tree, columns or {}, params), params
+
+    def _sql(self, tree: Tuple[Any, ...], columns: Dict[str, str], params: List[Any]) -> str:
+        if tree[0] == "not":
+            # Comparisons with NULL are unknown, which NOT keeps unknown (dropping the row); the
+            # other evaluators treat a missing value as false, so coalesce it before negating
+            return f"NOT COALESCE(({self._sql(tree[1], columns, params)}), 0)"
+        if tree[0] in ("and", "or"):
+            joiner = f" {tree[0].upper()} "
+            return "(" + joiner.join(self._sql(term, columns, params) for term in tree[1]) + ")"
+        _, field, op, value = tree
+        column = columns.get(field, field)
+        if op in SUBSTRING_OPS:
+            escaped = str(value).lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f"%{escaped}%")
+            negate = "NOT " if op == "!~" else ""
+            return f"({column} IS NOT NULL AND lower(CAST({column} AS TEXT)) {negate}LIKE ? ESCAPE '\\')"
+        if FIELD_KINDS[field] == "str":
+            params.append(str(value).lower())
+            return f"lower({column}) {op.replace('==', '=')} ?"
+        params.append(value)
+        return f"{column} {op.replace('==', '=')} ?"
+
+
+def _from_values(values: Any, predicate: Callable[[Any], bool]) -> Any:
+    hits = bytearray(1 if predicate(value) else 0 for value in values)
+    return np.frombuffer(hits, dtype=np.bool_).copy() if np is not None else hits
+
+
+def _from_numbers(column: Any, predicate: Callable[[Any], bool]) -> Any:
+    if np is not None:
+        # Evaluate the Python predicate once per distinct value
+        values = np.asarray(column)
+        distinct = np.unique(values)
+        accepted = [v for v in distinct.tolist() if predicate(_decode_number(v))]
+        return np.isin(values, accepted)
+    return _from_values((_decode_number(v) for v in column), predicate)
+
+
+def _isin(column: Any, codes: set) -> Any:
+    if np is not None:
+        return np.isin(np.asarray(column), list(codes))
+    return bytearray(1 if code in codes else 0 for code in column)
+
+
+def _expand(config_mask: Any, configs: Any) -> Any:
+    if np is not None:
+        return config_mask[np.asarray(configs)]
+    return bytearray(config_mask[config] for config in configs)
+
+
+def _and(left: Any, right: Any) -> Any:
+    if np is not None:
+        return left & right
+    return bytearray(map(operator.and_, left, right))
+
+
+def _or(left: Any, right: Any) -> Any:
+    if np is not None:
+        return left | right
+    return bytearray(map(operator.or_, left, right))
+
+
+def _not(mask: Any) -> Any:
+    if np is not None:
+        return ~mask
+    return bytearray(1 - hit for hit in mask)
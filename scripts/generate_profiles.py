@@ -1,12 +1,42 @@
+import argparse
+import hashlib
 import json
 import os
 import itertools
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+try:
+    from profile_store import STORE_PATH, is_store_current, pack_tree
+    from covering import covering_array
+    from jsonl import open_stream, write_profiles
+    from instrument import STATS, add_arguments, instrumented
+    from shards import Shard, parse_shard
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.profile_store import STORE_PATH, is_store_current, pack_tree
+    from scripts.covering import covering_array
+    from scripts.jsonl import open_stream, write_profiles
+    from scripts.instrument import STATS, add_arguments, instrumented
+    from scripts.shards import Shard, parse_shard
 
 # Configuration
 DB_PATH = os.path.join(os.path.dirname(__file__), 'db', 'laptops.json')
 PROFILES_DIR = os.path.join(os.path.dirname(__file__), '..', 'profiles')
+MANIFEST_PATH = os.path.join(PROFILES_DIR, '.generation_manifest.json')
+MANIFEST_VERSION = 1
+PROGRESS_EVERY = 1000  # Profiles between progress lines in --jobs mode
+TASK_VARIANTS = 1000  # Most variants one --jobs task builds and writes
+
+# Environment permutation rules applied to every laptop model
+ACCESSIBILITY_OPTIONS = ["Standard", "High Contrast"]
+BROWSER_OPTIONS = ["Chrome", "Firefox", "Edge"]
+LEGACY_BROWSER = "Internet Explorer"
+LEGACY_BROWSER_OS = ["Windows XP", "Windows 7"]
 
 def load_db() -> List[Dict[str, Any]]:
     with open(DB_PATH, 'r') as f:
@@ -33,78 +63,449 @@ def get_os_dir(os_name: str) -> str:
     }
     return mapping.get(os_name, "other")
 
-def main():
-    laptops = load_db()
-    count = 0
-
-    for laptop in laptops:
-        # Generate permutations for this laptop model
-        # Define environment permutations
-        accessibility_options = ["Standard", "High Contrast"]
-        browser_options = ["Chrome", "Firefox", "Edge"]
-        if "Windows XP" in laptop['supported_os'] or "Windows 7" in laptop['supported_os']:
-             browser_options.append("Internet Explorer")
-
-        # We cartesian product all options
-        options = [
-            laptop['supported_os'],
-            laptop['cpu_options'],
-            laptop['ram_options'],
-            laptop['storage_options'],
-            laptop['gpu_options'],
-            laptop['resolution_options'],
-            accessibility_options,
-            browser_options
-        ]
+def permutation_options(laptop: Dict[str, Any]) -> List[List[Any]]:
+    """Option lists whose cartesian product gives every variant of a laptop model."""
+    browser_options = list(BROWSER_OPTIONS)
+    if any(os_name in laptop['supported_os'] for os_name in LEGACY_BROWSER_OS):
+        browser_options.append(LEGACY_BROWSER)
+
+    return [
+        laptop['supported_os'],
+        laptop['cpu_options'],
+        laptop['ram_options'],
+        laptop['storage_options'],
+        laptop['gpu_options'],
+        laptop['resolution_options'],
+        ACCESSIBILITY_OPTIONS,
+        browser_options
+    ]
+
+def build_profile(laptop: Dict[str, Any], combination: Tuple[Any, ...], variant_id: int) -> Dict[str, Any]:
+    """Creates the profile dict for one option combination of a laptop model."""
+    os_target, cpu, ram, storage, gpu, resolution, access_mode, browser = combination
+    return {
+        "id": generate_slug(laptop['make'], laptop['model'], os_target, variant_id),
+        "metadata": {
+            "make": laptop['make'],
+            "model": laptop['model'],
+            "year": laptop['year'],
+            "os_target": os_target,
+            "form_factor": laptop['form_factor']
+        },
+        "hardware": {
+            "cpu_cores": cpu['cores'],
+            "cpu_name": cpu['name'],
+            "ram_mb": ram,
+            "storage_gb": storage,
+            "gpu_name": gpu['name'],
+            "gpu_vram_mb": gpu['vram'],
+            "screen_resolution": resolution
+        },
+        "environment": {
+            "accessibility_mode": access_mode,
+            "boot_mode": "Normal"
+        },
+        "software": {
+            "primary_browser": browser
+        }
+    }
+
+def variant_combinations(laptop: Dict[str, Any], strength: Optional[int] = None) -> Iterator[Tuple[int, Tuple[Any, ...]]]:
+    """(variant_id, combination) pairs for a laptop model, in variant order.
 
+    With no strength this is every combination. With a strength t it is a
+    t-wise covering array: every combination of t option values still
+    appears in some variant, and each keeps the variant id it has in the
+    full product, so ids stay stable and ProfileCatalog resolves them.
+    """
+    options = permutation_options(laptop)
+    if strength is None:
         # itertools.product creates every combination
-        for i, (os_target, cpu, ram, storage, gpu, resolution, access_mode, browser) in enumerate(itertools.product(*options)):
-            
-            # Create Profile Object
-            profile_id = generate_slug(laptop['make'], laptop['model'], os_target, i+1)
-            
-            profile = {
-                "id": profile_id,
-                "metadata": {
-                    "make": laptop['make'],
-                    "model": laptop['model'],
-                    "year": laptop['year'],
-                    "os_target": os_target,
-                    "form_factor": laptop['form_factor']
-                },
-                "hardware": {
-                    "cpu_cores": cpu['cores'],
-                    "cpu_name": cpu['name'],
-                    "ram_mb": ram,
-                    "storage_gb": storage,
-                    "gpu_name": gpu['name'],
-                    "gpu_vram_mb": gpu['vram'],
-                    "screen_resolution": resolution
-                },
-                "environment": {
-                    "accessibility_mode": access_mode,
-                    "boot_mode": "Normal"
-                },
-                "software": {
-                    "primary_browser": browser
-                }
-            }
-
-            # Save to file
-            os_dir = get_os_dir(os_target)
-            target_dir = os.path.join(PROFILES_DIR, os_dir)
-            ensure_dir(target_dir)
-            
-            filename = f"{profile_id}.json"
-            filepath = os.path.join(target_dir, filename)
-            
-            with open(filepath, 'w') as f:
-                json.dump(profile, f, indent=2)
-            
-            count += 1
-            print(f"Generated: {filename}")
+        for i, combination in enumerate(itertools.product(*options)):
+            yield i + 1, combination
+        return
+    rows = {encode_variant(options, row): row for row in covering_array([len(values) for values in options], strength)}
+    for variant_id in sorted(rows):
+        yield variant_id, tuple(values[index] for values, index in zip(options, rows[variant_id]))
+
+def generate_laptop(laptop: Dict[str, Any], strength: Optional[int] = None,
+                    shard: Optional[Shard] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """All (relative_path, profile) pairs for a laptop model, in variant order; only `shard`'s when given."""
+    generated = []
+    for variant_id, combination in variant_combinations(laptop, strength):
+        profile = build_profile(laptop, combination, variant_id)
+        if shard is not None and not shard.owns(profile['id']):
+            continue
+        generated.append((variant_path(laptop, combination[0], variant_id), profile))
+    return generated
+
+def variant_path(laptop: Dict[str, Any], os_target: str, variant_id: int) -> str:
+    """Path of a variant's file relative to the profiles directory."""
+    return os.path.join(get_os_dir(os_target), f"{generate_slug(laptop['make'], laptop['model'], os_target, variant_id)}.json")
+
+def variant_paths(laptop: Dict[str, Any], strength: Optional[int] = None) -> List[Tuple[int, str]]:
+    """(variant_id, relative_path) for every variant of a model, in variant order, without building profiles.
+
+    The OS is the first (slowest-varying) option, so in the full product
+    each OS owns one contiguous block of variant ids.
+    """
+    if strength is not None:
+        return [(variant_id, variant_path(laptop, combination[0], variant_id))
+                for variant_id, combination in variant_combinations(laptop, strength)]
+    per_os = variant_count(laptop) // len(laptop['supported_os'])
+    return [(variant_id, variant_path(laptop, os_target, variant_id))
+            for block, os_target in enumerate(laptop['supported_os'])
+            for variant_id in range(block * per_os + 1, (block + 1) * per_os + 1)]
+
+def variant_count(laptop: Dict[str, Any]) -> int:
+    count = 1
+    for options in permutation_options(laptop):
+        count *= len(options)
+    return count
+
+def encode_variant(options: List[List[Any]], indices: Tuple[int, ...]) -> int:
+    """1-based variant id of the combination picking options[k][indices[k]]; inverse of decode_variant."""
+    index = 0
+    for values, digit in zip(options, indices):
+        index = index * len(values) + digit
+    return index + 1
+
+def decode_variant(laptop: Dict[str, Any], variant_id: int, options: Optional[List[List[Any]]] = None) -> Tuple[Any, ...]:
+    """Option combination for a 1-based variant id.
+
+    variant_id - 1 is a mixed-radix number over the option list sizes, with
+    the last list varying fastest, exactly as itertools.product enumerates.
+    Pass the model's permutation_options when decoding many ids.
+    """
+    options = permutation_options(laptop) if options is None else options
+    index = variant_id - 1
+    digits = []
+    for values in reversed(options):
+        index, digit = divmod(index, len(values))
+        digits.append(values[digit])
+    return tuple(reversed(digits))
+
+def iter_profiles(laptops: Optional[List[Dict[str, Any]]] = None, strength: Optional[int] = None,
+                  shard: Optional[Shard] = None) -> Iterator[Dict[str, Any]]:
+    """Lazily yields every profile (or `shard`'s) in generation order without touching the profiles tree."""
+    for laptop in (load_db() if laptops is None else laptops):
+        for variant_id, combination in variant_combinations(laptop, strength):
+            profile = build_profile(laptop, combination, variant_id)
+            if shard is None or shard.owns(profile['id']):
+                yield profile
+
+class ProfileCatalog:
+    """Virtual view of the generated corpus: resolves profile ids straight from laptops.json.
+
+    Ids have the form <make>-<model>-<os>-v<N>; the slug prefix identifies
+    the model and OS through a dict lookup and N is decoded arithmetically,
+    so no profile files are needed.
+    """
+
+    ID_PATTERN = re.compile(r'^(.*)-v(\d+)$')
+
+    def __init__(self, laptops: Optional[List[Dict[str, Any]]] = None):
+        self.laptops = load_db() if laptops is None else laptops
+        self._prefixes: Dict[str, List[Dict[str, Any]]] = {}
+        for laptop in self.laptops:
+            for os_target in laptop['supported_os']:
+                prefix = generate_slug(laptop['make'], laptop['model'], os_target, 0)[:-len("-v0")]
+                self._prefixes.setdefault(prefix, []).append(laptop)
+
+    def __len__(self) -> int:
+        return sum(variant_count(laptop) for laptop in self.laptops)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter_profiles(self.laptops)
+
+    def __contains__(self, profile_id: str) -> bool:
+        return self.get(profile_id) is not None
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """The profile dict for an id, or None if the catalog does not produce it."""
+        match = self.ID_PATTERN.match(profile_id)
+        if not match:
+            return None
+        prefix, variant_id = match.group(1), int(match.group(2))
+        for laptop in self._prefixes.get(prefix, []):
+            if not 1 <= variant_id <= variant_count(laptop):
+                continue
+            profile = build_profile(laptop, decode_variant(laptop, variant_id), variant_id)
+            # The OS is encoded in both the prefix and the variant number; they must agree
+            if profile['id'] == profile_id:
+                return profile
+        return None
+
+def laptop_key(laptop: Dict[str, Any]) -> str:
+    return f"{laptop['make']}|{laptop['model']}"
+
+def rules_hash(strength: Optional[int] = None) -> str:
+    """Hash of the permutation rules shared by every model; changing them invalidates everything."""
+    rules = [ACCESSIBILITY_OPTIONS, BROWSER_OPTIONS, LEGACY_BROWSER, LEGACY_BROWSER_OS, MANIFEST_VERSION]
+    if strength is not None:
+        rules.append(f"t-wise:{strength}")
+    return hashlib.sha256(json.dumps(rules).encode('utf-8')).hexdigest()
+
+def entry_hash(laptop: Dict[str, Any], rules: str) -> str:
+    content = json.dumps(laptop, sort_keys=True) + rules
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def load_manifest(path: Optional[str] = None) -> Dict[str, Any]:
+    """Reads the generation manifest ({laptop key: {hash, files}}); empty if missing or outdated.
+
+    Sharded runs also record each model's unsharded variant count as
+    'variants', and the shard itself at the top level.
+    """
+    path = path or MANIFEST_PATH
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('models', {})
+
+def save_manifest(models: Dict[str, Any], path: Optional[str] = None, shard: Optional[Shard] = None) -> None:
+    path = path or MANIFEST_PATH
+    manifest: Dict[str, Any] = {"version": MANIFEST_VERSION, "models": models}
+    if shard is not None:
+        manifest["shard"] = shard.to_dict()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
 
+def is_current(entry: Dict[str, Any], digest: str, files: List[str]) -> bool:
+    """True when a model's manifest entry matches its hash and file list, and all its files still exist.
+
+    The file list differs for the same hash when the run's --shard changes.
+    """
+    if not entry or entry.get('hash') != digest or set(entry['files']) != set(files):
+        return False
+    return all(os.path.exists(os.path.join(PROFILES_DIR, rel_path)) for rel_path in entry['files'])
+
+def delete_files(rel_paths) -> int:
+    removed = 0
+    for rel_path in rel_paths:
+        try:
+            os.remove(os.path.join(PROFILES_DIR, rel_path))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def write_variants(profiles_dir: str, laptop: Dict[str, Any], variant_ids: List[int]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Builds and writes some variants of a model. Returns their (relative_path, profile) store entries.
+
+    Variant ids index the full option product (covering-array ids included),
+    so any subset of a model can be built without the rest.
+    """
+    options = permutation_options(laptop)
+    entries = []
+    created = set()
+    written = 0
+    for variant_id in variant_ids:
+        combination = decode_variant(laptop, variant_id, options)
+        profile = build_profile(laptop, combination, variant_id)
+        rel_path = variant_path(laptop, combination[0], variant_id)
+        target_dir = os.path.join(profiles_dir, os.path.dirname(rel_path))
+        if target_dir not in created:
+            # exist_ok: other workers may be creating the same OS directory
+            os.makedirs(target_dir, exist_ok=True)
+            created.add(target_dir)
+        text = json.dumps(profile, indent=2)
+        with open(os.path.join(profiles_dir, rel_path), 'w') as f:
+            f.write(text)
+        written += len(text)
+        entries.append((rel_path, profile))
+    STATS.count("bytes_written", written)
+    return entries
+
+def write_task(profiles_dir: str, laptop: Dict[str, Any], variant_ids: List[int],
+               collect_stats: bool = False) -> Tuple[List[Tuple[str, Dict[str, Any]]], Optional[Dict[str, Any]]]:
+    """Runs in a pool worker; also returns the worker's stats for this task when the parent collects them."""
+    STATS.reset(enabled=collect_stats)
+    entries = write_variants(profiles_dir, laptop, variant_ids)
+    return entries, STATS.snapshot() if collect_stats else None
+
+def generation_tasks(pending: List[Tuple[Dict[str, Any], List[int]]], jobs: int) -> Iterator[Tuple[Dict[str, Any], List[int]]]:
+    """Splits (laptop, variant ids) work into tasks of at most TASK_VARIANTS variants.
+
+    Large models are spread over several workers instead of one worker
+    building the whole model while the others idle; tasks shrink for small
+    runs so every worker still gets several.
+    """
+    total = sum(len(variant_ids) for _, variant_ids in pending)
+    size = max(1, min(TASK_VARIANTS, -(-total // (jobs * 4))))
+    for laptop, variant_ids in pending:
+        for start in range(0, len(variant_ids), size):
+            yield laptop, variant_ids[start:start + size]
+
+def write_sequential(pending: List[Tuple[Dict[str, Any], List[int]]]) -> List[Tuple[str, Dict[str, Any]]]:
+    entries = []
+    for laptop, variant_ids in pending:
+        for rel_path, profile in write_variants(PROFILES_DIR, laptop, variant_ids):
+            entries.append((rel_path, profile))
+            print(f"Generated: {os.path.basename(rel_path)}")
+    return entries
+
+def write_parallel(pending: List[Tuple[Dict[str, Any], List[int]]], jobs: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """Builds and writes (model, variant ids) tasks across a process pool; returns the store entries.
+
+    Workers build, serialize and write their own profiles, so the parent
+    only hands out tasks and collects the entries it packs into the store.
+    At most two tasks per worker are in flight.
+    """
+    total = sum(len(variant_ids) for _, variant_ids in pending)
+    entries: List[Tuple[str, Dict[str, Any]]] = []
+
+    def finish(future: Any) -> None:
+        task_entries, stats = future.result()
+        before = len(entries)
+        entries.extend(task_entries)
+        STATS.merge(stats)
+        if len(entries) // PROGRESS_EVERY != before // PROGRESS_EVERY or len(entries) == total:
+            print(f"Written {len(entries)}/{total} profiles...", end='\r', flush=True)
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        in_flight: deque = deque()
+        for laptop, variant_ids in generation_tasks(pending, jobs):
+            in_flight.append(pool.submit(write_task, PROFILES_DIR, laptop, variant_ids, STATS.enabled))
+            if len(in_flight) >= 2 * jobs:
+                finish(in_flight.popleft())
+        while in_flight:
+            finish(in_flight.popleft())
+
+    if entries:
+        print()
+    return entries
+
+def emit_jsonl(laptops: List[Dict[str, Any]], strength: Optional[int] = None, shard: Optional[Shard] = None) -> int:
+    """Streams every profile to stdout, one JSON object per line, in generation order.
+
+    Profiles are produced one at a time and written as the reader consumes
+    them, so memory stays flat however large the catalog is. Neither the
+    profiles tree, the manifest nor the packed store is touched.
+    """
+    try:
+        with open_stream('-', 'w') as out:
+            count = write_profiles(iter_profiles(laptops, strength, shard), out)
+    except BrokenPipeError:
+        # The reader stopped early (e.g. `| head`); silence the error Python would print at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    print(f"Total profiles emitted: {count}", file=sys.stderr)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate TestKit hardware profiles from the laptop database.")
+    parser.add_argument("--force", action="store_true", help="Regenerate every model, even unchanged ones (stale files are still removed)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Worker processes for parallel generation (default: 1)")
+    parser.add_argument("--strategy", choices=["exhaustive", "pairwise", "t-wise"], default="exhaustive",
+                        help="Every option combination, or a covering array of them (default: exhaustive)")
+    parser.add_argument("--strength", type=int, help="Interaction strength t for --strategy t-wise (pairwise is t=2)")
+    parser.add_argument("--emit", choices=["files", "jsonl"], default="files",
+                        help="Write the profiles tree, or stream profiles to stdout as JSON Lines without touching it (default: files)")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help="Only generate shard I of N, split by a stable hash of the profile id (combine with merge_shards.py)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    strength = None
+    if args.strategy == "pairwise":
+        if args.strength not in (None, 2):
+            parser.error("--strategy pairwise implies --strength 2; use --strategy t-wise for other strengths")
+        strength = 2
+    elif args.strategy == "t-wise":
+        if args.strength is None or args.strength < 1:
+            parser.error("--strategy t-wise requires --strength N (N >= 1)")
+        strength = args.strength
+    elif args.strength is not None:
+        parser.error("--strength requires --strategy t-wise")
+
+    if args.emit == "jsonl" and (args.force or args.jobs > 1):
+        parser.error("--force and --jobs apply to file output only")
+
+    with instrumented(args, "generate_profiles"):
+        generate(args, strength)
+
+def generate(args: argparse.Namespace, strength: Optional[int]) -> None:
+    with STATS.phase("load"):
+        laptops = load_db()
+    STATS.count("models", len(laptops))
+    if args.emit == "jsonl":
+        with STATS.phase("emit"):
+            STATS.count("profiles_emitted", emit_jsonl(laptops, strength, args.shard))
+        return
+
+    with STATS.phase("load"):
+        # Even with --force, the previous manifest is what tells which files are now stale
+        previous = load_manifest()
+    rules = rules_hash(strength)
+    manifest = {}
+    selected = 0
+    skipped = 0
+    removed = 0
+    pending = []
+
+    with STATS.phase("plan"):
+        for laptop in laptops:
+            # File names come straight from the variant ids; profiles are only built by the writers
+            key = laptop_key(laptop)
+            digest = entry_hash(laptop, rules)
+            variants = variant_paths(laptop, strength)
+            manifest[key] = {"hash": digest}
+            if args.shard is not None:
+                # The unsharded count lets merge_shards.py check that the shards add up
+                manifest[key]["variants"] = len(variants)
+                variants = [(variant_id, rel_path) for variant_id, rel_path in variants
+                            if args.shard.owns(os.path.splitext(os.path.basename(rel_path))[0])]
+            selected += len(variants)
+            files = [rel_path for _, rel_path in variants]
+            manifest[key]["files"] = files
+
+            if not args.force and is_current(previous.get(key), digest, files):
+                # Unchanged model: leave its files untouched
+                skipped += 1
+                continue
+            pending.append((laptop, [variant_id for variant_id, _ in variants]))
+
+            # Delete variants this model produced last time but no longer does
+            stale = set(previous.get(key, {}).get('files', [])) - set(files)
+            removed += delete_files(stale)
+
+        # Models removed from the database take their files with them
+        for key in set(previous) - set(manifest):
+            removed += delete_files(previous[key]['files'])
+
+    with STATS.phase("write"):
+        if args.jobs > 1:
+            written = write_parallel(pending, args.jobs)
+        else:
+            written = write_sequential(pending)
+    count = len(written)
+    STATS.count("profiles_written", count)
+    STATS.count("models_skipped", skipped)
+    STATS.count("files_removed", removed)
+
+    if strength is not None:
+        exhaustive = sum(variant_count(laptop) for laptop in laptops)
+        print(f"Strategy: {strength}-wise covering array, {selected} of {exhaustive} combinations")
+    if args.shard is not None:
+        print(f"Shard {args.shard}: {selected} of {sum(entry['variants'] for entry in manifest.values())} profiles")
     print(f"Total profiles generated: {count}")
+    print(f"Unchanged models skipped: {skipped}")
+    print(f"Stale profiles removed: {removed}")
+
+    if count or removed or not is_store_current(PROFILES_DIR, STORE_PATH):
+        # Pack the whole tree, hand-authored profiles included, into the columnar store read by the
+        # other scripts; the profiles just written are packed from memory rather than read back
+        with STATS.phase("pack"):
+            pack_tree(PROFILES_DIR, STORE_PATH, dict(written))
+        print(f"Packed profile store: {STORE_PATH}")
+    with STATS.phase("manifest"):
+        save_manifest(manifest, shard=args.shard)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,187 @@
+import argparse
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is reported as None there
+    resource = None
+
+
+class _Phase:
+    """Times one pass through a phase: wall clock and process CPU time."""
+
+    __slots__ = ("stats", "name", "wall", "cpu")
+
+    def __init__(self, stats: 'Stats', name: str):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stats.add_time(self.name, time.perf_counter() - self.wall, time.process_time() - self.cpu)
+
+
+_DISABLED = contextlib.nullcontext()
+
+
+class Stats:
+    """Per-phase timers and counters for one script run.
+
+    Library code calls phase() and count() unconditionally. Both are no-ops
+    until a script enables collection with --stats, so instrumented hot
+    loops cost nothing in normal runs. Phases may be entered many times
+    (e.g. once per file); their times and call counts accumulate. CPU time
+    is that of the whole process, so phases running in writer threads
+    overlap. Work done in pool workers is folded in with merge().
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.phases: Dict[str, list] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def reset(self, enabled: Optional[bool] = None) -> None:
+        if enabled is not None:
+            self.enabled = enabled
+        with self._lock:
+            self.phases = {}
+            self.counters = {}
+
+    def phase(self, name: str) -> Any:
+        """Context manager timing a block under `name`."""
+        return _Phase(self, name) if self.enabled else _DISABLED
+
+    def add_time(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        with self._lock:
+            entry = self.phases.get(name)
+            if entry is None:
+                entry = self.phases[name] = [0.0, 0.0, 0]
+            entry[0] += wall
+            entry[1] += cpu
+            entry[2] += calls
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Picklable copy of the collected numbers, for returning from a pool worker."""
+        with self._lock:
+            return {"phases": {name: list(entry) for name, entry in self.phases.items()}, "counters": dict(self.counters)}
+
+    def merge(self, snapshot: Optional[Dict[str, Any]]) -> None:
+        if not snapshot:
+            return
+        for name, (wall, cpu, calls) in snapshot["phases"].items():
+            self.add_time(name, wall, cpu, calls)
+        for name, n in snapshot["counters"].items():
+            self.count(name, n)
+
+    def report(self, script: str, wall: float, cpu: float, children_cpu: float) -> Dict[str, Any]:
+        report: Dict[str, Any] = {
+            "script": script,
+            "argv": sys.argv[1:],
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            # Pool workers that have exited; always 0 on Windows
+            "children_cpu_s": round(children_cpu, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "phases": {
+                name: {"wall_s": round(entry[0], 4), "cpu_s": round(entry[1], 4), "calls": entry[2]}
+                for name, entry in sorted(self.phases.items(), key=lambda item: -item[1][0])
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+        if tracemalloc.is_tracing():
+            report["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        return report
+
+
+# The process-wide instance every script and library module records into
+STATS = Stats()
+
+
+def children_cpu_time() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def format_text(report: Dict[str, Any]) -> str:
+    lines = [f"{report['script']}: {report['wall_s']:.3f}s wall, {report['cpu_s']:.3f}s CPU"
+             f" (+{report['children_cpu_s']:.3f}s in workers)"]
+    if report["peak_rss_mb"] is not None:
+        lines.append(f"  peak RSS: {report['peak_rss_mb']:.1f} MB")
+    if "peak_traced_mb" in report:
+        lines.append(f"  peak traced memory: {report['peak_traced_mb']:.2f} MB")
+    if report["phases"]:
+        lines.append(f"  {'phase':<20} {'wall s':>10} {'cpu s':>10} {'calls':>9}")
+        for name, phase in report["phases"].items():
+            lines.append(f"  {name:<20} {phase['wall_s']:>10.3f} {phase['cpu_s']:>10.3f} {phase['calls']:>9}")
+    for name, value in report["counters"].items():
+        lines.append(f"  {name:<20} {value:>10,}")
+    return "\n".join(lines)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds --stats, --trace-memory and --cprofile to a script's parser."""
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--stats", choices=["text", "json"],
+                       help="Print per-phase timings, counters and peak memory to stderr when done")
+    group.add_argument("--trace-memory", action="store_true",
+                       help="With --stats, also report the peak Python heap via tracemalloc (slows allocation-heavy phases)")
+    group.add_argument("--cprofile", metavar="OUT.prof",
+                       help="Run under cProfile and write the profile here (inspect with python -m pstats)")
+
+
+@contextlib.contextmanager
+def instrumented(args: argparse.Namespace, script: str) -> Iterator[Stats]:
+    """Runs a script body with the instrumentation its --stats/--cprofile arguments ask for.
+
+    The report goes to stderr, so it never mixes with data a script writes
+    to stdout. It is printed even if the body exits early.
+    """
+    stats_format = getattr(args, 'stats', None)
+    profile_path = getattr(args, 'cprofile', None)
+    STATS.reset(enabled=bool(stats_format))
+    if stats_format and getattr(args, 'trace_memory', False):
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile_path else None
+    wall, cpu, children_cpu = time.perf_counter(), time.process_time(), children_cpu_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield STATS
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"cProfile output: {profile_path}", file=sys.stderr)
+        if stats_format:
+            report = STATS.report(script, time.perf_counter() - wall, time.process_time() - cpu,
+                                  children_cpu_time() - children_cpu)
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            print(json.dumps(report, indent=2) if stats_format == "json" else format_text(report), file=sys.stderr)
@@ -0,0 +1,36 @@
+import json
+import sys
+from typing import Any, Dict, Iterable, Iterator, TextIO
+
+
+def open_stream(path: str, mode: str = 'r') -> TextIO:
+    """Opens a JSON Lines file; '-' means stdin/stdout (left open on close)."""
+    if path == '-':
+        stream = sys.stdin if 'r' in mode else sys.stdout
+        return open(stream.fileno(), mode, encoding='utf-8', closefd=False)
+    return open(path, mode, encoding='utf-8')
+
+
+def read_profiles(stream: TextIO) -> Iterator[Dict[str, Any]]:
+    """Lazily yields one profile per non-blank line."""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON on line {number}: {e}") from None
+
+
+def write_profiles(profiles: Iterable[Dict[str, Any]], stream: TextIO) -> int:
+    """Writes each profile as one line, dropping internal '_' keys; returns how many were written.
+
+    Writes block while a downstream pipe is full, so a slow reader throttles the producer.
+    """
+    count = 0
+    for profile in profiles:
+        stream.write(json.dumps({key: value for key, value in profile.items() if not key.startswith('_')}))
+        stream.write('\n')
+        count += 1
+    stream.flush()
+    return count
@@ -0,0 +1,265 @@
+import argparse
+import filecmp
+import glob
+import json
+import os
+import shutil
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from batch_export import batch_artifacts, save_export_cache, write_manifest
+    from export import MODULE_FORMATS, write_artifacts
+    from generate_profiles import MANIFEST_PATH, ProfileCatalog, save_manifest
+    from profile_store import pack_tree
+    from shards import shard_of
+    from instrument import STATS, add_arguments, instrumented
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.batch_export import batch_artifacts, save_export_cache, write_manifest
+    from scripts.export import MODULE_FORMATS, write_artifacts
+    from scripts.generate_profiles import MANIFEST_PATH, ProfileCatalog, save_manifest
+    from scripts.profile_store import pack_tree
+    from scripts.shards import shard_of
+    from scripts.instrument import STATS, add_arguments, instrumented
+
+BATCH_MANIFEST = "batch_manifest.json"
+GENERATION_MANIFEST = os.path.basename(MANIFEST_PATH)
+
+# A shard is (shard directory, its parsed manifest)
+ShardManifest = Tuple[str, Dict[str, Any]]
+
+
+def load_json(path: str) -> Dict[str, Any]:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def export_groups(shard_dirs: List[str]) -> Dict[str, List[ShardManifest]]:
+    """Export manifests by output subtree: '' for a single format, '<format>' for each format of a multi-format export."""
+    groups: Dict[str, List[ShardManifest]] = {}
+    for shard_dir in shard_dirs:
+        if os.path.exists(os.path.join(shard_dir, BATCH_MANIFEST)):
+            paths = [os.path.join(shard_dir, BATCH_MANIFEST)]
+        else:
+            paths = sorted(glob.glob(os.path.join(shard_dir, "*", BATCH_MANIFEST)))
+        if not paths:
+            raise ValueError(f"{shard_dir}: no {BATCH_MANIFEST} or {GENERATION_MANIFEST} found")
+        for path in paths:
+            root = os.path.dirname(path)
+            groups.setdefault(os.path.relpath(root, shard_dir) if root != shard_dir else "", []).append((root, load_json(path)))
+    return groups
+
+def check_shards(shards: List[ShardManifest], label: str) -> List[str]:
+    """Problems with the shard stamps themselves: unsharded, mixed N, or missing/duplicated shards."""
+    problems = []
+    stamps = []
+    for root, manifest in shards:
+        shard = manifest.get("shard")
+        if not shard:
+            problems.append(f"{root}: not a sharded run (no 'shard' in its manifest; rerun with --shard i/N)")
+        else:
+            stamps.append(shard)
+    if problems:
+        return problems
+
+    counts = {shard["count"] for shard in stamps}
+    if len(counts) > 1:
+        return [f"{label}: shards disagree on N ({', '.join(str(count) for count in sorted(counts))})"]
+    count = counts.pop()
+    indexes = [shard["index"] for shard in stamps]
+    missing = sorted(set(range(1, count + 1)) - set(indexes))
+    duplicated = sorted({index for index in indexes if indexes.count(index) > 1})
+    if missing:
+        problems.append(f"{label}: missing shard(s) {', '.join(f'{index}/{count}' for index in missing)}")
+    if duplicated:
+        problems.append(f"{label}: shard(s) given more than once: {', '.join(f'{index}/{count}' for index in duplicated)}")
+    return problems
+
+def verify_export(shards: List[ShardManifest], label: str) -> List[str]:
+    """Checks that the shards of one export format together cover the selection exactly once."""
+    problems = check_shards(shards, label)
+    if problems:
+        return problems
+
+    formats = {manifest["format"] for _, manifest in shards}
+    if len(formats) > 1:
+        problems.append(f"{label}: shards exported different formats ({', '.join(sorted(formats))})")
+    selected = {manifest["shard"]["selected"] for _, manifest in shards}
+    if len(selected) > 1:
+        problems.append(f"{label}: shards selected different profile sets ({', '.join(str(n) for n in sorted(selected))} profiles); use the same filters on every node")
+    elif sum(manifest["total"] for _, manifest in shards) != selected.pop():
+        problems.append(f"{label}: shards exported {sum(manifest['total'] for _, manifest in shards)} profiles "
+                        f"but the selection has {shards[0][1]['shard']['selected']}")
+
+    owner: Dict[str, int] = {}
+    for root, manifest in shards:
+        index, count = manifest["shard"]["index"], manifest["shard"]["count"]
+        for result in manifest["profiles"]:
+            profile_id = result["id"]
+            if profile_id in owner:
+                problems.append(f"{label}: {profile_id} exported by shards {owner[profile_id]} and {index}")
+            owner[profile_id] = index
+            if shard_of(profile_id, count) != index:
+                problems.append(f"{label}: {profile_id} belongs to shard {shard_of(profile_id, count)}/{count}, not {index}/{count}")
+            if result["status"] != "ok":
+                problems.append(f"{label}: {profile_id} failed in shard {index}/{count}: {result.get('error')}")
+                continue
+            for path in result["files"]:
+                if not os.path.exists(os.path.join(root, path)):
+                    problems.append(f"{label}: {os.path.join(root, path)} is missing")
+    return problems
+
+def merge_export(shards: List[ShardManifest], output_root: str) -> Tuple[int, int]:
+    """Copies every shard's artifacts into output_root and writes the merged manifest, cache and batch files.
+
+    The result looks like an unsharded export of the same selection. Files
+    already identical in output_root are left alone. Returns (copied, unchanged).
+    """
+    shards = sorted(shards, key=lambda shard: shard[1]["shard"]["index"])
+    export_format = shards[0][1]["format"]
+    results: List[Dict[str, Any]] = []
+    config_map: Optional[Dict[str, str]] = None
+    copied = unchanged = 0
+    for root, manifest in shards:
+        for result in manifest["profiles"]:
+            result.pop("profiles", None)  # --dedupe members; rebuilt from the merged config map
+            results.append(result)
+            for path in result["files"]:
+                source, target = os.path.join(root, path), os.path.join(output_root, path)
+                if os.path.exists(target) and filecmp.cmp(source, target, shallow=False):
+                    unchanged += 1
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(source, target)
+                copied += 1
+        if "config_map" in manifest:
+            config_map = {**(config_map or {}), **manifest["config_map"]}
+
+    os.makedirs(output_root, exist_ok=True)
+    entries = {result["id"]: result["entry"] for result in results if "entry" in result}
+    write_artifacts(output_root, batch_artifacts(results, export_format, entries))
+    if export_format not in MODULE_FORMATS:
+        save_export_cache(output_root, export_format, results)
+    write_manifest(results, export_format, output_root, config_map)
+    return copied, unchanged
+
+def generation_shards(shard_dirs: List[str]) -> List[ShardManifest]:
+    return [(shard_dir, load_json(os.path.join(shard_dir, GENERATION_MANIFEST))) for shard_dir in shard_dirs]
+
+def verify_generation(shards: List[ShardManifest]) -> List[str]:
+    """Checks that sharded profiles trees hold every variant of every model exactly once."""
+    problems = check_shards(shards, "profiles")
+    if problems:
+        return problems
+
+    models = {key: entry["hash"] for key, entry in shards[0][1]["models"].items()}
+    owner: Dict[str, int] = {}
+    for root, manifest in shards:
+        index, count = manifest["shard"]["index"], manifest["shard"]["count"]
+        if {key: entry["hash"] for key, entry in manifest["models"].items()} != models:
+            problems.append(f"{root}: generated from a different laptops.json or strategy than {shards[0][0]}")
+            continue
+        for entry in manifest["models"].values():
+            for rel_path in entry["files"]:
+                profile_id = os.path.splitext(os.path.basename(rel_path))[0]
+                if profile_id in owner:
+                    problems.append(f"profiles: {profile_id} generated by shards {owner[profile_id]} and {index}")
+                owner[profile_id] = index
+                if shard_of(profile_id, count) != index:
+                    problems.append(f"profiles: {profile_id} belongs to shard {shard_of(profile_id, count)}/{count}, not {index}/{count}")
+                if not os.path.exists(os.path.join(root, rel_path)):
+                    problems.append(f"profiles: {os.path.join(root, rel_path)} is missing")
+    if problems:
+        return problems
+
+    for key in models:
+        variants = shards[0][1]["models"][key]["variants"]
+        generated = sum(len(manifest["models"][key]["files"]) for _, manifest in shards)
+        if generated != variants:
+            problems.append(f"profiles: {key} has {generated} of its {variants} profiles across the shards")
+    return problems
+
+def variant_order(rel_path: str) -> Tuple[int, str]:
+    """Sort key putting a model's files back in generation (variant) order."""
+    match = ProfileCatalog.ID_PATTERN.match(os.path.splitext(os.path.basename(rel_path))[0])
+    return (int(match.group(2)) if match else 0, rel_path)
+
+def merge_generation(shards: List[ShardManifest], output_dir: str) -> Tuple[int, int]:
+    """Copies the shard trees into output_dir with an unsharded generation manifest and a packed store.
+
+    Returns (copied, unchanged).
+    """
+    models: Dict[str, Dict[str, Any]] = {}
+    copied = unchanged = 0
+    for root, manifest in shards:
+        for key, entry in manifest["models"].items():
+            merged = models.setdefault(key, {"hash": entry["hash"], "files": []})
+            merged["files"].extend(entry["files"])
+            for rel_path in entry["files"]:
+                source, target = os.path.join(root, rel_path), os.path.join(output_dir, rel_path)
+                if os.path.exists(target) and filecmp.cmp(source, target, shallow=False):
+                    unchanged += 1
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(source, target)
+                copied += 1
+    for entry in models.values():
+        entry["files"].sort(key=variant_order)
+
+    with STATS.phase("pack"):
+        pack_tree(output_dir)
+    save_manifest(models, os.path.join(output_dir, GENERATION_MANIFEST))
+    return copied, unchanged
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify and merge the outputs of generate_profiles.py/batch_export.py --shard runs.")
+    parser.add_argument("command", choices=["verify", "merge"],
+                        help="verify: check the shards cover every profile exactly once; merge: verify, then combine them into --output")
+    parser.add_argument("shards", nargs="+", help="One output directory per shard: batch_export.py --output dirs, or profiles trees")
+    parser.add_argument("--output", "-o", help="Directory to merge into (required for merge)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.command == "merge" and not args.output:
+        parser.error("merge requires --output")
+
+    with instrumented(args, "merge_shards"):
+        sys.exit(run(args))
+
+def run(args) -> int:
+    """Verifies (and merges) the shards. Returns the exit code: 0 ok, 1 shards incomplete or inconsistent."""
+    generation = all(os.path.exists(os.path.join(shard_dir, GENERATION_MANIFEST)) for shard_dir in args.shards)
+    try:
+        with STATS.phase("load"):
+            groups = {"": generation_shards(args.shards)} if generation else export_groups(args.shards)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    with STATS.phase("verify"):
+        problems = verify_generation(groups[""]) if generation else \
+            [problem for label, shards in groups.items() for problem in verify_export(shards, label or shards[0][1].get("format", "export"))]
+    for problem in problems:
+        print(problem)
+    formats = sorted({manifest.get("format", "?") for shards in groups.values() for _, manifest in shards})
+    kind = "profiles trees" if generation else f"exports ({', '.join(formats)})"
+    if problems:
+        print(f"{len(args.shards)} shard {kind}: {len(problems)} problems.")
+        return 1
+    print(f"{len(args.shards)} shard {kind}: complete, no profile missing or duplicated.")
+    if args.command == "verify":
+        return 0
+
+    with STATS.phase("merge"):
+        for label, shards in groups.items():
+            output_root = os.path.join(args.output, label) if label else args.output
+            if generation:
+                copied, unchanged = merge_generation(shards, output_root)
+            else:
+                copied, unchanged = merge_export(shards, output_root)
+            STATS.count("files_copied", copied)
+            STATS.count("files_unchanged", unchanged)
+            print(f"Merged into {output_root}: {copied} files copied, {unchanged} unchanged.")
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -1,131 +1,330 @@
+import argparse
 import json
 import sqlite3
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+try:
+    from generate_profiles import laptop_key
+    from profile_store import PROFILES_DIR, open_store, scan_tree
+    from instrument import STATS, add_arguments, instrumented
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.generate_profiles import laptop_key
+    from scripts.profile_store import PROFILES_DIR, open_store, scan_tree
+    from scripts.instrument import STATS, add_arguments, instrumented
 
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 JSON_PATH = os.path.join(BASE_DIR, 'db', 'laptops.json')
 DB_PATH = os.path.join(BASE_DIR, 'db', 'hardware.db')
 
-def migrate() -> None:
-    print(f"Migrating {JSON_PATH} to {DB_PATH}...")
-    
-    if not os.path.exists(JSON_PATH):
-        print(f"Error: {JSON_PATH} not found.")
-        return
+# Option tables: name -> (columns, function extracting rows from a laptop entry)
+OPTION_TABLES = {
+    'supported_os': (('os_name',), lambda laptop: [(os_name,) for os_name in laptop.get('supported_os', [])]),
+    'cpu_options': (('name', 'cores'), lambda laptop: [(cpu.get('name'), cpu.get('cores')) for cpu in laptop.get('cpu_options', [])]),
+    'ram_options': (('size_mb',), lambda laptop: [(ram,) for ram in laptop.get('ram_options', [])]),
+    'storage_options': (('size_gb',), lambda laptop: [(storage,) for storage in laptop.get('storage_options', [])]),
+    'gpu_options': (('name', 'vram_mb'), lambda laptop: [(gpu.get('name'), gpu.get('vram')) for gpu in laptop.get('gpu_options', [])]),
+    'resolution_options': (('resolution',), lambda laptop: [(res,) for res in laptop.get('resolution_options', [])]),
+}
 
-    # Load JSON data
-    with open(JSON_PATH, 'r', encoding='utf-8') as f:
-        laptops = json.load(f)
+# Columns of the profiles table, in insert order; path is the profile's file relative to the profiles tree
+PROFILE_COLUMNS = (
+    'id', 'laptop_id', 'make', 'model', 'year', 'os_target', 'form_factor', 'os_dir', 'path',
+    'cpu_name', 'cpu_cores', 'ram_mb', 'storage_gb', 'gpu_name', 'gpu_vram_mb', 'screen_resolution',
+    'accessibility_mode', 'boot_mode', 'primary_browser',
+)
+# Nested profile layout of the profile columns: (section, fields in file order)
+PROFILE_SECTIONS = (
+    ("metadata", ('make', 'model', 'year', 'os_target', 'form_factor')),
+    ("hardware", ('cpu_cores', 'cpu_name', 'ram_mb', 'storage_gb', 'gpu_name', 'gpu_vram_mb', 'screen_resolution')),
+    ("environment", ('accessibility_mode', 'boot_mode')),
+    ("software", ('primary_browser',)),
+)
+PROFILE_INDEXES = ('make', 'os_target', 'ram_mb', 'cpu_cores', 'gpu_vram_mb')
+TEXT_COLUMNS = {'id', 'make', 'model', 'os_target', 'form_factor', 'os_dir', 'path', 'cpu_name', 'gpu_name',
+                'screen_resolution', 'accessibility_mode', 'boot_mode', 'primary_browser'}
 
-    # Connect to SQLite
-    conn = sqlite3.connect(DB_PATH)
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS laptops (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        make TEXT,
+        model TEXT,
+        year INTEGER,
+        form_factor TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS supported_os (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        laptop_id INTEGER,
+        os_name TEXT,
+        FOREIGN KEY(laptop_id) REFERENCES laptops(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS cpu_options (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        laptop_id INTEGER,
+        name TEXT,
+        cores INTEGER,
+        FOREIGN KEY(laptop_id) REFERENCES laptops(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS ram_options (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        laptop_id INTEGER,
+        size_mb INTEGER,
+        FOREIGN KEY(laptop_id) REFERENCES laptops(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS storage_options (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        laptop_id INTEGER,
+        size_gb INTEGER,
+        FOREIGN KEY(laptop_id) REFERENCES laptops(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS gpu_options (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        laptop_id INTEGER,
+        name TEXT,
+        vram_mb INTEGER,
+        FOREIGN KEY(laptop_id) REFERENCES laptops(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS resolution_options (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        laptop_id INTEGER,
+        resolution TEXT,
+        FOREIGN KEY(laptop_id) REFERENCES laptops(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS profiles (
+        id TEXT PRIMARY KEY,
+        laptop_id INTEGER,
+        make TEXT,
+        model TEXT,
+        year INTEGER,
+        os_target TEXT,
+        form_factor TEXT,
+        os_dir TEXT,
+        path TEXT,
+        cpu_name TEXT,
+        cpu_cores INTEGER,
+        ram_mb INTEGER,
+        storage_gb NUMERIC,
+        gpu_name TEXT,
+        gpu_vram_mb INTEGER,
+        screen_resolution TEXT,
+        accessibility_mode TEXT,
+        boot_mode TEXT,
+        primary_browser TEXT,
+        FOREIGN KEY(laptop_id) REFERENCES laptops(id)
+    );
+'''
+
+def create_schema(cursor: sqlite3.Cursor) -> None:
+    # The profiles table is rebuilt on every sync, so one from an earlier layout is simply dropped
+    columns = tuple(row[1] for row in cursor.execute('PRAGMA table_info(profiles)'))
+    if columns and columns != PROFILE_COLUMNS:
+        cursor.execute('DROP TABLE profiles')
+    cursor.executescript(SCHEMA)
+
+    # Databases written by earlier versions may hold duplicate laptops; keep the first copy
+    for table in OPTION_TABLES:
+        cursor.execute(f'''
+            DELETE FROM {table} WHERE laptop_id NOT IN (SELECT MIN(id) FROM laptops GROUP BY make, model)
+        ''')
+    cursor.execute('DELETE FROM laptops WHERE id NOT IN (SELECT MIN(id) FROM laptops GROUP BY make, model)')
+
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_laptops_make_model ON laptops (make, model)')
+    for table in OPTION_TABLES:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_laptop ON {table} (laptop_id)')
+    for column in PROFILE_INDEXES:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_profiles_{column} ON profiles ({column})')
+
+def sync(conn: sqlite3.Connection, laptops: List[Dict[str, Any]], profiles_dir: str = PROFILES_DIR) -> int:
+    """Makes the database mirror laptops.json and the profiles tree. Safe to run any number of times.
+
+    Laptops are upserted on (make, model), their option rows are replaced
+    wholesale, and laptops no longer in the JSON are removed. The profiles
+    table is refilled from every profile under profiles_dir, generated or
+    hand-authored, so --db queries see the same corpus as the store and the
+    file scan. All of it happens inside a single transaction.
+    """
     cursor = conn.cursor()
+    with STATS.phase("transaction"), conn:
+        with STATS.phase("schema"):
+            create_schema(cursor)
+
+        with STATS.phase("laptops"):
+            upsert_laptops(cursor, laptops)
+            ids = {f"{make}|{model}": laptop_id for laptop_id, make, model in cursor.execute('SELECT id, make, model FROM laptops')}
+            keep = {ids[laptop_key(laptop)] for laptop in laptops}
+            for laptop_id in set(ids.values()) - keep:
+                cursor.execute('DELETE FROM laptops WHERE id = ?', (laptop_id,))
+        STATS.count("laptops", len(laptops))
 
-    # Create tables
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS laptops (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            make TEXT,
-            model TEXT,
-            year INTEGER,
-            form_factor TEXT
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS supported_os (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            laptop_id INTEGER,
-            os_name TEXT,
-            FOREIGN KEY(laptop_id) REFERENCES laptops(id)
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS cpu_options (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            laptop_id INTEGER,
-            name TEXT,
-            cores INTEGER,
-            FOREIGN KEY(laptop_id) REFERENCES laptops(id)
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ram_options (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            laptop_id INTEGER,
-            size_mb INTEGER,
-            FOREIGN KEY(laptop_id) REFERENCES laptops(id)
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS storage_options (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            laptop_id INTEGER,
-            size_gb INTEGER,
-            FOREIGN KEY(laptop_id) REFERENCES laptops(id)
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS gpu_options (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            laptop_id INTEGER,
-            name TEXT,
-            vram_mb INTEGER,
-            FOREIGN KEY(laptop_id) REFERENCES laptops(id)
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS resolution_options (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            laptop_id INTEGER,
-            resolution TEXT,
-            FOREIGN KEY(laptop_id) REFERENCES laptops(id)
-        )
-    ''')
-
-    # Insert data
-    for laptop in laptops:
-        cursor.execute('''
+        with STATS.phase("options"):
+            for table, (columns, extract) in OPTION_TABLES.items():
+                cursor.execute(f'DELETE FROM {table}')
+                placeholders = ', '.join('?' * (len(columns) + 1))
+                rows = [(ids[laptop_key(laptop)],) + row for laptop in laptops for row in extract(laptop)]
+                cursor.executemany(f'INSERT INTO {table} (laptop_id, {", ".join(columns)}) VALUES ({placeholders})', rows)
+                STATS.count("option_rows", len(rows))
+
+        with STATS.phase("profiles"):
+            cursor.execute('DELETE FROM profiles')
+            cursor.executemany(
+                f'INSERT INTO profiles ({", ".join(PROFILE_COLUMNS)}) VALUES ({", ".join("?" * len(PROFILE_COLUMNS))})',
+                (profile_row(rel_path, profile, ids) for rel_path, profile in tree_profiles(profiles_dir))
+            )
+    count = cursor.execute('SELECT COUNT(*) FROM profiles').fetchone()[0]
+    STATS.count("profiles", count)
+    return count
+
+def upsert_laptops(cursor: sqlite3.Cursor, laptops: List[Dict[str, Any]]) -> None:
+    cursor.executemany('''
             INSERT INTO laptops (make, model, year, form_factor)
             VALUES (?, ?, ?, ?)
-        ''', (laptop.get('make'), laptop.get('model'), laptop.get('year'), laptop.get('form_factor')))
-        
-        laptop_id = cursor.lastrowid
+            ON CONFLICT (make, model) DO UPDATE SET year = excluded.year, form_factor = excluded.form_factor
+''', [(laptop.get('make'), laptop.get('model'), laptop.get('year'), laptop.get('form_factor')) for laptop in laptops])
+
+def tree_profiles(profiles_dir: str = PROFILES_DIR) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(relative_path, profile) for every profile of a tree, from its packed store when that is current."""
+    store = open_store(profiles_dir)
+    if store is None:
+        yield from scan_tree(profiles_dir)
+        return
+    with store:
+        for row in range(len(store)):
+            yield store.relative_path(row), store.profile(row)
+
+def profile_row(rel_path: str, profile: Dict[str, Any], laptop_ids: Dict[str, int]) -> Tuple[Any, ...]:
+    """Profiles table row; fields a hand-authored profile leaves out are NULL, and so is laptop_id
+    when its make/model is not in laptops.json."""
+    metadata, hardware = profile.get('metadata', {}), profile.get('hardware', {})
+    environment, software = profile.get('environment', {}), profile.get('software', {})
+    return (
+        profile['id'], laptop_ids.get(f"{metadata.get('make')}|{metadata.get('model')}"),
+        metadata.get('make'), metadata.get('model'), metadata.get('year'), metadata.get('os_target'), metadata.get('form_factor'),
+        os.path.dirname(rel_path), rel_path.replace(os.sep, '/'),
+        hardware.get('cpu_name'), hardware.get('cpu_cores'), hardware.get('ram_mb'), hardware.get('storage_gb'),
+        hardware.get('gpu_name'), hardware.get('gpu_vram_mb'), hardware.get('screen_resolution'),
+        environment.get('accessibility_mode'), environment.get('boot_mode'),
+        software.get('primary_browser'),
+    )
 
-        # Supported OS
-        for os_name in laptop.get('supported_os', []):
-            cursor.execute('INSERT INTO supported_os (laptop_id, os_name) VALUES (?, ?)', (laptop_id, os_name))
+def _like(text: str) -> str:
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
 
-        # CPU Options
-        for cpu in laptop.get('cpu_options', []):
-            cursor.execute('INSERT INTO cpu_options (laptop_id, name, cores) VALUES (?, ?, ?)', (laptop_id, cpu.get('name'), cpu.get('cores')))
+def search_text_condition(text: str) -> Tuple[str, List[Any]]:
+    """(clause, params) matching profiles whose "make model os id" text contains `text`.
 
-        # RAM Options
-        for ram in laptop.get('ram_options', []):
-            cursor.execute('INSERT INTO ram_options (laptop_id, size_mb) VALUES (?, ?)', (laptop_id, ram))
+    Case-insensitive like search_profiles.py's file scan; missing fields
+    count as empty strings.
+    """
+    joined = " || ' ' || ".join(f"COALESCE({column}, '')" for column in ('make', 'model', 'os_target', 'id'))
+    return f"{joined} LIKE ? ESCAPE '\\'", [_like(text)]
 
-        # Storage Options
-        for storage in laptop.get('storage_options', []):
-            cursor.execute('INSERT INTO storage_options (laptop_id, size_gb) VALUES (?, ?)', (laptop_id, storage))
+def query_profiles(conn: sqlite3.Connection, contains: Optional[Dict[str, str]] = None,
+                   ranges: Optional[Dict[str, Tuple[Optional[int], Optional[int]]]] = None,
+                   limit: Optional[int] = None,
+                   where: Optional[Tuple[str, List[Any]]] = None) -> Iterator[sqlite3.Row]:
+    """Selects profiles with case-insensitive substring filters, numeric ranges and an extra
+    (clause, params) condition such as FilterExpression.to_sql() produces.
 
-        # GPU Options
-        for gpu in laptop.get('gpu_options', []):
-            cursor.execute('INSERT INTO gpu_options (laptop_id, name, vram_mb) VALUES (?, ?, ?)', (laptop_id, gpu.get('name'), gpu.get('vram')))
+    Substring filters on indexed text columns are first resolved to the
+    matching distinct values, so the final query is an indexed IN lookup
+    rather than a LIKE scan over every profile. Rows are fetched from the
+    cursor as they are iterated, not all at once.
+    """
+    clauses, params = [], []
+    for column, text in (contains or {}).items():
+        if column not in PROFILE_COLUMNS:
+            raise ValueError(f"Unknown profile column: {column}")
+        if column in PROFILE_INDEXES and column in TEXT_COLUMNS:
+            values = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT {column} FROM profiles WHERE {column} LIKE ? ESCAPE '\\'", (_like(text),))]
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        else:
+            clauses.append(f"CAST({column} AS TEXT) LIKE ? ESCAPE '\\'")
+            params.append(_like(text))
+    for column, (low, high) in (ranges or {}).items():
+        if column not in PROFILE_COLUMNS:
+            raise ValueError(f"Unknown profile column: {column}")
+        if low is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(low)
+        if high is not None:
+            clauses.append(f"{column} <= ?")
+            params.append(high)
+    if where:
+        clauses.append(where[0])
+        params.extend(where[1])
 
-        # Resolution Options
-        for res in laptop.get('resolution_options', []):
-            cursor.execute('INSERT INTO resolution_options (laptop_id, resolution) VALUES (?, ?)', (laptop_id, res))
+    sql = 'SELECT * FROM profiles'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY rowid'
+    if limit:
+        sql += f' LIMIT {int(limit)}'
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    return iter(cursor.execute(sql, params))
 
-    conn.commit()
+def row_to_profile(row: sqlite3.Row) -> Dict[str, Any]:
+    """Rebuilds the nested profile dict from a profiles table row.
+
+    NULL fields, and sections left without any field, are omitted, so a
+    hand-authored profile comes back exactly as its file has it.
+    """
+    profile: Dict[str, Any] = {"id": row['id']}
+    for section, fields in PROFILE_SECTIONS:
+        values = {name: row[name] for name in fields if row[name] is not None}
+        if values:
+            profile[section] = values
+    return profile
+
+def open_db(path: str = DB_PATH) -> sqlite3.Connection:
+    """Opens a synced hardware database, failing clearly if it has no profiles table yet."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found. Run scripts/migrate_to_sqlite.py first.")
+    conn = sqlite3.connect(path)
+    if not conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'profiles'").fetchone():
+        conn.close()
+        raise RuntimeError(f"{path} has no profiles table. Run scripts/migrate_to_sqlite.py to sync it.")
+    return conn
+
+def migrate(profiles_dir: str = PROFILES_DIR) -> None:
+    print(f"Migrating {JSON_PATH} and {profiles_dir} to {DB_PATH}...")
+
+    if not os.path.exists(JSON_PATH):
+        print(f"Error: {JSON_PATH} not found.")
+        return
+    if not os.path.isdir(profiles_dir):
+        print(f"Error: {profiles_dir} not found. Run scripts/generate_profiles.py first.")
+        return
+
+    # Load JSON data
+    with STATS.phase("load"), open(JSON_PATH, 'r', encoding='utf-8') as f:
+        laptops = json.load(f)
+
+    # Connect to SQLite
+    conn = sqlite3.connect(DB_PATH)
+    profile_count = sync(conn, laptops, profiles_dir)
     conn.close()
-    print(f"Successfully migrated {len(laptops)} laptops to {DB_PATH}")
+    print(f"Successfully migrated {len(laptops)} laptops ({profile_count} profiles) to {DB_PATH}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync laptops.json and the profiles tree into the SQLite hardware database.")
+    parser.add_argument("--dir", "-d", default=PROFILES_DIR, help="Profiles directory to load the profiles table from (default: profiles)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrumented(args, "migrate_to_sqlite"):
+        migrate(args.dir)
 
 if __name__ == '__main__':
-    migrate()
+    main()
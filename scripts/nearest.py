@@ -0,0 +1,332 @@
+import heapq
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    # Queries walk a k-d tree instead
+    np = None
+
+try:
+    from profile_store import MISSING, ProfileStore, _decode_number
+    from profile_model import Profile
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.profile_store import MISSING, ProfileStore, _decode_number
+    from scripts.profile_model import Profile
+
+# Feature -> profile field it is read from. "pixels" is the screen resolution's pixel count.
+FEATURES: Dict[str, str] = {
+    "cpu_cores": "cpu_cores",
+    "ram_mb": "ram_mb",
+    "storage_gb": "storage_gb",
+    "gpu_vram_mb": "gpu_vram_mb",
+    "pixels": "screen_resolution",
+    "year": "year",
+}
+FEATURE_NAMES = tuple(FEATURES)
+# Spec spellings accepted for each feature
+FEATURE_ALIASES = {
+    "cores": "cpu_cores", "cpu": "cpu_cores",
+    "ram": "ram_mb", "memory": "ram_mb",
+    "storage": "storage_gb", "disk": "storage_gb",
+    "vram": "gpu_vram_mb",
+    "resolution": "pixels", "res": "pixels", "screen_resolution": "pixels",
+}
+# Features compared on a log scale: 8 vs 16 GB is as far apart as 16 vs 32 GB
+LOG_FEATURES = frozenset(["cpu_cores", "ram_mb", "storage_gb", "gpu_vram_mb", "pixels"])
+# Normalized coordinate of an absent value; at least a full feature range from any corpus value
+ABSENT = -1.0
+
+UNITS = {"": 1, "mb": 1, "gb": 1024, "tb": 1024 * 1024}
+NATIVE_UNIT = {"ram_mb": "mb", "gpu_vram_mb": "mb", "storage_gb": "gb"}
+_NUMBER = re.compile(r"^(\d+(?:\.\d+)?)\s*([a-z]*)$")
+_RESOLUTION = re.compile(r"^(\d+)\s*[x×]\s*(\d+)$")
+
+
+class SpecError(ValueError):
+    """A similarity spec could not be parsed."""
+
+
+def pixels(resolution: Any) -> Optional[int]:
+    """Pixel count of a "WIDTHxHEIGHT" resolution, or None."""
+    match = _RESOLUTION.match(str(resolution).strip().lower()) if resolution is not None else None
+    return int(match.group(1)) * int(match.group(2)) if match else None
+
+
+def parse_value(feature: str, text: str) -> float:
+    """A spec value in the feature's native unit: "12GB" -> 12288 for ram_mb, "2560x1440" -> pixels."""
+    text = text.strip().lower()
+    if feature == "pixels":
+        count = pixels(text)
+        if count is not None:
+            return float(count)
+    match = _NUMBER.match(text)
+    if match is None or (match.group(2) and (feature not in NATIVE_UNIT or match.group(2) not in UNITS)):
+        raise SpecError(f"invalid value {text!r} for {feature}")
+    value = float(match.group(1))
+    unit = match.group(2)
+    if unit:
+        value = value * UNITS[unit] / UNITS[NATIVE_UNIT[feature]]
+    return value
+
+
+def parse_spec(spec: Any) -> Dict[str, float]:
+    """Parses "cores=6 ram=12GB resolution=2560x1440 vram=4GB" (or a {name: value} mapping) into features.
+
+    Names may be features, profile fields or the aliases above. Sizes take an
+    optional MB/GB/TB suffix; bare numbers are in the field's own unit.
+    """
+    if isinstance(spec, str):
+        pairs = []
+        for term in re.split(r"[,\s]+", spec.strip()):
+            if not term:
+                continue
+            name, sep, value = term.partition("=")
+            if not sep or not value:
+                raise SpecError(f"expected name=value, got {term!r}")
+            pairs.append((name, value))
+    else:
+        pairs = list(dict(spec).items())
+    features: Dict[str, float] = {}
+    for name, value in pairs:
+        key = name.strip().lower()
+        feature = FEATURE_ALIASES.get(key, key)
+        if feature not in FEATURES:
+            raise SpecError(f"unknown feature {name!r} (expected one of {', '.join(FEATURE_NAMES)})")
+        features[feature] = parse_value(feature, str(value))
+    if not features:
+        raise SpecError("the spec names no features")
+    return features
+
+
+def raw_features(profile: Any) -> Tuple[Optional[float], ...]:
+    """FEATURE_NAMES values of a profile (either layout, or a Profile); None where absent."""
+    if not isinstance(profile, Profile):
+        profile = Profile.from_dict(profile)
+    values = []
+    for feature, field in FEATURES.items():
+        value = profile.get(field)
+        if feature == "pixels":
+            value = pixels(value)
+        values.append(None if value is None else float(value))
+    return tuple(values)
+
+
+def _transform(feature: str, value: float) -> float:
+    return math.log2(1.0 + max(value, 0.0)) if feature in LOG_FEATURES else value
+
+
+class _KDTree:
+    """A static k-d tree over normalized points, for when NumPy is unavailable.
+
+    Queries may use a subset of the dimensions (the others contribute
+    nothing to the distance); subtrees are pruned only on the dimensions in use.
+    """
+
+    __slots__ = ("points", "root")
+
+    def __init__(self, points: List[Tuple[float, ...]], members: List[int]):
+        self.points = points
+        self.root = self._build(members, 0, len(points[0]) if points else 0)
+
+    def _build(self, members: List[int], depth: int, dims: int) -> Any:
+        if not members:
+            return None
+        axis = depth % dims
+        members.sort(key=lambda point: self.points[point][axis])
+        middle = len(members) // 2
+        return (members[middle], axis,
+                self._build(members[:middle], depth + 1, dims),
+                self._build(members[middle + 1:], depth + 1, dims))
+
+    def nearest(self, query: Dict[int, float], k: int) -> List[Tuple[float, int]]:
+        """The k (squared distance, point) pairs closest to query ({dimension: value}), nearest first."""
+        heap: List[Tuple[float, int]] = []  # Max-heap of the best k as (-distance, -point)
+        points = self.points
+        dims = tuple(query.items())
+
+        def visit(node: Any) -> None:
+            if node is None:
+                return
+            point, axis, left, right = node
+            coords = points[point]
+            distance = sum((coords[dim] - value) ** 2 for dim, value in dims)
+            entry = (-distance, -point)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+            if axis not in query:
+                visit(left)
+                visit(right)
+                return
+            delta = query[axis] - points[point][axis]
+            near, far = (right, left) if delta >= 0 else (left, right)
+            visit(near)
+            if len(heap) < k or delta * delta <= -heap[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return sorted((-distance, -point) for distance, point in heap)
+
+
+class NearestIndex:
+    """k-nearest-neighbour index over the numeric hardware features of a corpus.
+
+    Each point is a distinct (features, os_target) combination, carrying the
+    member keys (store config numbers or profile rows) that share it, so the
+    many software/environment variants of a configuration cost one point.
+    Features are log-scaled where sizes multiply (RAM, storage, VRAM, cores,
+    pixels) and then scaled to the corpus range, so every feature spans
+    about [0, 1]. Queries only measure the features they name. With NumPy
+    a query is one vectorized pass over the point matrix; without it, it
+    walks a k-d tree built on first use.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[Tuple[Optional[float], ...], Optional[str], Any]]):
+        by_key: Dict[Tuple[Any, ...], int] = {}
+        self.raw: List[Tuple[Optional[float], ...]] = []
+        self.os: List[Optional[str]] = []
+        self.members: List[List[Any]] = []
+        for features, os_target, member in entries:
+            key = (features, os_target)
+            point = by_key.get(key)
+            if point is None:
+                point = by_key[key] = len(self.raw)
+                self.raw.append(features)
+                self.os.append(os_target)
+                self.members.append([])
+            self.members[point].append(member)
+
+        self.offsets: List[float] = []
+        self.scales: List[float] = []
+        for dim, feature in enumerate(FEATURE_NAMES):
+            present = [_transform(feature, values[dim]) for values in self.raw if values[dim] is not None]
+            low, high = (min(present), max(present)) if present else (0.0, 1.0)
+            self.offsets.append(low)
+            self.scales.append(1.0 / (high - low) if high > low else 1.0)
+        self.points = [
+            tuple(ABSENT if value is None else self.normalize(dim, value) for dim, value in enumerate(values))
+            for values in self.raw
+        ]
+        self._matrix = np.array(self.points, dtype=np.float64).reshape(len(self.points), len(FEATURE_NAMES)) if np is not None else None
+        self._os_codes: Optional[Dict[str, Any]] = None
+        self._trees: Dict[Optional[str], _KDTree] = {}
+
+    @classmethod
+    def from_store(cls, store: ProfileStore) -> 'NearestIndex':
+        """Index over a packed store's config table; members are config numbers."""
+        columns = [store.config_column(field) for field in FEATURES.values()]
+        os_column = store.config_column("os_target")
+        strings = store.strings
+        resolutions: Dict[int, Optional[int]] = {}
+
+        def entries() -> Iterable[Tuple[Tuple[Optional[float], ...], Optional[str], int]]:
+            for config in range(len(store.config_hashes)):
+                values = []
+                for feature, column in zip(FEATURE_NAMES, columns):
+                    raw = column[config]
+                    if feature == "pixels":
+                        if raw not in resolutions:
+                            resolutions[raw] = None if raw == MISSING else pixels(strings[raw])
+                        value = resolutions[raw]
+                    else:
+                        value = _decode_number(raw)
+                    values.append(None if value is None else float(value))
+                code = os_column[config]
+                yield tuple(values), None if code == MISSING else strings[code], config
+
+        return cls(entries())
+
+    @classmethod
+    def from_profiles(cls, profiles: Iterable[Any]) -> 'NearestIndex':
+        """Index over profiles (dicts in either layout, or Profile objects); members are their positions."""
+        def entries() -> Iterable[Tuple[Tuple[Optional[float], ...], Optional[str], int]]:
+            for row, profile in enumerate(profiles):
+                if not isinstance(profile, Profile):
+                    profile = Profile.from_dict(profile)
+                yield raw_features(profile), profile.os_target, row
+        return cls(entries())
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def normalize(self, dim: int, value: float) -> float:
+        return (_transform(FEATURE_NAMES[dim], value) - self.offsets[dim]) * self.scales[dim]
+
+    def query(self, spec: Dict[str, float], k: int = 10, os_target: Optional[str] = None) -> List[Tuple[float, int]]:
+        """The k points nearest to spec ({feature: value}) as (distance, point), nearest first.
+
+        os_target, if given, must match exactly (case-insensitive). Ties are
+        broken by point number, so results are deterministic.
+        """
+        target = {FEATURE_NAMES.index(feature): self.normalize(FEATURE_NAMES.index(feature), value)
+                  for feature, value in spec.items()}
+        wanted = os_target.lower() if os_target is not None else None
+        if k <= 0 or not self.points:
+            return []
+
+        if self._matrix is not None:
+            dims = sorted(target)
+            diff = self._matrix[:, dims] - np.array([target[dim] for dim in dims])
+            distances = np.einsum('ij,ij->i', diff, diff)
+            candidates = np.arange(len(self.points))
+            if wanted is not None:
+                candidates = candidates[self._os_mask(wanted)]
+                distances = distances[candidates]
+            if len(candidates) > k:
+                # Keep everything tied with the k-th distance so ties resolve by point number, as in the tree
+                kth = np.partition(distances, k - 1)[k - 1]
+                keep = distances <= kth
+                candidates, distances = candidates[keep], distances[keep]
+            order = np.lexsort((candidates, distances))[:k]
+            return [(math.sqrt(distances[i]), int(candidates[i])) for i in order]
+
+        tree = self._trees.get(wanted)
+        if tree is None:
+            members = [point for point in range(len(self.points))
+                       if wanted is None or (self.os[point] or "").lower() == wanted]
+            tree = self._trees[wanted] = _KDTree(self.points, members)
+        return [(math.sqrt(distance), point) for distance, point in tree.nearest(target, k)]
+
+    def _os_mask(self, wanted: str) -> Any:
+        if self._os_codes is None:
+            self._os_codes = {}
+            lowered = np.array([(os_target or "").lower() for os_target in self.os])
+            for value in set(lowered.tolist()):
+                self._os_codes[value] = lowered == value
+        mask = self._os_codes.get(wanted)
+        return mask if mask is not None else np.zeros(len(self.points), dtype=bool)
+
+    def nearest_members(self, spec: Dict[str, float], k: int = 10,
+                        os_target: Optional[str] = None) -> List[Tuple[float, int, List[Any]]]:
+        """(distance, point, members) for the nearest points, enough to hold k members.
+
+        Every point has at least one member, so the k nearest points always
+        contain the k nearest members.
+        """
+        found = []
+        count = 0
+        for distance, point in self.query(spec, k, os_target):
+            found.append((distance, point, self.members[point]))
+            count += len(self.members[point])
+            if count >= k:
+                break
+        return found
+
+
+def nearest_rows(store: ProfileStore, index: NearestIndex, spec: Dict[str, float], k: int = 10,
+                 os_target: Optional[str] = None) -> List[Tuple[float, int]]:
+    """(distance, row) for the k store rows nearest to spec, nearest first (ties in row order)."""
+    found = index.nearest_members(spec, k, os_target)
+    distance_of = {config: distance for distance, _, configs in found for config in configs}
+    configs = store.configs()
+    if np is not None:
+        config_array = np.asarray(configs)
+        rows = np.flatnonzero(np.isin(config_array, list(distance_of))).tolist()
+    else:
+        rows = [row for row, config in enumerate(configs) if config in distance_of]
+    return sorted(((distance_of[configs[row]], row) for row in rows))[:k]
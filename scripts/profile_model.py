@@ -0,0 +1,113 @@
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from profile_store import LAYOUT
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.profile_store import LAYOUT
+
+# Field -> section of the generated layout, in the order the generator writes them
+FIELD_SECTIONS: Dict[str, str] = {name: section for section, fields in LAYOUT for name, _ in fields}
+FIELDS: Tuple[str, ...] = tuple(FIELD_SECTIONS)
+
+# Spellings of the older flat layout (top-level make/model/os, hardware.cpu_count, software.browser)
+FLAT_ALIASES = {
+    "os": "os_target",
+    "cpu": "cpu_name",
+    "cpu_count": "cpu_cores",
+    "gpu": "gpu_name",
+    "browser": "primary_browser",
+    "accessibility": "accessibility_mode",
+}
+# Names Profile.get() also accepts; "manufacturer" is the CLI/API spelling of make
+FIELD_ALIASES = dict(FLAT_ALIASES, manufacturer="make")
+
+_numbers: Dict[int, int] = {}  # Interned ints: RAM sizes, years and core counts repeat across the corpus
+
+
+def intern_value(value: Any) -> Any:
+    """Returns the shared instance of a repeated string or int."""
+    if type(value) is str:
+        return sys.intern(value)
+    if type(value) is int:
+        return _numbers.setdefault(value, value)
+    return value
+
+
+class Profile:
+    """One hardware profile as a flat record with a slot per field.
+
+    The generated layout (metadata/hardware/environment/software sections)
+    and the older flat layout (top-level make/model/os, hardware.cpu_count)
+    both parse into it, so callers read `profile.make` instead of probing
+    both shapes. Values are interned: the variants of a model share their
+    strings and numbers, and a profile costs a fraction of its nested dicts.
+    Absent fields are None.
+    """
+
+    __slots__ = ("id",) + FIELDS + ("source", "config_hash")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], source: Optional[str] = None,
+                  config_hash: Optional[str] = None) -> 'Profile':
+        """Parses either layout. Values inside sections win over top-level ones."""
+        values: Dict[str, Any] = {}
+        for key, value in data.items():
+            if isinstance(value, dict):
+                continue
+            name = FLAT_ALIASES.get(key, key)
+            if name in FIELD_SECTIONS and value is not None:
+                values[name] = value
+        for key, section in data.items():
+            if not isinstance(section, dict):
+                continue
+            for name, value in section.items():
+                if value is not None:
+                    values[FLAT_ALIASES.get(name, name)] = value
+
+        profile = cls.__new__(cls)
+        profile.id = intern_value(data.get('id', 'unknown'))
+        for name in FIELDS:
+            setattr(profile, name, intern_value(values.get(name)))
+        profile.source = source
+        profile.config_hash = config_hash
+        return profile
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The nested layout written by the generator; absent fields are left out."""
+        data: Dict[str, Any] = {"id": self.id}
+        for section, fields in LAYOUT:
+            values = {}
+            for name, _ in fields:
+                value = getattr(self, name)
+                if value is not None:
+                    values[name] = value
+            if values:
+                data[section] = values
+        return data
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """A field by name or alias (os, manufacturer, cpu_count, ...); `default` if unknown or absent."""
+        name = FIELD_ALIASES.get(name, name)
+        if name != "id" and name not in FIELD_SECTIONS:
+            return default
+        value = getattr(self, name)
+        return default if value is None else value
+
+    def replace(self, **changes: Any) -> 'Profile':
+        """A copy with some slots changed, e.g. profile.replace(id=...)."""
+        profile = Profile.__new__(Profile)
+        for name in self.__slots__:
+            setattr(profile, name, changes[name] if name in changes else getattr(self, name))
+        return profile
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Profile):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in ("id",) + FIELDS)
+
+    __hash__ = None  # Mutable, like the dicts it replaces
+
+    def __repr__(self) -> str:
+        return f"Profile({self.id!r})"
@@ -0,0 +1,520 @@
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:
+    # Aggregates are computed over plain lists instead
+    np = None
+
+try:
+    from profile_store import COLUMNS, CONFIG_COLUMNS, MISSING, ProfileStore, open_store, scan_tree
+    from filter_expr import FIELD_ALIASES, FilterExpression, FilterSyntaxError, field_value
+    from instrument import STATS, add_arguments, instrumented
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.profile_store import COLUMNS, CONFIG_COLUMNS, MISSING, ProfileStore, open_store, scan_tree
+    from scripts.filter_expr import FIELD_ALIASES, FilterExpression, FilterSyntaxError, field_value
+    from scripts.instrument import STATS, add_arguments, instrumented
+
+PROFILES_DIR = os.path.join(os.path.dirname(__file__), '..', 'profiles')
+# Fields that can be grouped or summarized: name -> "int" (numeric) or "str"
+FIELDS: Dict[str, str] = {name: kind for name, (_, kind) in COLUMNS.items() if name != "dir"}
+NUMERIC_FIELDS = [name for name, kind in FIELDS.items() if kind == "int"]
+DEFAULT_PERCENTILES = [25.0, 50.0, 75.0, 90.0]
+NONE_LABEL = "(none)"
+# Fields read for the default coverage report, and the numeric ones it summarizes
+COVERAGE_RANGES = ["cpu_cores", "ram_mb", "storage_gb", "gpu_vram_mb", "year"]
+COVERAGE_FIELDS = ["make", "model", "os_target", "form_factor"] + COVERAGE_RANGES
+
+
+class Dim(NamedTuple):
+    """A grouping dimension: a field, optionally bucketed.
+
+    bucket is None for exact values, an int for fixed-width buckets, or
+    "pow2" for power-of-two buckets; only numeric fields take buckets.
+    """
+
+    field: str
+    bucket: Union[None, int, str] = None
+
+    def __str__(self) -> str:
+        return self.field if self.bucket is None else f"{self.field}:{self.bucket}"
+
+
+class Table(NamedTuple):
+    title: str
+    headers: List[str]
+    rows: List[List[Any]]
+
+
+def parse_field(name: str) -> str:
+    field = FIELD_ALIASES.get(name.strip(), name.strip())
+    if field not in FIELDS:
+        raise argparse.ArgumentTypeError(f"unknown field {name!r} (choose from {', '.join(FIELDS)})")
+    return field
+
+def parse_dim(text: str) -> Dim:
+    """FIELD, FIELD:WIDTH (fixed-width buckets) or FIELD:pow2."""
+    name, _, bucket = text.partition(":")
+    field = parse_field(name)
+    if not bucket:
+        return Dim(field)
+    if FIELDS[field] != "int":
+        raise argparse.ArgumentTypeError(f"{field} is not numeric and cannot be bucketed")
+    if bucket == "pow2":
+        return Dim(field, "pow2")
+    if not bucket.isdigit() or int(bucket) < 1:
+        raise argparse.ArgumentTypeError(f"invalid bucket {bucket!r} for {field} (a positive width or pow2)")
+    return Dim(field, int(bucket))
+
+def parse_dims(value: str) -> List[Dim]:
+    """Comma-separated dimensions, e.g. 'os_target,ram_mb:pow2'."""
+    return [parse_dim(part) for part in value.split(",") if part.strip()]
+
+def parse_numeric_fields(value: str) -> List[str]:
+    fields = [parse_field(part) for part in value.split(",") if part.strip()]
+    for field in fields:
+        if FIELDS[field] != "int":
+            raise argparse.ArgumentTypeError(f"{field} is not numeric")
+    return fields
+
+def parse_percentiles(value: str) -> List[float]:
+    try:
+        percentiles = [float(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid percentiles {value!r} (e.g. 50,90,99)") from None
+    if not all(0 <= p <= 100 for p in percentiles):
+        raise argparse.ArgumentTypeError("percentiles must be between 0 and 100")
+    return percentiles
+
+
+class Corpus:
+    """Profile fields as column arrays, read once from the packed store or a scan of the profiles tree.
+
+    With NumPy a text field is (dense codes, sorted labels) and a numeric
+    field a float64 array with NaN for absent values; without it both are
+    plain per-row lists with None for absent values.
+    """
+
+    def __init__(self, rows: int, columns: Dict[str, Any], configs: Optional[int] = None):
+        self.rows = rows
+        self.columns = columns
+        self.configs = configs  # Distinct hardware configs
+
+    @classmethod
+    def from_store(cls, store: ProfileStore, fields: Iterable[str],
+                   where: Optional[FilterExpression] = None) -> 'Corpus':
+        """Reads only `fields` (for the rows matching `where`), expanding config columns with one gather each."""
+        selection = where.rows(store) if where is not None else None
+        if np is None:
+            rows = range(len(store)) if selection is None else selection
+            columns = {}
+            for field in fields:
+                values = store.values(field)
+                columns[field] = values if selection is None else [values[row] for row in rows]
+            configs = store.configs()
+            return cls(len(rows), columns, len({configs[row] for row in rows}))
+
+        configs = np.asarray(store.configs())
+        if selection is not None:
+            configs = configs[np.asarray(selection, dtype=np.intp)]
+        columns = {}
+        for field in fields:
+            if field in CONFIG_COLUMNS:
+                raw = np.asarray(store.config_column(field))[configs]
+            else:
+                raw = np.asarray(store.column(field))
+                if selection is not None:
+                    raw = raw[np.asarray(selection, dtype=np.intp)]
+            if FIELDS[field] == "int":
+                values = raw.astype(np.float64)
+                if raw.dtype.kind != "f":
+                    values[raw == MISSING] = np.nan
+                columns[field] = values
+            else:
+                codes, inverse = np.unique(raw, return_inverse=True)
+                labels = [None if code == MISSING else store.strings[code] for code in codes.tolist()]
+                columns[field] = _sorted_levels(inverse.reshape(-1), labels)
+        return cls(len(configs), columns, int(np.unique(configs).size))
+
+    @classmethod
+    def from_profiles(cls, profiles: Iterable[Dict[str, Any]], fields: Iterable[str],
+                      where: Optional[FilterExpression] = None) -> 'Corpus':
+        """Builds the columns from profile dicts (e.g. a scan of the profiles tree).
+
+        Hardware configs are counted by their metadata/hardware values, the
+        same key the packed store deduplicates them on.
+        """
+        fields = list(fields)
+        columns: Dict[str, List[Any]] = {field: [] for field in fields}
+        configs = set()
+        rows = 0
+        for profile in profiles:
+            if where is not None and not where.matches(profile):
+                continue
+            rows += 1
+            configs.add(tuple(field_value(profile, name) for name in CONFIG_COLUMNS))
+            for field in fields:
+                value = field_value(profile, field)
+                if FIELDS[field] == "int" and value is not None:
+                    value = _number(value)
+                columns[field].append(value)
+        if np is not None:
+            for field in fields:
+                if FIELDS[field] == "int":
+                    columns[field] = np.array([np.nan if value is None else value for value in columns[field]], dtype=np.float64)
+                else:
+                    labels = sorted(set(columns[field]), key=_level_key)
+                    index = {label: code for code, label in enumerate(labels)}
+                    columns[field] = (np.array([index[value] for value in columns[field]], dtype=np.intp), labels)
+        return cls(rows, columns, len(configs))
+
+    def encode(self, dim: Dim) -> Tuple[Any, List[str]]:
+        """(per-row level codes, level labels) for a dimension; labels sort naturally with (none) last."""
+        column = self.columns[dim.field]
+        if FIELDS[dim.field] == "str":
+            if np is not None:
+                codes, labels = column
+                return codes, [NONE_LABEL if label is None else label for label in labels]
+            labels = sorted(set(column), key=_level_key)
+            index = {label: code for code, label in enumerate(labels)}
+            return [index[value] for value in column], [NONE_LABEL if label is None else label for label in labels]
+
+        if np is not None:
+            keys = np.full(column.shape, np.inf)  # +inf marks absent values and sorts last
+            present = ~np.isnan(column)
+            values = column[present]
+            if dim.bucket is None:
+                keys[present] = values
+            elif dim.bucket == "pow2":
+                keys[present] = np.where(values >= 1, np.floor(np.log2(np.maximum(values, 1))), -1)
+            else:
+                keys[present] = np.floor(values / dim.bucket)
+            levels, codes = np.unique(keys, return_inverse=True)
+            return codes.reshape(-1), [bucket_label(dim, None if math.isinf(key) else key) for key in levels.tolist()]
+
+        keys = [bucket_key(dim, value) for value in column]
+        levels = sorted(set(keys), key=_level_key)
+        index = {key: code for code, key in enumerate(levels)}
+        return [index[key] for key in keys], [bucket_label(dim, key) for key in levels]
+
+    def numbers(self, field: str) -> Any:
+        return self.columns[field]
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _level_key(value: Any) -> Tuple[bool, Any]:
+    if isinstance(value, str):
+        return (False, value.lower())
+    return (value is None, value if value is not None else 0)
+
+def _sorted_levels(codes: Any, labels: List[Optional[str]]) -> Tuple[Any, List[Optional[str]]]:
+    """Renumbers codes so labels are in natural order (case-insensitive, absent last)."""
+    order = sorted(range(len(labels)), key=lambda code: _level_key(labels[code]))
+    remap = np.empty(len(labels), dtype=np.intp)
+    remap[order] = np.arange(len(labels))
+    return remap[codes], [labels[code] for code in order]
+
+def bucket_key(dim: Dim, value: Optional[float]) -> Optional[float]:
+    if value is None:
+        return None
+    if dim.bucket is None:
+        return value
+    if dim.bucket == "pow2":
+        return float(math.floor(math.log2(value))) if value >= 1 else -1.0
+    return float(math.floor(value / dim.bucket))
+
+def bucket_label(dim: Dim, key: Optional[float]) -> str:
+    """Readable label for a bucket key: the value itself, or an inclusive 'low-high' integer range."""
+    if key is None:
+        return NONE_LABEL
+    if dim.bucket is None:
+        return format_number(key)
+    if dim.bucket == "pow2":
+        return "0" if key < 0 else f"{2 ** int(key)}-{2 ** (int(key) + 1) - 1}"
+    return f"{int(key) * dim.bucket}-{(int(key) + 1) * dim.bucket - 1}"
+
+def format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:g}"
+
+def _cell(value: Optional[float]) -> Any:
+    """A statistic for output: an int when integral, otherwise rounded to 2 places."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 2)
+
+
+# Aggregations
+
+def combine(corpus: Corpus, dims: Sequence[Dim]) -> Tuple[Any, List[Tuple[str, ...]]]:
+    """Per-row group index over the distinct label combinations of `dims`, and those combinations in label order."""
+    if not dims:
+        return (np.zeros(corpus.rows, dtype=np.intp) if np is not None else [0] * corpus.rows), [()]
+    encoded = [corpus.encode(dim) for dim in dims]
+    if np is not None:
+        sizes = [len(labels) for _, labels in encoded]
+        flat = np.ravel_multi_index([codes for codes, _ in encoded], sizes)
+        keys, groups = np.unique(flat, return_inverse=True)
+        combos = zip(*(index.tolist() for index in np.unravel_index(keys, sizes)))
+        return groups.reshape(-1), [tuple(labels[code] for (_, labels), code in zip(encoded, combo)) for combo in combos]
+    rows = list(zip(*(codes for codes, _ in encoded)))
+    distinct = sorted(set(rows))
+    index = {combo: group for group, combo in enumerate(distinct)}
+    return [index[combo] for combo in rows], [tuple(labels[code] for (_, labels), code in zip(encoded, combo)) for combo in distinct]
+
+def group_counts(corpus: Corpus, dims: Sequence[Dim]) -> List[Tuple[Tuple[str, ...], int]]:
+    """(labels, profile count) for every combination of `dims` that occurs, in label order."""
+    groups, combos = combine(corpus, dims)
+    if np is not None:
+        counts = np.bincount(groups, minlength=len(combos)).tolist()
+    else:
+        counter = Counter(groups)
+        counts = [counter[group] for group in range(len(combos))]
+    return list(zip(combos, counts))
+
+def describe(corpus: Corpus, field: str, dims: Sequence[Dim], percentiles: Sequence[float]) -> List[Tuple[Tuple[str, ...], Dict[str, Any]]]:
+    """count/missing/min/percentiles/max/mean of a numeric field per group of `dims`.
+
+    Percentiles interpolate linearly between the closest ranks, as NumPy's
+    default method does; the NumPy path computes every group at once from
+    one sort.
+    """
+    groups, combos = combine(corpus, dims)
+    values = corpus.numbers(field)
+    if np is not None:
+        present = ~np.isnan(values)
+        g, v = groups[present], values[present]
+        order = np.lexsort((v, g))
+        g, v = g[order], v[order]
+        counts = np.bincount(g, minlength=len(combos))
+        missing = np.bincount(groups[~present], minlength=len(combos))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        ends = starts + counts - 1
+        filled = counts > 0
+        stats: Dict[str, Any] = {
+            "count": counts, "missing": missing,
+            "min": np.where(filled, v[np.minimum(starts, len(v) - 1)] if len(v) else np.nan, np.nan),
+            "max": np.where(filled, v[np.maximum(ends, 0)] if len(v) else np.nan, np.nan),
+            "mean": np.where(filled, np.bincount(g, weights=v, minlength=len(combos)) / np.maximum(counts, 1), np.nan),
+        }
+        for p in percentiles:
+            position = starts + (counts - 1) * (p / 100.0)
+            low = np.floor(position).astype(np.intp)
+            high = np.minimum(low + 1, np.maximum(ends, 0))
+            if len(v):
+                low, high = np.clip(low, 0, len(v) - 1), np.clip(high, 0, len(v) - 1)
+                stats[percentile_name(p)] = np.where(filled, v[low] + (v[high] - v[low]) * (position - low), np.nan)
+            else:
+                stats[percentile_name(p)] = np.full(len(combos), np.nan)
+        columns = {name: column.tolist() for name, column in stats.items()}
+        return [(combo, {name: column[group] for name, column in columns.items()}) for group, combo in enumerate(combos)]
+
+    by_group: Dict[int, List[float]] = {group: [] for group in range(len(combos))}
+    missing_counts = Counter()
+    for group, value in zip(groups, values):
+        if value is None:
+            missing_counts[group] += 1
+        else:
+            by_group[group].append(value)
+    results = []
+    for group, combo in enumerate(combos):
+        ordered = sorted(by_group[group])
+        summary: Dict[str, Any] = {
+            "count": len(ordered), "missing": missing_counts[group],
+            "min": ordered[0] if ordered else None,
+            "max": ordered[-1] if ordered else None,
+            "mean": sum(ordered) / len(ordered) if ordered else None,
+        }
+        for p in percentiles:
+            summary[percentile_name(p)] = percentile(ordered, p)
+        results.append((combo, summary))
+    return results
+
+def percentile(ordered: List[float], p: float) -> Optional[float]:
+    """Linearly interpolated percentile of a sorted list."""
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * p / 100.0
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def percentile_name(p: float) -> str:
+    return f"p{format_number(p)}"
+
+def crosstab(corpus: Corpus, row_dim: Dim, col_dim: Dim) -> Tuple[List[str], List[str], List[List[int]]]:
+    """(row labels, column labels, counts matrix) of profiles per row × column level."""
+    row_codes, row_labels = corpus.encode(row_dim)
+    col_codes, col_labels = corpus.encode(col_dim)
+    if np is not None:
+        cells = np.bincount(row_codes * len(col_labels) + col_codes, minlength=len(row_labels) * len(col_labels))
+        return row_labels, col_labels, cells.reshape(len(row_labels), len(col_labels)).tolist()
+    matrix = [[0] * len(col_labels) for _ in row_labels]
+    for row, col in zip(row_codes, col_codes):
+        matrix[row][col] += 1
+    return row_labels, col_labels, matrix
+
+
+# Tables
+
+def counts_table(corpus: Corpus, dims: Sequence[Dim], sort: str = "key", top: Optional[int] = None) -> Table:
+    counts = group_counts(corpus, dims)
+    if sort == "count":
+        counts.sort(key=lambda item: -item[1])
+    if top:
+        counts = counts[:top]
+    rows = [list(labels) + [count, _cell(100.0 * count / corpus.rows) if corpus.rows else None] for labels, count in counts]
+    return Table(f"Profiles by {', '.join(str(dim) for dim in dims)}", [str(dim) for dim in dims] + ["profiles", "%"], rows)
+
+def describe_table(corpus: Corpus, fields: Sequence[str], dims: Sequence[Dim], percentiles: Sequence[float],
+                   sort: str = "key", top: Optional[int] = None) -> Table:
+    names = ["count", "missing", "min"] + [percentile_name(p) for p in percentiles] + ["max", "mean"]
+    rows = []
+    for field in fields:
+        results = describe(corpus, field, dims, percentiles)
+        if sort == "count":
+            results.sort(key=lambda item: -item[1]["count"])
+        if top:
+            results = results[:top]
+        rows.extend(list(labels) + [field] + [_cell(summary[name]) for name in names] for labels, summary in results)
+    title = f"{', '.join(fields)} by {', '.join(str(dim) for dim in dims)}" if dims else ", ".join(fields)
+    return Table(title, [str(dim) for dim in dims] + ["field"] + names, rows)
+
+def crosstab_table(corpus: Corpus, row_dim: Dim, col_dim: Dim) -> Table:
+    row_labels, col_labels, matrix = crosstab(corpus, row_dim, col_dim)
+    rows = [[label] + counts + [sum(counts)] for label, counts in zip(row_labels, matrix)]
+    rows.append(["Total"] + [sum(column) for column in zip(*matrix)] + [corpus.rows])
+    return Table(f"{row_dim} × {col_dim}", [f"{row_dim} \\ {col_dim}"] + col_labels + ["Total"], rows)
+
+def coverage_tables(corpus: Corpus, percentiles: Sequence[float]) -> List[Table]:
+    """The coverage report: corpus totals, per-OS counts, the main cross-tabulations and hardware ranges."""
+    summary = [
+        ["Profiles", corpus.rows],
+        ["Models", len(group_counts(corpus, [Dim("make"), Dim("model")]))],
+        ["Manufacturers", len(group_counts(corpus, [Dim("make")]))],
+        ["OS targets", len(group_counts(corpus, [Dim("os_target")]))],
+    ]
+    if corpus.configs is not None:
+        summary.append(["Hardware configs", corpus.configs])
+    return [
+        Table("Corpus", ["metric", "value"], summary),
+        counts_table(corpus, [Dim("os_target")]),
+        crosstab_table(corpus, Dim("os_target"), Dim("form_factor")),
+        crosstab_table(corpus, Dim("make"), Dim("ram_mb", "pow2")),
+        crosstab_table(corpus, Dim("make"), Dim("gpu_vram_mb", "pow2")),
+        describe_table(corpus, COVERAGE_RANGES, [], percentiles),
+    ]
+
+
+def render(tables: List[Table], output_format: str) -> str:
+    if output_format == "json":
+        return json.dumps({table.title: [dict(zip(table.headers, row)) for row in table.rows] for table in tables}, indent=2) + "\n"
+    blocks = []
+    for table in tables:
+        if output_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            if len(tables) > 1:
+                buffer.write(f"# {table.title}\n")
+            writer.writerow(table.headers)
+            writer.writerows(["" if cell is None else cell for cell in row] for row in table.rows)
+            blocks.append(buffer.getvalue())
+        else:
+            blocks.append(markdown_table(table))
+    return "\n".join(blocks)
+
+def markdown_table(table: Table) -> str:
+    def text(cell: Any) -> str:
+        return "" if cell is None else str(cell).replace("|", "\\|")
+    numeric = [all(isinstance(row[i], (int, float)) or row[i] is None for row in table.rows) and i > 0
+               for i in range(len(table.headers))]
+    lines = [f"### {table.title}", "", "| " + " | ".join(text(header) for header in table.headers) + " |",
+             "|" + "|".join("---:" if is_number else "---" for is_number in numeric) + "|"]
+    lines.extend("| " + " | ".join(text(cell) for cell in row) + " |" for row in table.rows)
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coverage matrices and statistics over the TestKit profile corpus.")
+    parser.add_argument("--by", type=parse_dims, metavar="DIMS",
+                        help="Count profiles per combination of comma-separated fields; FIELD:WIDTH or FIELD:pow2 buckets numeric fields")
+    parser.add_argument("--describe", type=parse_numeric_fields, metavar="FIELDS",
+                        help="count/missing/min/percentiles/max/mean of numeric fields (per --by group when given)")
+    parser.add_argument("--crosstab", nargs=2, action="append", type=parse_dim, metavar=("ROWS", "COLUMNS"),
+                        help="Profiles per ROWS × COLUMNS level (repeatable)")
+    parser.add_argument("--percentiles", type=parse_percentiles, default=DEFAULT_PERCENTILES, metavar="P[,P...]",
+                        help="Percentiles for --describe (default: 25,50,75,90)")
+    parser.add_argument("--where", help='Only count profiles matching a filter expression, e.g. \'os_target ~ "11"\'')
+    parser.add_argument("--sort", choices=["key", "count"], default="key", help="Order --by/--describe groups by label or by profile count (default: key)")
+    parser.add_argument("--top", type=int, help="Keep only the first N groups")
+    parser.add_argument("--format", choices=["markdown", "csv", "json"], default="markdown", help="Output format (default: markdown)")
+    parser.add_argument("--output", "-o", help="Write the tables to this file instead of stdout")
+    parser.add_argument("--no-store", action="store_true", help="Scan JSON files even if a packed profile store exists")
+    parser.add_argument("--dir", default=PROFILES_DIR, help="Profiles directory (default: profiles)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        where = FilterExpression(args.where) if args.where else None
+    except FilterSyntaxError as e:
+        parser.error(f"--where: {e}")
+
+    with instrumented(args, "profile_stats"):
+        sys.exit(run(args, where))
+
+def run(args, where: Optional[FilterExpression]) -> int:
+    """Loads the needed columns, builds the tables and writes them. Returns the exit code."""
+    dims = args.by or []
+    crosstabs = args.crosstab or []
+    report = not (dims or args.describe or crosstabs)
+    fields = set(COVERAGE_FIELDS) if report else \
+        {dim.field for dim in dims} | set(args.describe or []) | {dim.field for pair in crosstabs for dim in pair}
+
+    store = None if args.no_store else open_store(args.dir)
+    with STATS.phase("load"):
+        if store is not None:
+            with store:
+                corpus = Corpus.from_store(store, sorted(fields), where)
+        elif os.path.isdir(args.dir):
+            corpus = Corpus.from_profiles((profile for _, profile in scan_tree(args.dir)), sorted(fields), where)
+        else:
+            print(f"Error: profiles directory {args.dir} not found; run generate_profiles.py first.", file=sys.stderr)
+            return 1
+    STATS.count("profiles", corpus.rows)
+
+    with STATS.phase("aggregate"):
+        if report:
+            tables = coverage_tables(corpus, args.percentiles)
+        else:
+            tables = []
+            if args.describe:
+                tables.append(describe_table(corpus, args.describe, dims, args.percentiles, args.sort, args.top))
+            elif dims:
+                tables.append(counts_table(corpus, dims, args.sort, args.top))
+            tables.extend(crosstab_table(corpus, row_dim, col_dim) for row_dim, col_dim in crosstabs)
+
+    with STATS.phase("render"):
+        text = render(tables, args.format)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        print(f"Wrote {len(tables)} tables over {corpus.rows} profiles to {args.output}", file=sys.stderr)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+if __name__ == "__main__":
+    main()
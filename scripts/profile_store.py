@@ -0,0 +1,509 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Configuration
+PROFILES_DIR = os.path.join(os.path.dirname(__file__), '..', 'profiles')
+STORE_NAME = 'profiles.tkpack'
+STORE_PATH = os.path.join(PROFILES_DIR, STORE_NAME)
+
+MAGIC = b'TKPACK\0\0'
+VERSION = 2
+MISSING = -2147483648  # int32 sentinel for absent numeric values / string codes
+
+# Profile layout: section -> ordered (field, kind). Order matches generate_profiles output.
+LAYOUT: List[Tuple[Optional[str], List[Tuple[str, str]]]] = [
+    ("metadata", [
+        ("make", "str"),
+        ("model", "str"),
+        ("year", "int"),
+        ("os_target", "str"),
+        ("form_factor", "str"),
+    ]),
+    ("hardware", [
+        ("cpu_cores", "int"),
+        ("cpu_name", "str"),
+        ("ram_mb", "int"),
+        ("storage_gb", "int"),
+        ("gpu_name", "str"),
+        ("gpu_vram_mb", "int"),
+        ("screen_resolution", "str"),
+    ]),
+    ("environment", [
+        ("accessibility_mode", "str"),
+        ("boot_mode", "str"),
+    ]),
+    ("software", [
+        ("primary_browser", "str"),
+    ]),
+]
+
+# Sections that make up a profile's hardware configuration. The others
+# (environment, software) are per-profile overlays on top of it.
+CONFIG_SECTIONS = ("metadata", "hardware")
+
+# Flat column name -> (section, kind). 'dir' records the profiles/<os> sub-directory.
+COLUMNS: Dict[str, Tuple[Optional[str], str]] = {"dir": (None, "str")}
+for _section, _fields in LAYOUT:
+    for _name, _kind in _fields:
+        COLUMNS[_name] = (_section, _kind)
+CONFIG_COLUMNS = [name for name, (section, _) in COLUMNS.items() if section in CONFIG_SECTIONS]
+
+
+def is_profile(data: Any) -> bool:
+    """True for profile documents (skips the schema and other stray JSON)."""
+    return isinstance(data, dict) and 'id' in data and isinstance(data.get('hardware'), dict)
+
+
+def hardware_config(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """The profile minus its id and overlays: everything an exported VM/container is built from."""
+    return {key: value for key, value in profile.items() if key not in ('id', 'environment', 'software') and not key.startswith('_')}
+
+
+def config_hash(profile: Dict[str, Any]) -> str:
+    """Canonical hash of a profile's hardware configuration; variants differing only in overlays share it."""
+    canonical = json.dumps(hardware_config(profile), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def store_version(path: str) -> Optional[int]:
+    """Format version of a store file, or None if it is missing or not a store."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(len(MAGIC) + 4)
+    except OSError:
+        return None
+    if len(head) < len(MAGIC) + 4 or not head.startswith(MAGIC):
+        return None
+    return struct.unpack_from('<I', head, len(MAGIC))[0]
+
+
+def _decode_number(value: Any) -> Any:
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        return int(value) if value.is_integer() else value
+    return None if value == MISSING else value
+
+
+def _align(buf: bytearray, boundary: int = 8) -> None:
+    buf.extend(b'\0' * (-len(buf) % boundary))
+
+
+def tree_fingerprint(profiles_dir: str = PROFILES_DIR) -> Dict[str, int]:
+    """File count and newest mtime of the profile JSON files under a profiles tree.
+
+    Adding, removing or editing a profile file changes it, so a store that
+    recorded the fingerprint of the tree it was packed from can tell when
+    the tree has moved on without it. Only stats the files.
+    """
+    files = newest = 0
+    for os_dir in os.scandir(profiles_dir):
+        if not os_dir.is_dir():
+            continue
+        for entry in os.scandir(os_dir.path):
+            if entry.name.endswith('.json'):
+                files += 1
+                newest = max(newest, entry.stat().st_mtime_ns)
+    return {"files": files, "mtime_ns": newest}
+
+
+def write_store(entries: Iterable[Tuple[str, Dict[str, Any]]], path: str = STORE_PATH,
+                tree: Optional[Dict[str, int]] = None) -> int:
+    """Packs (relative_path, profile) pairs into a single columnar store file.
+
+    relative_path is the file's location under the profiles directory
+    (e.g. 'win10/<id>.json'); only its directory is stored unless the file
+    name differs from the profile id. `tree` is the tree_fingerprint of the
+    directory the entries were read from; open_store ignores stores without
+    a matching one, so prefer pack_tree, which records it.
+
+    Each distinct hardware configuration (metadata + hardware) is stored
+    once; rows hold a config index plus their environment/software overlay.
+    Numeric fields become int32 column arrays, text fields become int32 codes
+    into one shared string table, and ids are kept in a blob with an offset
+    table plus a sorted order for O(log n) id lookups.
+    """
+    strings: List[str] = []
+    codes: Dict[str, int] = {}
+    columns = {name: array('i') for name in COLUMNS}
+    ids: List[bytes] = []
+    filenames: Dict[int, str] = {}
+    config_rows: Dict[Tuple[Any, ...], int] = {}
+    config_hashes: List[str] = []
+    config_of = array('i')
+
+    def encode(value: Any) -> int:
+        if value is None:
+            return MISSING
+        value = str(value)
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(strings)
+            strings.append(value)
+        return code
+
+    for rel_path, profile in entries:
+        os_dir, filename = os.path.split(rel_path)
+        if filename != f"{profile['id']}.json":
+            filenames[len(ids)] = filename
+        ids.append(str(profile['id']).encode('utf-8'))
+        columns['dir'].append(encode(os_dir))
+        # Key on the stored config values so only new configs need hashing
+        key = tuple((profile.get(COLUMNS[name][0]) or {}).get(name) for name in CONFIG_COLUMNS)
+        config = config_rows.get(key)
+        is_new_config = config is None
+        if is_new_config:
+            config = config_rows[key] = len(config_rows)
+            config_hashes.append(config_hash(profile))
+        config_of.append(config)
+        for section, fields in LAYOUT:
+            if section in CONFIG_SECTIONS and not is_new_config:
+                continue
+            values = profile.get(section) or {}
+            for name, kind in fields:
+                value = values.get(name)
+                if kind == "int":
+                    if value is not None and not float(value).is_integer() and columns[name].typecode == 'i':
+                        # Fractional values (e.g. 0.36 GB of storage) promote the column to float64
+                        columns[name] = array('d', [float('nan') if v == MISSING else v for v in columns[name]])
+                    if columns[name].typecode == 'd':
+                        columns[name].append(float('nan') if value is None else float(value))
+                    else:
+                        columns[name].append(MISSING if value is None else int(value))
+                else:
+                    columns[name].append(encode(value))
+
+    rows = len(ids)
+    id_offsets = array('I', [0])
+    for raw in ids:
+        id_offsets.append(id_offsets[-1] + len(raw))
+    id_order = array('I', sorted(range(rows), key=ids.__getitem__))
+
+    # Lay out the data sections; offsets are relative to the start of the data block
+    data = bytearray()
+    layout: Dict[str, int] = {}
+    extra = [('@config', config_of), ('@id_offsets', id_offsets), ('@id_order', id_order)]
+    for name, values in list(columns.items()) + extra:
+        _align(data)
+        layout[name] = len(data)
+        data.extend(values.tobytes())
+    _align(data)
+    layout['@id_blob'] = len(data)
+    data.extend(b''.join(ids))
+
+    header = json.dumps({
+        "rows": rows,
+        "configs": config_hashes,
+        "byteorder": sys.byteorder,
+        "strings": strings,
+        "filenames": filenames,
+        "types": {name: values.typecode for name, values in columns.items()},
+        "sections": layout,
+        "tree": tree,
+    }).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<II', VERSION, len(header)))
+        f.write(header)
+        f.write(data)
+    os.replace(tmp_path, path)
+    return rows
+
+
+class ProfileStore:
+    """Read-only, memory-mapped view over a packed profile store.
+
+    Nothing is decoded up front: columns are zero-copy views into the mapped
+    file and rows are only materialized into dicts when asked for.
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a TestKit profile store")
+        version, header_len = struct.unpack_from('<II', self._mm, len(MAGIC))
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported profile store version {version} in {path}")
+        start = len(MAGIC) + 8
+        header = json.loads(self._mm[start:start + header_len])
+        self._data_start = start + header_len
+        self.rows: int = header['rows']
+        self.config_hashes: List[str] = header['configs']
+        self.strings: List[str] = header['strings']
+        self._sections: Dict[str, int] = header['sections']
+        self._types: Dict[str, str] = header['types']
+        self._filenames: Dict[str, str] = header['filenames']
+        self.tree: Optional[Dict[str, int]] = header.get('tree')
+        self._swap = header['byteorder'] != sys.byteorder
+        self._views: Dict[str, Any] = {}
+
+    def __enter__(self) -> 'ProfileStore':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self) -> None:
+        for view in self._views.values():
+            if isinstance(view, memoryview):
+                view.release()
+        self._views = {}
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def _array(self, name: str, typecode: str, count: int) -> Any:
+        view = self._views.get(name)
+        if view is None:
+            start = self._data_start + self._sections[name]
+            raw = memoryview(self._mm)[start:start + count * array(typecode).itemsize]
+            if self._swap:
+                view = array(typecode, raw.tobytes())
+                view.byteswap()
+                raw.release()
+            else:
+                view = raw.cast(typecode)
+            self._views[name] = view
+        return view
+
+    def config_column(self, name: str) -> Any:
+        """Raw column over distinct configs for metadata/hardware fields, over rows otherwise."""
+        if name not in COLUMNS:
+            raise KeyError(f"Unknown column: {name}")
+        count = len(self.config_hashes) if name in CONFIG_COLUMNS else self.rows
+        return self._array(name, self._types[name], count)
+
+    def column(self, name: str) -> Any:
+        """Raw per-row column: numbers for numeric fields, string-table codes for text fields.
+
+        Numeric columns are int32 (MISSING marks absent values) unless the
+        corpus holds fractional values, in which case they are float64 (NaN).
+        Config fields are expanded from the config table once and cached.
+        """
+        if name not in CONFIG_COLUMNS:
+            return self.config_column(name)
+        key = '@rows:' + name
+        view = self._views.get(key)
+        if view is None:
+            per_config = self.config_column(name)
+            view = self._views[key] = array(self._types[name], (per_config[c] for c in self.configs()))
+        return view
+
+    def configs(self) -> Any:
+        """Per-row index into the config table (see config_hashes)."""
+        return self._array('@config', 'i', self.rows)
+
+    def config_hash(self, row: int) -> str:
+        return self.config_hashes[self.configs()[row]]
+
+    def values(self, name: str) -> List[Any]:
+        """Decoded column values (None where the profile has no value)."""
+        column = self.column(name)
+        if COLUMNS[name][1] == "int":
+            return [_decode_number(v) for v in column]
+        strings = self.strings
+        return [None if c == MISSING else strings[c] for c in column]
+
+    def codes_matching(self, predicate: Any) -> set:
+        """String-table codes whose text satisfies predicate (evaluated once per distinct string)."""
+        return {code for code, text in enumerate(self.strings) if predicate(text)}
+
+    def id_at(self, row: int) -> str:
+        offsets = self._array('@id_offsets', 'I', self.rows + 1)
+        start = self._data_start + self._sections['@id_blob']
+        return self._mm[start + offsets[row]:start + offsets[row + 1]].decode('utf-8')
+
+    def row_of(self, profile_id: str) -> Optional[int]:
+        """Row number for a profile id, or None (binary search over the sorted id order)."""
+        order = self._array('@id_order', 'I', self.rows)
+        offsets = self._array('@id_offsets', 'I', self.rows + 1)
+        blob = self._data_start + self._sections['@id_blob']
+        target = profile_id.encode('utf-8')
+
+        lo, hi = 0, self.rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            row = order[mid]
+            key = self._mm[blob + offsets[row]:blob + offsets[row + 1]]
+            if key == target:
+                return row
+            if key < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def relative_path(self, row: int) -> str:
+        """Path of the row's JSON file relative to the profiles directory."""
+        code = self.column('dir')[row]
+        os_dir = self.strings[code] if code != MISSING else ''
+        filename = self._filenames.get(str(row)) or f"{self.id_at(row)}.json"
+        return os.path.join(os_dir, filename)
+
+    def profile(self, row: int) -> Dict[str, Any]:
+        """Materializes a row into the nested profile dict written by the generator."""
+        strings = self.strings
+        config = self.configs()[row]
+        profile: Dict[str, Any] = {"id": self.id_at(row)}
+        for section, fields in LAYOUT:
+            index = config if section in CONFIG_SECTIONS else row
+            values = {}
+            for name, kind in fields:
+                raw = self.config_column(name)[index]
+                if kind == "int":
+                    raw = _decode_number(raw)
+                    if raw is not None:
+                        values[name] = raw
+                elif raw != MISSING:
+                    values[name] = strings[raw]
+            if values:
+                profile[section] = values
+        return profile
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        row = self.row_of(profile_id)
+        return None if row is None else self.profile(row)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in range(self.rows):
+            yield self.profile(row)
+
+    def expand(self, profiles_dir: str = PROFILES_DIR) -> int:
+        """Writes every row back out as profiles/<os>/<id>.json."""
+        created = set()
+        for row in range(self.rows):
+            rel_path = self.relative_path(row)
+            target_dir = os.path.join(profiles_dir, os.path.dirname(rel_path))
+            if target_dir not in created:
+                os.makedirs(target_dir, exist_ok=True)
+                created.add(target_dir)
+            with open(os.path.join(profiles_dir, rel_path), 'w') as f:
+                json.dump(self.profile(row), f, indent=2)
+        return self.rows
+
+
+def open_store(profiles_dir: str = PROFILES_DIR, check_tree: bool = True) -> Optional[ProfileStore]:
+    """Opens the store that lives alongside a profiles tree, if it is current.
+
+    Returns None when there is no store, when it is an older format, or when
+    the tree has changed since it was packed (its fingerprint no longer
+    matches), so callers fall back to scanning the JSON files. The
+    fingerprint check stats every profile file (about 0.15 s for the 22k
+    file corpus); callers that have just packed the tree themselves can pass
+    check_tree=False to skip it.
+    """
+    path = os.path.join(profiles_dir, STORE_NAME)
+    if not os.path.exists(path):
+        return None
+    if store_version(path) != VERSION:
+        print(f"Warning: Ignoring outdated profile store {path}; rerun generate_profiles.py or 'profile_store.py pack'.",
+              file=sys.stderr)
+        return None
+    store = ProfileStore(path)
+    if check_tree and store.tree != tree_fingerprint(profiles_dir):
+        store.close()
+        print(f"Warning: Ignoring stale profile store {path} (the profiles tree changed since it was packed); "
+              f"rerun generate_profiles.py or 'profile_store.py pack'.", file=sys.stderr)
+        return None
+    return store
+
+
+def is_store_current(profiles_dir: str = PROFILES_DIR, path: Optional[str] = None) -> bool:
+    """True when the store exists in the current format and was packed from the tree as it is now."""
+    path = path or os.path.join(profiles_dir, STORE_NAME)
+    if store_version(path) != VERSION:
+        return False
+    with ProfileStore(path) as store:
+        return store.tree == tree_fingerprint(profiles_dir)
+
+
+def scan_tree(profiles_dir: str = PROFILES_DIR,
+              known: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yields (relative_path, profile) for every profile JSON file under a profiles tree.
+
+    `known` maps relative paths to profiles the caller already holds (e.g.
+    the ones it just wrote); those files are not read back.
+    """
+    known = known or {}
+    for os_dir in sorted(os.listdir(profiles_dir)):
+        dir_path = os.path.join(profiles_dir, os_dir)
+        if not os.path.isdir(dir_path):
+            continue
+        for filename in sorted(os.listdir(dir_path)):
+            if not filename.endswith('.json'):
+                continue
+            rel_path = os.path.join(os_dir, filename)
+            if rel_path in known:
+                yield rel_path, known[rel_path]
+                continue
+            try:
+                with open(os.path.join(dir_path, filename), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Skipping {os_dir}/{filename}: {e}", file=sys.stderr)
+                continue
+            if is_profile(data):
+                yield rel_path, data
+
+
+def pack_tree(profiles_dir: str = PROFILES_DIR, path: Optional[str] = None,
+              known: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+    """Packs every profile under a profiles tree (generated or hand-authored) into its store.
+
+    The tree is fingerprinted before it is read, so a file changed while
+    packing leaves the store stale rather than silently out of date.
+    """
+    tree = tree_fingerprint(profiles_dir)
+    return write_store(scan_tree(profiles_dir, known), path or os.path.join(profiles_dir, STORE_NAME), tree)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack, expand and inspect the TestKit profile store.")
+    parser.add_argument("command", choices=["pack", "expand", "info"])
+    parser.add_argument("--dir", "-d", default=PROFILES_DIR, help="Profiles directory (default: profiles)")
+    parser.add_argument("--store", "-s", help=f"Store file (default: <dir>/{STORE_NAME})")
+
+    args = parser.parse_args()
+    store_path = args.store or os.path.join(args.dir, STORE_NAME)
+
+    if args.command == "pack":
+        count = pack_tree(args.dir, store_path)
+        print(f"Packed {count} profiles into {store_path} ({os.path.getsize(store_path)} bytes)")
+        return
+
+    if not os.path.exists(store_path):
+        print(f"Error: Store {store_path} not found. Run 'pack' or generate_profiles.py first.")
+        sys.exit(1)
+
+    with ProfileStore(store_path) as store:
+        if args.command == "expand":
+            count = store.expand(args.dir)
+            print(f"Expanded {count} profiles into {args.dir}")
+        else:
+            print(f"Store: {store_path}")
+            print(f"Profiles: {len(store)}")
+            print(f"Distinct hardware configs: {len(store.config_hashes)}")
+            print(f"Distinct strings: {len(store.strings)}")
+            print(f"Size: {os.path.getsize(store_path)} bytes")
+
+
+if __name__ == "__main__":
+    main()
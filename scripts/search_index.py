@@ -0,0 +1,255 @@
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from profile_model import Profile
+    from profile_store import is_profile
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.profile_model import Profile
+    from scripts.profile_store import is_profile
+
+INDEX_NAME = '.search_index'
+INDEX_MAGIC = b'TKINDEX\0'
+INDEX_VERSION = 2
+
+# Fields covered by the index, in the order they are stored per document
+INDEXED_FIELDS = ("id", "make", "model", "os_target", "cpu_name", "gpu_name")
+# Fields joined into the text a query without --field matches (mirrors search_profiles.profile_matches)
+DEFAULT_FIELDS = ("make", "model", "os_target", "id")
+
+# Rebuild posting lists once this share of document slots are tombstones
+COMPACT_RATIO = 0.25
+
+# A scanned file: (relative_path, mtime_ns, size)
+Listing = List[Tuple[str, int, int]]
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def extract_fields(profile: Dict[str, Any]) -> Tuple[str, ...]:
+    """Lower-cased INDEXED_FIELDS values from either profile layout ('' when absent)."""
+    parsed = Profile.from_dict(profile)
+    return tuple(str(parsed.get(field, "")).lower() for field in INDEXED_FIELDS)
+
+
+def default_text(fields: Tuple[str, ...]) -> str:
+    """The "make model os id" text an unfielded query is matched against."""
+    return " ".join(fields[INDEXED_FIELDS.index(name)] for name in DEFAULT_FIELDS)
+
+
+def listing_fingerprint(listing: Listing) -> Dict[str, int]:
+    """File count and newest mtime of a scan, as recorded in the index header."""
+    return {"files": len(listing), "mtime_ns": max((mtime_ns for _, mtime_ns, _ in listing), default=0)}
+
+
+class SearchIndex:
+    """Persistent trigram index over the profile JSON tree.
+
+    Each document slot holds (relative_path, mtime_ns, size, fields), where
+    fields is None for files that are not profiles. Posting lists map a
+    trigram to the sorted slot numbers containing it. Changed files get a
+    new slot and the old one is tombstoned, so posting lists only ever grow
+    at the tail until the index is compacted.
+
+    The file is a JSON header (version, fields, tree fingerprint, documents
+    and posting offsets) followed by the posting lists as one uint32 array,
+    so loading it never executes anything from disk.
+    """
+
+    def __init__(self, profiles_dir: str):
+        self.profiles_dir = profiles_dir
+        self.path = os.path.join(profiles_dir, INDEX_NAME)
+        self.docs: List[Optional[Tuple[str, int, int, Optional[Tuple[str, ...]]]]] = []
+        self.by_path: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}
+        self.tree: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def load(cls, profiles_dir: str) -> 'SearchIndex':
+        """Loads the persisted index (or starts an empty one) and brings it up to date.
+
+        When the tree's fingerprint (file count, newest mtime) still matches
+        the header, the index is used as is; otherwise only files whose
+        mtime/size changed are re-read.
+        """
+        index = cls(profiles_dir)
+        try:
+            index._read()
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            index.__init__(profiles_dir)
+        listing = list(index._scan())
+        if index.tree != listing_fingerprint(listing):
+            index.refresh(listing)
+            index.save()
+        return index
+
+    def _read(self) -> None:
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        if not raw.startswith(INDEX_MAGIC):
+            raise ValueError(f"{self.path} is not a TestKit search index")
+        version, header_len = struct.unpack_from('<II', raw, len(INDEX_MAGIC))
+        if version != INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version {version} in {self.path}")
+        start = len(INDEX_MAGIC) + 8
+        header = json.loads(raw[start:start + header_len])
+        if tuple(header['fields']) != INDEXED_FIELDS:
+            raise ValueError(f"{self.path} indexes different fields")
+
+        data = memoryview(raw)[start + header_len:]
+        itemsize = array('I').itemsize
+        postings = {}
+        for gram, (offset, count) in header['postings'].items():
+            posting = array('I')
+            posting.frombytes(data[offset * itemsize:(offset + count) * itemsize])
+            if len(posting) != count:
+                raise ValueError(f"{self.path} is truncated")
+            if header['byteorder'] != sys.byteorder:
+                posting.byteswap()
+            postings[gram] = posting
+
+        self.docs = [None if doc is None else (doc[0], doc[1], doc[2], None if doc[3] is None else tuple(doc[3]))
+                     for doc in header['docs']]
+        self.postings = postings
+        self.by_path = {doc[0]: slot for slot, doc in enumerate(self.docs) if doc is not None}
+        self.tree = header['tree']
+
+    def save(self) -> None:
+        data = bytearray()
+        offsets = {}
+        itemsize = array('I').itemsize
+        for gram, posting in self.postings.items():
+            offsets[gram] = (len(data) // itemsize, len(posting))
+            data.extend(posting.tobytes())
+        header = json.dumps({
+            "fields": INDEXED_FIELDS,
+            "byteorder": sys.byteorder,
+            "tree": self.tree,
+            "docs": self.docs,
+            "postings": offsets,
+        }).encode('utf-8')
+        header += b' ' * (-(len(INDEX_MAGIC) + 8 + len(header)) % itemsize)
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(INDEX_MAGIC)
+            f.write(struct.pack('<II', INDEX_VERSION, len(header)))
+            f.write(header)
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        """Number of indexed profiles (stray JSON files are tracked but not counted)."""
+        return sum(1 for slot in self.by_path.values() if self.docs[slot][3] is not None)
+
+    def _add(self, rel_path: str, mtime_ns: int, size: int, fields: Optional[Tuple[str, ...]]) -> None:
+        slot = len(self.docs)
+        self.docs.append((rel_path, mtime_ns, size, fields))
+        self.by_path[rel_path] = slot
+        if fields is None:
+            return
+        # Every single-field value is a substring of the default text, except the cpu/gpu names
+        grams = trigrams(default_text(fields))
+        for name, value in zip(INDEXED_FIELDS, fields):
+            if name not in DEFAULT_FIELDS:
+                grams |= trigrams(value)
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array('I')
+            posting.append(slot)
+
+    def _remove(self, rel_path: str) -> None:
+        slot = self.by_path.pop(rel_path)
+        self.docs[slot] = None
+
+    def _scan(self, rel_dir: str = "") -> Iterable[Tuple[str, int, int]]:
+        with os.scandir(os.path.join(self.profiles_dir, rel_dir)) as entries:
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir():
+                    yield from self._scan(rel_path)
+                elif entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    yield rel_path, stat.st_mtime_ns, stat.st_size
+
+    def refresh(self, listing: Optional[Listing] = None) -> int:
+        """Re-reads only files whose mtime/size changed. Returns the number of updates."""
+        listing = list(self._scan()) if listing is None else listing
+        seen = set()
+        updates = 0
+        for rel_path, mtime_ns, size in listing:
+            seen.add(rel_path)
+            slot = self.by_path.get(rel_path)
+            if slot is not None:
+                doc = self.docs[slot]
+                if doc[1] == mtime_ns and doc[2] == size:
+                    continue
+                self._remove(rel_path)
+            try:
+                with open(os.path.join(self.profiles_dir, rel_path), 'r', encoding='utf-8') as f:
+                    profile = json.load(f)
+            except (OSError, ValueError):
+                profile = None
+            # Unreadable and non-profile files are still recorded (without fields) so they are not re-read
+            fields = extract_fields(profile) if is_profile(profile) else None
+            self._add(rel_path, mtime_ns, size, fields)
+            updates += 1
+
+        for rel_path in [p for p in self.by_path if p not in seen]:
+            self._remove(rel_path)
+            updates += 1
+
+        if updates and len(self.docs) - len(self.by_path) > COMPACT_RATIO * len(self.docs):
+            self.compact()
+        self.tree = listing_fingerprint(listing)
+        return updates
+
+    def compact(self) -> None:
+        """Drops tombstoned slots and rebuilds the posting lists from stored fields."""
+        live = [doc for doc in self.docs if doc is not None]
+        self.docs, self.by_path, self.postings = [], {}, {}
+        for doc in live:
+            self._add(*doc)
+
+    def candidates(self, query: str) -> Iterable[int]:
+        """Slots that contain every trigram of the query (a superset of the matches)."""
+        grams = trigrams(query)
+        if not grams:
+            return (slot for slot in self.by_path.values())
+        postings = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if not result:
+                break
+        return sorted(result)
+
+    def search(self, query: str, field: Optional[str] = None) -> List[str]:
+        """Relative paths of profiles whose field (or "make model os id" text) contains query, case-insensitively."""
+        query = query.lower()
+        position = INDEXED_FIELDS.index(field) if field else None
+
+        matches = []
+        for slot in self.candidates(query):
+            doc = self.docs[slot]
+            if doc is None or doc[3] is None:
+                continue
+            rel_path, _, _, fields = doc
+            text = fields[position] if position is not None else default_text(fields)
+            if query in text:
+                matches.append(rel_path)
+        return matches
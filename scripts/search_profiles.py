@@ -1,19 +1,147 @@
 import argparse
+import contextlib
 import json
 import os
 import sys
 from pathlib import Path
 
+try:
+    from profile_store import COLUMNS, MISSING, is_profile, open_store
+    from search_index import INDEXED_FIELDS, SearchIndex
+    from migrate_to_sqlite import DB_PATH, PROFILE_COLUMNS, open_db, query_profiles, search_text_condition
+    from filter_expr import FilterExpression, FilterSyntaxError
+    from jsonl import open_stream, read_profiles, write_profiles
+    from profile_model import Profile
+    from nearest import NearestIndex, SpecError, nearest_rows, parse_spec
+    from instrument import STATS, add_arguments, instrumented
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.profile_store import COLUMNS, MISSING, is_profile, open_store
+    from scripts.search_index import INDEXED_FIELDS, SearchIndex
+    from scripts.migrate_to_sqlite import DB_PATH, PROFILE_COLUMNS, open_db, query_profiles, search_text_condition
+    from scripts.filter_expr import FilterExpression, FilterSyntaxError
+    from scripts.jsonl import open_stream, read_profiles, write_profiles
+    from scripts.profile_model import Profile
+    from scripts.nearest import NearestIndex, SpecError, nearest_rows, parse_spec
+    from scripts.instrument import STATS, add_arguments, instrumented
+
+# CLI field names that map onto a differently named profile field
+FIELD_ALIASES = {"os": "os_target"}
+
 def load_profile(file_path):
+    """Parsed JSON of a profile file, or None (with a warning on stderr) if it cannot be read."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
+        with STATS.phase("parse"), open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not load {file_path}: {e}", file=sys.stderr)
+        STATS.count("files_failed")
         return None
+    STATS.count("files_parsed")
+    return data
 
-def search_profiles(profiles_dir, query, field=None):
-    matches = []
+def profile_matches(profile, query, field=None):
+    """Substring match on one field of a Profile, or on make/model/os/id when no field is given."""
+    if field:
+        return query.lower() in str(profile.get(field, "")).lower()
+    search_text = f"{profile.make or ''} {profile.model or ''} {profile.os_target or ''} {profile.id}".lower()
+    return query.lower() in search_text
+
+def search_stream(profiles, query, field=None, where=None):
+    """Lazily yields the matching profile dicts of a profile stream, one at a time, unchanged."""
+    for data in profiles:
+        profile = Profile.from_dict(data)
+        if where is not None and not where.matches(profile):
+            continue
+        if profile_matches(profile, query, field):
+            yield data
+
+def search_store(store, profiles_dir, query, field=None, where=None):
+    """Searches a packed profile store; text fields are matched once per distinct string."""
+    query = query.lower()
+    rows = where.rows(store) if where is not None else range(len(store))
+
+    if field:
+        name = FIELD_ALIASES.get(field, field)
+        if name == "id":
+            matched = [row for row in rows if query in store.id_at(row).lower()]
+        elif COLUMNS[name][1] == "str":
+            codes = store.codes_matching(lambda text: query in text.lower())
+            column = store.column(name)
+            matched = [row for row in rows if column[row] in codes]
+        else:
+            values = store.values(name)
+            matched = [row for row in rows if query in str(values[row] if values[row] is not None else "").lower()]
+    else:
+        # The same "make model os id" text profile_matches searches, built once per distinct
+        # (make, model, os) triple; only the id differs between the rows that share it
+        columns = [store.column(name) for name in ("make", "model", "os_target")]
+        strings = store.strings
+        prefixes = {}
+        matched = []
+        for row in rows:
+            triple = (columns[0][row], columns[1][row], columns[2][row])
+            prefix = prefixes.get(triple)
+            if prefix is None:
+                text = " ".join("" if code == MISSING else strings[code] for code in triple).lower() + " "
+                # A match either lies within the prefix or ends in the id, so only its last characters matter then
+                prefix = prefixes[triple] = (query in text, text[max(0, len(text) - len(query) + 1):])
+            if prefix[0] or query in prefix[1] + store.id_at(row).lower():
+                matched.append(row)
+
+    return [os.path.join(profiles_dir, store.relative_path(row)) for row in matched]
+
+def search_db(conn, profiles_dir, query, field=None, where=None):
+    """Searches the profiles table of the hardware database with SQL lookups.
+
+    A field query is an indexed lookup on that column. Without a field the
+    query is matched against the same "make model os id" text as the file
+    scan, so it can span fields.
+    """
+    conditions = [where.to_sql()] if where is not None else []
+    contains = None
+    if query and field:
+        contains = {FIELD_ALIASES.get(field, field): query}
+    elif query:
+        conditions.append(search_text_condition(query))
+    condition = None
+    if conditions:
+        condition = (" AND ".join(f"({clause})" for clause, _ in conditions), [param for _, params in conditions for param in params])
+    return sorted(os.path.join(profiles_dir, row["path"]) for row in query_profiles(conn, contains=contains, where=condition))
+
+def search_profiles(profiles_dir, query, field=None, use_store=True, use_index=True, db_path=None, where=None):
     print(f"Searching in {profiles_dir}...")
+
+    if db_path and (not field or FIELD_ALIASES.get(field, field) in PROFILE_COLUMNS):
+        conn = open_db(db_path)
+        try:
+            with STATS.phase("query"):
+                matches = search_db(conn, profiles_dir, query, field, where)
+            count = conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+        finally:
+            conn.close()
+        print(f"Queried {count} profiles (SQLite). Found {len(matches)} matches.")
+        return matches
+
+    # The trigram index holds no numeric fields, so --where searches go to the store or files
+    if use_index and where is None and (not field or FIELD_ALIASES.get(field, field) in INDEXED_FIELDS):
+        with STATS.phase("index"):
+            index = SearchIndex.load(str(profiles_dir))
+        with STATS.phase("query"):
+            matches = [os.path.join(profiles_dir, rel_path) for rel_path in index.search(query, FIELD_ALIASES.get(field, field))]
+        print(f"Searched {len(index)} profiles (trigram index). Found {len(matches)} matches.")
+        return matches
+
+    store = open_store(profiles_dir) if use_store else None
+    if store is not None and (not field or field == "id" or FIELD_ALIASES.get(field, field) in COLUMNS):
+        with store, STATS.phase("query"):
+            matches = search_store(store, profiles_dir, query, field, where)
+            print(f"Scanned {len(store)} profiles (packed store). Found {len(matches)} matches.")
+        return matches
+    if store is not None:
+        store.close()
+
+    matches = []
     
     count = 0
     for root, _, files in os.walk(profiles_dir):
@@ -22,48 +150,189 @@ def search_profiles(profiles_dir, query, field=None):
                 continue
             
             count += 1
+            STATS.count("files_scanned")
             if count % 1000 == 0:
                 print(f"Scanned {count} profiles...", end='\r')
 
             file_path = os.path.join(root, file)
-            
-            # Optimization: Check filename first if field is not specified
-            if not field and query.lower() in file.lower():
-                matches.append(file_path)
-                continue
 
-            # Deep inspection
-            profile = load_profile(file_path)
-            if not profile:
+            # Every file is parsed: a file name match says nothing about the make/model/os text,
+            # and stray JSON such as profile_schema.json must not match
+            data = load_profile(file_path)
+            if not is_profile(data):
                 continue
-
-            if field:
-                val = str(profile.get(field, "")).lower()
-                if query.lower() in val:
-                    matches.append(file_path)
-            else:
-                # Search common fields
-                search_text = f"{profile.get('make', '')} {profile.get('model', '')} {profile.get('os', '')} {profile.get('id', '')}".lower()
-                if query.lower() in search_text:
+            with STATS.phase("filter"):
+                profile = Profile.from_dict(data, source=file_path)
+                if (where is None or where.matches(profile)) and profile_matches(profile, query, field):
                     matches.append(file_path)
 
     print(f"Scanned {count} profiles. Found {len(matches)} matches.")
     return matches
 
+def nearest_profiles(profiles, spec, k=10, os_target=None):
+    """(distance, Profile) for the k profiles nearest to spec, nearest first (ties in input order)."""
+    profiles = list(profiles)
+    with STATS.phase("index"):
+        index = NearestIndex.from_profiles(profiles)
+    with STATS.phase("query"):
+        found = sorted((distance, row) for distance, _, rows in index.nearest_members(spec, k, os_target) for row in rows)
+    print(f"Indexed {len(profiles)} profiles as {len(index)} feature points.", file=sys.stderr)
+    return [(distance, profiles[row]) for distance, row in found[:k]]
+
+def search_nearest(profiles_dir, spec, k=10, os_target=None, use_store=True):
+    """(distance, Profile) for the k profiles of a directory nearest to spec, nearest first.
+
+    The packed store's config table doubles as the index's point set, so
+    only distinct hardware configurations are measured. Without a store
+    the JSON files are loaded and indexed first.
+    """
+    store = open_store(profiles_dir) if use_store else None
+    if store is not None:
+        with store:
+            with STATS.phase("index"):
+                index = NearestIndex.from_store(store)
+            with STATS.phase("query"):
+                found = nearest_rows(store, index, spec, k, os_target)
+            print(f"Indexed {len(store)} profiles as {len(index)} feature points (packed store).", file=sys.stderr)
+            return [
+                (distance, Profile.from_dict(store.profile(row), source=os.path.join(profiles_dir, store.relative_path(row))))
+                for distance, row in found
+            ]
+
+    def tree_profiles():
+        for root, _, files in os.walk(profiles_dir):
+            for file in sorted(files):
+                if not file.endswith('.json'):
+                    continue
+                STATS.count("files_scanned")
+                file_path = os.path.join(root, file)
+                data = load_profile(file_path)
+                if is_profile(data):
+                    yield Profile.from_dict(data, source=file_path)
+
+    return nearest_profiles(tree_profiles(), spec, k, os_target)
+
+def format_nearest(distance, profile):
+    specs = [
+        f"{profile.cpu_cores} cores" if profile.cpu_cores is not None else None,
+        f"{profile.ram_mb} MB RAM" if profile.ram_mb is not None else None,
+        f"{profile.storage_gb} GB" if profile.storage_gb is not None else None,
+        f"{profile.gpu_vram_mb} MB VRAM" if profile.gpu_vram_mb is not None else None,
+        profile.screen_resolution,
+        str(profile.year) if profile.year is not None else None,
+        profile.os_target,
+    ]
+    return f" {distance:6.3f}  {profile.id}  ({', '.join(spec for spec in specs if spec)})"
+
+def write_stream(profiles):
+    """Writes profiles as JSON Lines to stdout; returns how many were written."""
+    try:
+        with open_stream('-', 'w') as out:
+            return write_profiles(profiles, out)
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); silence the error Python would print at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+
 def main():
     parser = argparse.ArgumentParser(description="Search TestKit hardware profiles.")
-    parser.add_argument("query", help="Search term (e.g., 'Dell', 'Windows 11')")
+    parser.add_argument("query", nargs="?", default="", help="Search term (e.g., 'Dell', 'Windows 11')")
     parser.add_argument("--field", "-f", help="Specific field to search (e.g., 'make', 'model', 'os')")
     parser.add_argument("--dir", "-d", default="profiles", help="Profiles directory (default: profiles)")
+    parser.add_argument("--no-store", action="store_true", help="Scan JSON files even if a packed profile store exists")
+    parser.add_argument("--no-index", action="store_true", help="Skip the persistent trigram index")
+    parser.add_argument("--where", "-w", help='Filter expression, e.g. \'ram_mb >= 8192 and os ~ "11"\'')
+    parser.add_argument("--db", nargs="?", const=DB_PATH, help="Query the profiles table of the SQLite hardware database (default: scripts/db/hardware.db)")
+    parser.add_argument("--input", "-i", metavar="FILE", help="Search a JSON Lines profile stream instead of the profiles directory ('-' for stdin)")
+    parser.add_argument("--jsonl", action="store_true", help="Write the matching profiles to stdout as JSON Lines (messages go to stderr)")
+    parser.add_argument("--near", metavar="SPEC", help='Find the profiles closest to a spec, e.g. "cores=6 ram=12GB resolution=2560x1440 vram=4GB"')
+    parser.add_argument("-k", type=int, default=10, help="Number of profiles --near returns (default: 10)")
+    parser.add_argument("--os", dest="os_target", help="With --near, only consider this os_target (e.g. 'Windows 11')")
+    add_arguments(parser)
     
     args = parser.parse_args()
-    
-    base_dir = Path(__file__).parent.parent / args.dir
-    if not base_dir.exists():
-        print(f"Error: Directory {base_dir} not found.")
+    if args.near is not None:
+        if args.query or args.field or args.where or args.db:
+            parser.error("--near cannot be combined with a search term, --field, --where or --db")
+        if args.k < 1:
+            parser.error("-k must be at least 1")
+        try:
+            args.spec = parse_spec(args.near)
+        except SpecError as e:
+            parser.error(f"--near: {e}")
+    elif args.os_target is not None:
+        parser.error("--os requires --near")
+    elif not args.query and not args.where:
+        parser.error("give a search term, --where, --near, or a combination")
+    try:
+        where = FilterExpression(args.where) if args.where else None
+    except FilterSyntaxError as e:
+        parser.error(f"--where: {e}")
+    if args.input and args.db:
+        parser.error("--db cannot be combined with --input")
+
+    with instrumented(args, "search_profiles"):
+        if args.near is not None:
+            run_nearest(args)
+        else:
+            run(args, where)
+
+def run_nearest(args):
+    """Runs a --near query and prints or streams the closest profiles."""
+    try:
+        if args.input:
+            with open_stream(args.input) as stream:
+                results = nearest_profiles(map(Profile.from_dict, read_profiles(stream)), args.spec, args.k, args.os_target)
+        else:
+            base_dir = Path(__file__).parent.parent / args.dir
+            if not base_dir.exists():
+                raise FileNotFoundError(f"Directory {base_dir} not found.")
+            results = search_nearest(base_dir, args.spec, args.k, args.os_target, use_store=not args.no_store)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
-    results = search_profiles(base_dir, args.query, args.field)
+    if args.jsonl:
+        write_stream(profile.to_dict() for _, profile in results)
+        return
+    scope = f" on {args.os_target}" if args.os_target else ""
+    print(f"Nearest {len(results)} profiles to '{args.near}'{scope}:")
+    for distance, profile in results:
+        print(format_nearest(distance, profile))
+
+def run(args, where):
+    """Runs a parsed search and prints or streams its results."""
+    if args.input:
+        try:
+            with open_stream(args.input) as stream:
+                matches = search_stream(read_profiles(stream), args.query, args.field, where)
+                if args.jsonl:
+                    count = write_stream(matches)
+                    print(f"Found {count} matches.", file=sys.stderr)
+                    return
+                results = [profile.get('id', '') for profile in matches]
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Found {len(results)} matches.")
+    else:
+        base_dir = Path(__file__).parent.parent / args.dir
+        if not base_dir.exists():
+            print(f"Error: Directory {base_dir} not found.", file=sys.stderr if args.jsonl else sys.stdout)
+            sys.exit(1)
+
+        try:
+            # With --jsonl, stdout carries the profiles, so progress messages move to stderr
+            with contextlib.redirect_stdout(sys.stderr) if args.jsonl else contextlib.nullcontext():
+                results = search_profiles(base_dir, args.query, args.field, use_store=not args.no_store,
+                                          use_index=not args.no_index, db_path=args.db, where=where)
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"Error: {e}", file=sys.stderr if args.jsonl else sys.stdout)
+            sys.exit(1)
+
+        if args.jsonl:
+            write_stream(profile for profile in map(load_profile, results) if profile)
+            return
     
     print("\nResults:")
     for res in results[:20]:
@@ -0,0 +1,392 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import traceback
+from array import array
+from collections import OrderedDict
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+try:
+    from export import EXPORTERS, FORMATS, MODULE_FORMATS, profile_record
+    from generate_profiles import DB_PATH, iter_profiles, rules_hash
+    from profile_store import PROFILES_DIR, STORE_NAME, open_store
+    from nearest import NearestIndex, SpecError, parse_spec
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.export import EXPORTERS, FORMATS, MODULE_FORMATS, profile_record
+    from scripts.generate_profiles import DB_PATH, iter_profiles, rules_hash
+    from scripts.profile_store import PROFILES_DIR, STORE_NAME, open_store
+    from scripts.nearest import NearestIndex, SpecError, parse_spec
+
+API_PREFIX = "/api/v1"
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 1000
+QUERY_CACHE_BYTES = 32 * 1024 * 1024  # Matching rows of recent filter/nearest queries; pages are assembled per request
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 64 * 1024  # Request bodies are read and discarded; larger ones are refused
+
+# Query parameter -> metadata field matched exactly (case-insensitive); "make" is an alias of "manufacturer"
+FILTER_FIELDS = {
+    "os": "os_target",
+    "manufacturer": "make",
+    "make": "make",
+    "form_factor": "form_factor",
+}
+# Query parameter -> hardware field compared with >=
+MIN_FIELDS = {
+    "min_ram": "ram_mb",
+    "min_cores": "cpu_cores",
+    "min_vram": "gpu_vram_mb",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def encode(data: Any) -> bytes:
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class BoundedCache:
+    """Least-recently-used cache bounded by the total size of its values rather than their count."""
+
+    def __init__(self, capacity: int, size: Callable[[Any], int]):
+        self.capacity = capacity
+        self.size = size
+        self.used = 0
+        self._items: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+            return item[0]
+        value = compute()
+        size = self.size(value)
+        if size <= self.capacity:
+            self._items[key] = (value, size)
+            self.used += size
+            while self.used > self.capacity:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.used -= evicted
+        return value
+
+
+class ProfileIndex:
+    """The whole profile corpus held in memory, with exact-match indexes on the filter fields.
+
+    The corpus never changes while the server runs, so every ETag is derived
+    from the corpus version without touching the profiles. Each profile's
+    encoded JSON is kept once it has been served, and the matching rows of
+    recent queries are cached up to QUERY_CACHE_BYTES; response bodies are
+    assembled from those per request rather than cached whole.
+    """
+
+    def __init__(self, profiles: Iterable[Dict[str, Any]], version: str):
+        self.version = version
+        self.profiles: List[Dict[str, Any]] = []
+        self.by_id: Dict[str, int] = {}
+        self.by_field: Dict[str, Dict[str, List[int]]] = {field: {} for field in set(FILTER_FIELDS.values())}
+        for row, profile in enumerate(profiles):
+            self.profiles.append(profile)
+            self.by_id[profile['id']] = row
+            metadata = profile.get('metadata', {})
+            for field, index in self.by_field.items():
+                index.setdefault(str(metadata.get(field, '')).lower(), []).append(row)
+        self._bodies: Dict[int, bytes] = {}
+        self._nearest_index: Optional[NearestIndex] = None
+        # Row arrays cost their itemsize per row: 4 bytes for a query, 12 for a nearest (distance, row) pair
+        self.cache = BoundedCache(QUERY_CACHE_BYTES, lambda arrays: sum(len(a) * a.itemsize for a in arrays))
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+    def etag(self, *parts: Any) -> str:
+        digest = hashlib.sha1(repr((self.version,) + parts).encode('utf-8')).hexdigest()[:20]
+        return f'"{digest}"'
+
+    def query(self, filters: Tuple[Tuple[str, str], ...], minimums: Tuple[Tuple[str, int], ...]) -> array:
+        """Rows matching every filter, in corpus order (cached)."""
+        return self.cache.get(("query", filters, minimums), lambda: (self._query(filters, minimums),))[0]
+
+    def _query(self, filters: Tuple[Tuple[str, str], ...], minimums: Tuple[Tuple[str, int], ...]) -> array:
+        """Rows matching every filter, in corpus order. Starts from the smallest exact-match list."""
+        profiles = self.profiles
+        if filters:
+            rows: Iterable[int] = min((self.by_field[field].get(value, []) for field, value in filters), key=len)
+            if len(filters) > 1:
+                rows = [
+                    row for row in rows
+                    if all(str(profiles[row].get('metadata', {}).get(field, '')).lower() == value for field, value in filters)
+                ]
+        else:
+            rows = range(len(profiles))
+        if minimums:
+            rows = [
+                row for row in rows
+                if all((profiles[row].get('hardware', {}).get(field) or 0) >= minimum for field, minimum in minimums)
+            ]
+        return array('I', rows)
+
+    def page(self, filters: Tuple[Tuple[str, str], ...], minimums: Tuple[Tuple[str, int], ...], page: int, per_page: int) -> bytes:
+        """One page of a query's matches, joined from the per-profile bodies."""
+        rows = self.query(filters, minimums)
+        start = (page - 1) * per_page
+        body = b','.join(self.body(row) for row in rows[start:start + per_page])
+        header = encode({"total": len(rows), "page": page, "per_page": per_page})
+        return header[:-1] + b',"profiles":[' + body + b']}'
+
+    def nearest(self, spec: Tuple[Tuple[str, float], ...], os_target: Optional[str], k: int) -> bytes:
+        """The k profiles closest to spec; the feature index is built on the first such query."""
+        distances, rows = self.cache.get(("nearest", spec, os_target, k), lambda: self._nearest(spec, os_target, k))
+        body = b','.join(b'{"distance":' + encode(round(distance, 6)) + b',"profile":' + self.body(row) + b'}'
+                         for distance, row in zip(distances, rows))
+        header = encode({"spec": dict(spec), "os": os_target, "k": k})
+        return header[:-1] + b',"profiles":[' + body + b']}'
+
+    def _nearest(self, spec: Tuple[Tuple[str, float], ...], os_target: Optional[str], k: int) -> Tuple[array, array]:
+        if self._nearest_index is None:
+            self._nearest_index = NearestIndex.from_profiles(self.profiles)
+        found = sorted((distance, row) for distance, _, rows in self._nearest_index.nearest_members(dict(spec), k, os_target) for row in rows)[:k]
+        return array('d', (distance for distance, _ in found)), array('I', (row for _, row in found))
+
+    def body(self, row: int) -> bytes:
+        """A profile's encoded JSON, serialized on first use (at most one per profile is kept)."""
+        body = self._bodies.get(row)
+        if body is None:
+            body = self._bodies[row] = encode(self.profiles[row])
+        return body
+
+
+def load_index(profiles_dir: str = PROFILES_DIR, use_store: bool = True) -> ProfileIndex:
+    """Loads the corpus from the packed store if present, otherwise straight from laptops.json."""
+    store = open_store(profiles_dir) if use_store else None
+    if store is not None:
+        stat = os.stat(os.path.join(profiles_dir, STORE_NAME))
+        with store:
+            return ProfileIndex(iter(store), f"store:{stat.st_mtime_ns}:{stat.st_size}")
+    with open(DB_PATH, 'rb') as f:
+        version = "catalog:" + hashlib.sha256(f.read()).hexdigest() + rules_hash()
+    return ProfileIndex(iter_profiles(), version)
+
+
+def parse_int(params: Dict[str, str], name: str, default: int, low: int, high: Optional[int] = None) -> int:
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{name}' must be an integer")
+    if value < low or (high is not None and value > high):
+        bound = f"between {low} and {high}" if high is not None else f"at least {low}"
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{name}' must be {bound}")
+    return value
+
+
+def route(index: ProfileIndex, path: str, query: str) -> Tuple[str, Any]:
+    """Resolves a request to (etag, body producer); the body is only built if the ETag misses."""
+    if not path.startswith(API_PREFIX + "/"):
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+    parts = [unquote(part) for part in path[len(API_PREFIX) + 1:].split('/')]
+
+    if parts == ["formats"]:
+        return index.etag("formats"), lambda: encode(sorted(EXPORTERS))
+
+    if parts == ["nearest"]:
+        params = dict(parse_qsl(query))
+        k = parse_int(params, "k", 10, 1, MAX_PER_PAGE)
+        os_target = params.pop("os", None)
+        params.pop("k", None)
+        try:
+            spec = tuple(sorted(parse_spec(params).items()))
+        except SpecError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        return index.etag("nearest", spec, os_target, k), lambda: index.nearest(spec, os_target, k)
+
+    if parts == ["profiles"]:
+        params = dict(parse_qsl(query))
+        unknown = set(params) - set(FILTER_FIELDS) - set(MIN_FIELDS) - {"page", "per_page"}
+        if unknown:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown query parameter(s): {', '.join(sorted(unknown))}")
+        filters = tuple(sorted({(FILTER_FIELDS[name], value.lower()) for name, value in params.items() if name in FILTER_FIELDS}))
+        minimums = tuple(sorted((MIN_FIELDS[name], parse_int(params, name, 0, 0)) for name in params if name in MIN_FIELDS))
+        page = parse_int(params, "page", 1, 1)
+        per_page = parse_int(params, "per_page", DEFAULT_PER_PAGE, 1, MAX_PER_PAGE)
+        return index.etag("profiles", filters, minimums, page, per_page), lambda: index.page(filters, minimums, page, per_page)
+
+    if len(parts) >= 2 and parts[0] == "profiles":
+        row = index.by_id.get(parts[1])
+        if row is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No profile with id '{parts[1]}'")
+        if len(parts) == 2:
+            return index.etag("profile", row), lambda: index.body(row)
+        if len(parts) == 4 and parts[2] == "export":
+            # Per-profile formats only: docker-bake and terraform-module need the rest of their batch
+            if parts[3] not in EXPORTERS and (parts[3] in FORMATS or parts[3] in MODULE_FORMATS):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{parts[3]}' is a batch format; export it with batch_export.py")
+            if parts[3] not in EXPORTERS:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown format '{parts[3]}' (expected one of {', '.join(EXPORTERS)})")
+            spec = FORMATS[parts[3]]
+
+            def render() -> bytes:
+                files = [
+                    {"name": filename, "executable": executable, "content": content}
+                    for filename, content, executable in spec.render(profile_record(index.profiles[row]))
+                ]
+                return encode({"id": parts[1], "format": parts[3], "files": files})
+
+            return index.etag("export", row, parts[3]), render
+
+    raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+
+
+def response(status: HTTPStatus, body: bytes = b"", etag: Optional[str] = None, keep_alive: bool = True) -> bytes:
+    headers = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    if status != HTTPStatus.NOT_MODIFIED:
+        headers += ["Content-Type: application/json; charset=utf-8", f"Content-Length: {len(body)}"]
+    headers += ["Cache-Control: no-cache", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if etag:
+        headers.append(f"ETag: {etag}")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check: "*" matches any existing resource, and tags compare weakly (W/ is ignored)."""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def handle(index: ProfileIndex, method: str, target: str, headers: Dict[str, str], keep_alive: bool) -> bytes:
+    if method not in ("GET", "HEAD"):
+        return response(HTTPStatus.METHOD_NOT_ALLOWED, encode({"error": "Only GET and HEAD are supported"}), keep_alive=keep_alive)
+    url = urlsplit(target)
+    try:
+        etag, produce = route(index, url.path, url.query)
+        if "if-none-match" in headers and etag_matches(headers["if-none-match"], etag):
+            return response(HTTPStatus.NOT_MODIFIED, etag=etag, keep_alive=keep_alive)
+        body = produce()
+        status = HTTPStatus.OK
+    except HTTPError as e:
+        etag, body, status = None, encode({"error": e.message}), e.status
+    except Exception:
+        # A failing renderer or template must not drop the connection without an answer
+        print(f"Error handling {method} {target}:", file=sys.stderr)
+        traceback.print_exc()
+        etag, body, status = None, encode({"error": "Internal server error"}), HTTPStatus.INTERNAL_SERVER_ERROR
+    full = response(status, body, etag, keep_alive)
+    # HEAD gets the same headers, including Content-Length, without the body
+    return full[:len(full) - len(body)] if method == "HEAD" else full
+
+
+async def read_head(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str]]]:
+    """(method, target, version, headers) of the next request, or None once the client is done.
+
+    Raises HTTPError for requests that cannot be parsed; the connection is
+    closed after answering them, since the stream position is then unknown.
+    """
+    try:
+        request_line = await reader.readline()
+    except ValueError:  # Longer than the stream limit
+        raise HTTPError(HTTPStatus.REQUEST_URI_TOO_LONG, "Request line too long")
+    if not request_line.strip():
+        return None
+    try:
+        method, target, version = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADER_LINES + 1):
+        try:
+            line = await reader.readline()
+        except ValueError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request header line too long")
+        if line in (b"\r\n", b"\n", b""):
+            return method, target, version, headers
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, f"More than {MAX_HEADER_LINES} request headers")
+
+
+async def discard_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> None:
+    """Reads past the request body, so it is not taken for the next request on the connection."""
+    if "transfer-encoding" in headers:
+        raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked request bodies are not supported; send Content-Length")
+    if "content-length" not in headers:
+        return
+    try:
+        length = int(headers["content-length"])
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request bodies are limited to {MAX_BODY_BYTES} bytes")
+    await reader.readexactly(length)
+
+
+async def serve_connection(index: ProfileIndex, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Serves HTTP/1.1 requests on one connection until the client closes it or asks to."""
+    try:
+        while True:
+            try:
+                head = await read_head(reader)
+                if head is None:
+                    break
+                method, target, version, headers = head
+                await discard_body(reader, headers)
+            except HTTPError as e:
+                writer.write(response(e.status, encode({"error": e.message}), keep_alive=False))
+                await writer.drain()
+                break
+
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+            writer.write(handle(index, method, target, headers, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run(index: ProfileIndex, host: str, port: int) -> None:
+    server = await asyncio.start_server(lambda r, w: serve_connection(index, r, w), host, port)
+    print(f"Serving {len(index)} profiles on http://{host}:{port}{API_PREFIX}/profiles")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve TestKit profiles over a local HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", "-p", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument("--dir", "-d", default=PROFILES_DIR, help="Profiles directory holding the packed store")
+    parser.add_argument("--no-store", action="store_true", help="Build the corpus from laptops.json even if a packed profile store exists")
+    args = parser.parse_args(argv)
+
+    print("Loading profiles...")
+    index = load_index(args.dir, use_store=not args.no_store)
+    try:
+        asyncio.run(run(index, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import hashlib
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+SHARD_PATTERN = re.compile(r'^\s*(\d+)\s*/\s*(\d+)\s*$')
+
+
+def shard_of(profile_id: str, count: int) -> int:
+    """1-based shard that owns a profile id out of `count` shards.
+
+    Depends only on the id (first 8 bytes of its SHA-256), never on the
+    catalog or input order, so a profile stays in its shard as the catalog
+    grows and every node agrees on the split without coordinating.
+    """
+    digest = hashlib.sha256(profile_id.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+class Shard(NamedTuple):
+    """Shard `index` (1-based) of `count`, as given by --shard i/N."""
+
+    index: int
+    count: int
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def owns(self, profile_id: str) -> bool:
+        return shard_of(profile_id, self.count) == self.index
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"index": self.index, "count": self.count}
+
+
+def parse_shard(value: str) -> Shard:
+    """--shard value: 'i/N' with 1 <= i <= N."""
+    match = SHARD_PATTERN.match(value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid shard {value!r} (expected i/N, e.g. 2/8)")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard {value!r} (i must be between 1 and N)")
+    return Shard(index, count)
+
+
+def take_shard(items: Iterable[Any], shard: Shard, counts: Dict[str, int],
+               key: Optional[Callable[[Any], str]] = None) -> Iterator[Any]:
+    """Lazily yields the items `shard` owns, by profile id (`key`, default item.id).
+
+    counts['selected'] tracks every item seen before the split, so each
+    shard can record the size of the whole selection for merge-time checks;
+    counts['kept'] tracks the ones yielded.
+    """
+    key = key or (lambda item: item.id)
+    counts.setdefault("selected", 0)
+    counts.setdefault("kept", 0)
+    for item in items:
+        counts["selected"] += 1
+        if shard.owns(key(item)):
+            counts["kept"] += 1
+            yield item
@@ -0,0 +1,51 @@
+import operator
+import re
+from typing import Any, Callable, List, Mapping, Tuple
+
+# {field} placeholders; {{ and }} are literal braces, as in f-strings
+_TOKEN = re.compile(r'\{\{|\}\}|\{([A-Za-z_][A-Za-z0-9_]*)\}')
+
+
+class Template:
+    """A text template parsed once into a render plan.
+
+    The source is split into literal text and {field} references, then
+    compiled into a single %-format string plus an itemgetter for the
+    fields, so render() is one C-level formatting call per document.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.fields: List[str] = []
+        parts = []
+        pos = 0
+        for match in _TOKEN.finditer(source):
+            parts.append(self._literal(source[pos:match.start()]))
+            token = match.group(0)
+            if match.group(1):
+                self.fields.append(match.group(1))
+                parts.append('%s')
+            else:
+                parts.append(token[0])
+            pos = match.end()
+        parts.append(self._literal(source[pos:]))
+        self._format = ''.join(parts)
+        self._getter = self._compile_getter(self.fields)
+
+    @staticmethod
+    def _literal(text: str) -> str:
+        if '{' in text or '}' in text:
+            raise ValueError(f"Unbalanced brace in template near: {text[:40]!r}")
+        return text.replace('%', '%%')
+
+    @staticmethod
+    def _compile_getter(fields: List[str]) -> Callable[[Mapping[str, Any]], Tuple[Any, ...]]:
+        if not fields:
+            return lambda record: ()
+        if len(fields) == 1:
+            getter = operator.itemgetter(fields[0])
+            return lambda record: (getter(record),)
+        return operator.itemgetter(*fields)
+
+    def render(self, record: Mapping[str, Any]) -> str:
+        return self._format % self._getter(record)
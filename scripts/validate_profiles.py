@@ -0,0 +1,473 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+try:
+    from instrument import STATS, add_arguments, instrumented
+except ImportError:
+    # Handle case where script is run from root directory
+    from scripts.instrument import STATS, add_arguments, instrumented
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES_DIR = os.path.join(BASE_DIR, 'profiles')
+SCHEMA_NAME = 'profile_schema.json'
+CACHE_NAME = '.validation_cache.json'
+CACHE_VERSION = 1
+VALIDATE_CHUNK = 512  # Files per task handed to a worker process
+PARALLEL_MIN_FILES = 2048  # Fewer files to validate are checked serially: starting a pool would cost more than it saves
+
+# A violation is (location, keyword, message); the location is a dotted path such as "metadata.os_target"
+Violation = Tuple[str, str, str]
+Check = Callable[[Any, str, List[Violation]], None]
+
+# Keywords that only document the schema
+ANNOTATIONS = frozenset(["$schema", "$id", "$comment", "title", "description", "default", "examples"])
+
+JSON_TYPES = {
+    "object": lambda value: type(value) is dict,
+    "array": lambda value: type(value) is list,
+    "string": lambda value: type(value) is str,
+    # bool is an int subclass in Python but not a JSON number; 1.0 is an integer in JSON Schema
+    "integer": lambda value: type(value) is int or (type(value) is float and value.is_integer()),
+    "number": lambda value: type(value) in (int, float),
+    "boolean": lambda value: type(value) is bool,
+    "null": lambda value: value is None,
+}
+
+
+class SchemaError(ValueError):
+    """The schema uses a keyword or value the compiler does not support."""
+
+
+def join(location: str, key: Any) -> str:
+    return f"{location}.{key}" if location else str(key)
+
+
+def compile_schema(schema: Dict[str, Any]) -> Check:
+    """Compiles a JSON Schema (draft-07 subset) into a check function.
+
+    Every keyword becomes a closure over its already-prepared argument
+    (compiled regexes, frozen enum sets, child checks), so validating a
+    document walks plain Python calls instead of interpreting the schema
+    dict. The check appends every violation it finds rather than stopping
+    at the first. Unsupported keywords raise SchemaError instead of being
+    silently ignored.
+    """
+    if not isinstance(schema, dict):
+        raise SchemaError(f"schema must be an object, not {type(schema).__name__}")
+    unknown = set(schema) - ANNOTATIONS - KEYWORDS.keys()
+    if unknown:
+        raise SchemaError(f"unsupported keyword(s): {', '.join(sorted(unknown))}")
+
+    checks: List[Check] = [KEYWORDS[keyword](schema[keyword], schema) for keyword in KEYWORD_ORDER if keyword in schema]
+    checks = [check for check in checks if check is not None]
+    type_check = checks.pop(0) if "type" in schema else None
+
+    if type_check is None:
+        def check(value: Any, location: str, errors: List[Violation]) -> None:
+            for keyword_check in checks:
+                keyword_check(value, location, errors)
+        return check
+
+    def check_typed(value: Any, location: str, errors: List[Violation]) -> None:
+        # The remaining keywords assume the right type, so a type mismatch is reported once
+        if type_check(value, location, errors):
+            for keyword_check in checks:
+                keyword_check(value, location, errors)
+    return check_typed
+
+
+def compile_type(expected: Any, schema: Dict[str, Any]) -> Check:
+    names = [expected] if isinstance(expected, str) else list(expected)
+    try:
+        tests = [JSON_TYPES[name] for name in names]
+    except KeyError as e:
+        raise SchemaError(f"unknown type {e.args[0]!r}") from None
+    label = " or ".join(names)
+
+    def check(value: Any, location: str, errors: List[Violation]) -> bool:
+        if any(test(value) for test in tests):
+            return True
+        errors.append((location, "type", f"expected {label}, got {json_type(value)}"))
+        return False
+    return check
+
+
+def compile_properties(properties: Dict[str, Any], schema: Dict[str, Any]) -> Check:
+    children = [(name, compile_schema(subschema)) for name, subschema in properties.items()]
+
+    def check(value: Any, location: str, errors: List[Violation]) -> None:
+        if type(value) is not dict:
+            return
+        for name, child in children:
+            if name in value:
+                child(value[name], join(location, name), errors)
+    return check
+
+
+def compile_required(required: List[str], schema: Dict[str, Any]) -> Check:
+    names = tuple(required)
+
+    def check(value: Any, location: str, errors: List[Violation]) -> None:
+        if type(value) is not dict:
+            return
+        for name in names:
+            if name not in value:
+                errors.append((join(location, name), "required", "required property is missing"))
+    return check
+
+
+def compile_additional_properties(additional: Any, schema: Dict[str, Any]) -> Optional[Check]:
+    if additional is True:
+        return None
+    if additional is not False and not isinstance(additional, dict):
+        raise SchemaError("additionalProperties must be a boolean or a schema")
+    known = frozenset(schema.get("properties", {}))
+    child = compile_schema(additional) if isinstance(additional, dict) else None
+
+    def check(value: Any, location: str, errors: List[Violation]) -> None:
+        if type(value) is not dict:
+            return
+        for name in value.keys() - known:
+            if child is None:
+                errors.append((join(location, name), "additionalProperties", "unexpected property"))
+            else:
+                child(value[name], join(location, name), errors)
+    return check
+
+
+def compile_items(items: Any, schema: Dict[str, Any]) -> Check:
+    child = compile_schema(items)
+
+    def check(value: Any, location: str, errors: List[Violation]) -> None:
+        if type(value) is not list:
+            return
+        for i, item in enumerate(value):
+            child(item, join(location, i), errors)
+    return check
+
+
+def compile_enum(allowed: List[Any], schema: Dict[str, Any]) -> Check:
+    # Tagged with the type so that True and 1 stay distinct values while 1 and 1.0 are equal, as in JSON Schema
+    members: FrozenSet[Tuple[str, Any]] = frozenset((value_kind(item), item) for item in allowed if not isinstance(item, (dict, list)))
+
+    def check(value: Any, location: str, errors: List[Violation]) -> None:
+        if isinstance(value, (dict, list)) or (value_kind(value), value) not in members:
+            errors.append((location, "enum", f"{value!r} is not an allowed value"))
+    return check
+
+
+def compile_const(expected: Any, schema: Dict[str, Any]) -> Check:
+    def check(value: Any, location: str, errors: List[Violation]) -> None:
+        if value_kind(value) != value_kind(expected) or value != expected:
+            errors.append((location, "const", f"expected {expected!r}, got {value!r}"))
+    return check
+
+
+def compile_pattern(pattern: str, schema: Dict[str, Any]) -> Check:
+    try:
+        search = re.compile(pattern).search
+    except re.error as e:
+        raise SchemaError(f"invalid pattern {pattern!r}: {e}") from None
+
+    def check(value: Any, location: str, errors: List[Violation]) -> None:
+        if type(value) is str and search(value) is None:
+            errors.append((location, "pattern", f"{value!r} does not match {pattern!r}"))
+    return check
+
+
+def compile_bound(keyword: str, description: str, fails: Callable[[Any, Any], bool], measure: Callable[[Any], Any], applies: Callable[[Any], bool]) -> Callable[[Any, Dict[str, Any]], Check]:
+    """Builds the compiler of a numeric or length bound keyword."""
+    def compile_keyword(limit: Any, schema: Dict[str, Any]) -> Check:
+        def check(value: Any, location: str, errors: List[Violation]) -> None:
+            if applies(value) and fails(measure(value), limit):
+                errors.append((location, keyword, f"{value!r} {description} {limit}"))
+        return check
+    return compile_keyword
+
+
+def is_number(value: Any) -> bool:
+    return type(value) in (int, float)
+
+
+def json_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if type(value) is bool:
+        return "boolean"
+    if type(value) is int:
+        return "integer"
+    if type(value) is float:
+        return "number"
+    if type(value) is str:
+        return "string"
+    if type(value) is list:
+        return "array"
+    if type(value) is dict:
+        return "object"
+    return type(value).__name__
+
+
+def value_kind(value: Any) -> str:
+    """The JSON type for comparing values, with integers and floats both "number"."""
+    return "number" if is_number(value) else json_type(value)
+
+
+def identity(value: Any) -> Any:
+    return value
+
+
+KEYWORDS: Dict[str, Callable[[Any, Dict[str, Any]], Optional[Check]]] = {
+    "type": compile_type,
+    "required": compile_required,
+    "properties": compile_properties,
+    "additionalProperties": compile_additional_properties,
+    "items": compile_items,
+    "enum": compile_enum,
+    "const": compile_const,
+    "pattern": compile_pattern,
+    "minimum": compile_bound("minimum", "is less than", lambda value, limit: value < limit, identity, is_number),
+    "maximum": compile_bound("maximum", "is greater than", lambda value, limit: value > limit, identity, is_number),
+    "exclusiveMinimum": compile_bound("exclusiveMinimum", "is not greater than", lambda value, limit: value <= limit, identity, is_number),
+    "exclusiveMaximum": compile_bound("exclusiveMaximum", "is not less than", lambda value, limit: value >= limit, identity, is_number),
+    "minLength": compile_bound("minLength", "is shorter than", lambda value, limit: value < limit, len, lambda value: type(value) is str),
+    "maxLength": compile_bound("maxLength", "is longer than", lambda value, limit: value > limit, len, lambda value: type(value) is str),
+    "minItems": compile_bound("minItems", "has fewer items than", lambda value, limit: value < limit, len, lambda value: type(value) is list),
+    "maxItems": compile_bound("maxItems", "has more items than", lambda value, limit: value > limit, len, lambda value: type(value) is list),
+}
+# "type" must come first: compile_schema treats the first check as the type guard
+KEYWORD_ORDER = ("type",) + tuple(keyword for keyword in KEYWORDS if keyword != "type")
+
+
+def load_schema(path: str) -> Tuple[Dict[str, Any], str]:
+    """The parsed schema and a digest of its text, which keys the results cache."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return json.loads(raw), hashlib.sha256(raw).hexdigest()[:16]
+
+
+def validate_document(check: Check, data: Any) -> List[Violation]:
+    errors: List[Violation] = []
+    check(data, "", errors)
+    return errors
+
+
+# Per-process state of validate_chunk: the compiled schema and the digests whose results are already cached
+_check: Optional[Check] = None
+_known: FrozenSet[str] = frozenset()
+
+
+def init_worker(schema: Dict[str, Any], known: FrozenSet[str]) -> None:
+    global _check, _known
+    _check = compile_schema(schema)
+    _known = known
+
+
+def validate_chunk(paths: List[str], collect_stats: bool = False) -> Tuple[List[Tuple[str, str, Optional[List[Violation]]]], Optional[Dict[str, Any]]]:
+    """Hashes and validates files. Returns (path, digest, violations) per file, with
+    violations None when the digest already has cached results, plus the worker's stats."""
+    if collect_stats:
+        STATS.reset(enabled=True)
+    results = []
+    for path in paths:
+        try:
+            with STATS.phase("read"), open(path, 'rb') as f:
+                raw = f.read()
+        except OSError as e:
+            results.append((path, "", [("", "read", f"cannot read file: {e.strerror or e}")]))
+            continue
+        digest = hashlib.sha256(raw).hexdigest()[:32]
+        if digest in _known:
+            results.append((path, digest, None))
+            continue
+        with STATS.phase("validate"):
+            try:
+                data = json.loads(raw)
+            except ValueError as e:
+                errors = [("", "json", f"invalid JSON: {e}")]
+            else:
+                errors = validate_document(_check, data)
+        STATS.count("files_validated")
+        results.append((path, digest, errors))
+    return results, STATS.snapshot() if collect_stats else None
+
+
+def find_files(targets: Iterable[str], schema_path: str) -> List[str]:
+    """JSON files named by `targets` (files or directories), without the schema in use or any profile_schema.json."""
+    schema_path = os.path.abspath(schema_path)
+    paths = []
+    with STATS.phase("scan"):
+        for target in targets:
+            if os.path.isdir(target):
+                found = sorted(glob.glob(os.path.join(target, "**", "*.json"), recursive=True))
+            else:
+                found = [target]
+            paths.extend(path for path in found
+                         if os.path.basename(path) != SCHEMA_NAME and os.path.abspath(path) != schema_path)
+    STATS.count("files_scanned", len(paths))
+    return paths
+
+
+def load_cache(path: str, schema_digest: str) -> Dict[str, Any]:
+    """Cached results for this schema: {"files": {path: [mtime_ns, size, digest]}, "results": {digest: violations}}."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if cache.get('version') != CACHE_VERSION or cache.get('schema') != schema_digest:
+        return {"files": {}, "results": {}}
+    return {"files": cache.get('files', {}), "results": cache.get('results', {})}
+
+
+def save_cache(path: str, schema_digest: str, cache: Dict[str, Any]) -> None:
+    # Drop results no file refers to any more
+    referenced = {entry[2] for entry in cache["files"].values()}
+    results = {digest: errors for digest, errors in cache["results"].items() if digest in referenced}
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": CACHE_VERSION, "schema": schema_digest, "files": cache["files"], "results": results}, f)
+    os.replace(tmp_path, path)
+
+
+def validate_files(paths: List[str], schema: Dict[str, Any], cache: Dict[str, Any], cache_root: str,
+                   jobs: int = 1) -> Dict[str, List[Violation]]:
+    """Validates every file against the schema and returns {path: violations} for each of them.
+
+    Files whose mtime and size match the cache are not read at all; others
+    are hashed, and only content with no cached results is parsed and
+    checked. `cache` is updated in place, and cache["changed"] says whether it needs saving. With jobs > 1 and at least
+    PARALLEL_MIN_FILES files to check, they are split into chunks across a process pool, each worker compiling the
+    schema once.
+    """
+    files, results = cache["files"], cache["results"]
+    report: Dict[str, List[Violation]] = {}
+    pending = []
+    with STATS.phase("stat"):
+        for path in paths:
+            key = os.path.relpath(path, cache_root)
+            entry = files.get(key)
+            try:
+                st = os.stat(path)
+            except OSError:
+                entry = None
+            else:
+                if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size and entry[2] in results:
+                    report[path] = [tuple(error) for error in results[entry[2]]]
+                    continue
+            pending.append(path)
+    STATS.count("files_cached", len(paths) - len(pending))
+    cache["changed"] = bool(pending)
+
+    def collect(chunk_results: List[Tuple[str, str, Optional[List[Violation]]]]) -> None:
+        for path, digest, errors in chunk_results:
+            if errors is None:
+                errors = [tuple(error) for error in results[digest]]
+            elif digest:
+                results[digest] = errors
+            report[path] = errors
+            key = os.path.relpath(path, cache_root)
+            try:
+                st = os.stat(path)
+            except OSError:
+                files.pop(key, None)
+                continue
+            if digest:
+                files[key] = [st.st_mtime_ns, st.st_size, digest]
+
+    known = frozenset(results)
+    chunks = [pending[i:i + VALIDATE_CHUNK] for i in range(0, len(pending), VALIDATE_CHUNK)]
+    if jobs <= 1 or len(pending) < PARALLEL_MIN_FILES:
+        init_worker(schema, known)
+        for chunk in chunks:
+            collect(validate_chunk(chunk)[0])
+        return report
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks)), initializer=init_worker, initargs=(schema, known)) as pool:
+        for chunk_results, stats in pool.map(validate_chunk, chunks, [STATS.enabled] * len(chunks)):
+            collect(chunk_results)
+            STATS.merge(stats)
+    return report
+
+
+def summarize(report: Dict[str, List[Violation]]) -> List[Dict[str, Any]]:
+    """Violations grouped by (location, keyword), most frequent first, each with one example message."""
+    groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for path, errors in report.items():
+        for location, keyword, message in errors:
+            group = groups.get((location, keyword))
+            if group is None:
+                group = groups[(location, keyword)] = {"path": location, "keyword": keyword, "count": 0, "example": f"{path}: {message}"}
+            group["count"] += 1
+    return sorted(groups.values(), key=lambda group: (-group["count"], group["path"], group["keyword"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate generated profiles against profiles/profile_schema.json.")
+    parser.add_argument("paths", nargs="*", help="Profile files or directories (default: the profiles directory)")
+    parser.add_argument("--schema", default=os.path.join(PROFILES_DIR, SCHEMA_NAME), help="JSON Schema to validate against (default: profiles/profile_schema.json)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help=f"Worker processes when at least {PARALLEL_MIN_FILES} files need checking (default: one per CPU)")
+    parser.add_argument("--no-cache", action="store_true", help=f"Ignore and do not update profiles/{CACHE_NAME}")
+    parser.add_argument("--format", choices=["text", "json"], default="text", help="Report format (default: text)")
+    parser.add_argument("--summary", action="store_true", help="Group violations by location and keyword instead of listing them per file")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    with instrumented(args, "validate_profiles"):
+        sys.exit(run(args))
+
+def run(args) -> int:
+    """Validates and prints the report. Returns the exit code: 0 valid, 1 violations, 2 unusable schema."""
+    try:
+        with STATS.phase("compile"):
+            schema, schema_digest = load_schema(args.schema)
+            compile_schema(schema)
+    except (OSError, ValueError) as e:
+        print(f"Error: cannot use schema {args.schema}: {e}", file=sys.stderr)
+        return 2
+
+    paths = find_files(args.paths or [PROFILES_DIR], args.schema)
+    cache_path = os.path.join(PROFILES_DIR, CACHE_NAME)
+    with STATS.phase("cache"):
+        cache = {"files": {}, "results": {}} if args.no_cache else load_cache(cache_path, schema_digest)
+    report = validate_files(paths, schema, cache, PROFILES_DIR, args.jobs)
+    if not args.no_cache and cache.pop("changed", False):
+        with STATS.phase("cache"):
+            try:
+                save_cache(cache_path, schema_digest, cache)
+            except OSError as e:
+                print(f"Warning: could not save {cache_path}: {e}", file=sys.stderr)
+
+    invalid = {os.path.relpath(path): errors for path, errors in sorted(report.items()) if errors}
+    violations = sum(len(errors) for errors in invalid.values())
+    STATS.count("violations", violations)
+
+    if args.format == "json":
+        output: Dict[str, Any] = {"schema": args.schema, "files": len(paths), "invalid_files": len(invalid), "violations": violations}
+        if args.summary:
+            output["summary"] = summarize(invalid)
+        else:
+            output["errors"] = {path: [{"path": location, "keyword": keyword, "message": message} for location, keyword, message in errors]
+                                for path, errors in invalid.items()}
+        print(json.dumps(output, indent=2))
+    else:
+        if args.summary:
+            for group in summarize(invalid):
+                print(f"{group['count']:>8}  {group['path'] or '(root)'} [{group['keyword']}]  e.g. {group['example']}")
+        else:
+            for path, errors in invalid.items():
+                for location, keyword, message in errors:
+                    print(f"{path}: {location or '(root)'}: {message}")
+        print(f"Validated {len(paths)} files: {violations} violations in {len(invalid)} files.")
+    return 1 if invalid else 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The scripts import each other as top-level modules (see the try/except imports)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+
+def make_profile(profile_id, make, model, os_target, year=2016, environment=True, **hardware):
+    profile = {
+        "id": profile_id,
+        "metadata": {"make": make, "model": model, "year": year, "os_target": os_target, "form_factor": "Laptop"},
+        "hardware": {"cpu_cores": 4, "cpu_name": "Intel Core i5-6200U", "ram_mb": 8192, "storage_gb": 256,
+                     "gpu_name": "Intel HD Graphics 520", "gpu_vram_mb": 1024, "screen_resolution": "1920x1080"},
+    }
+    profile["hardware"].update(hardware)
+    profile["hardware"] = {name: value for name, value in profile["hardware"].items() if value is not None}
+    if environment:
+        profile["environment"] = {"accessibility_mode": "Standard", "boot_mode": "Normal"}
+        profile["software"] = {"primary_browser": "Chrome"}
+    return profile
+
+
+# (relative path, profile): generated-style variants plus hand-authored files whose
+# matches cross field boundaries, lack fields or do not follow the <id>.json naming
+PROFILES = [
+    ("win10/hp-stream-11-windows-10-v1.json",
+     make_profile("hp-stream-11-windows-10-v1", "HP", "Stream 11", "Windows 10", cpu_cores=2, ram_mb=2048,
+                  storage_gb=32, gpu_vram_mb=128, screen_resolution="1366x768")),
+    ("win10/hp-stream-11-windows-10-v2.json",
+     make_profile("hp-stream-11-windows-10-v2", "HP", "Stream 11", "Windows 10", cpu_cores=2, ram_mb=4096,
+                  storage_gb=32, gpu_vram_mb=None, screen_resolution="1366x768")),
+    ("win8/hp-stream-11-windows-81-v1.json",
+     make_profile("hp-stream-11-windows-81-v1", "HP", "Stream 11", "Windows 8.1", year=2014, cpu_cores=2,
+                  ram_mb=2048, storage_gb=32, gpu_vram_mb=128)),
+    ("win10/dell-xps-13-windows-10-v1.json",
+     make_profile("dell-xps-13-windows-10-v1", "Dell", "XPS 13", "Windows 10", ram_mb=16384, gpu_vram_mb=None)),
+    ("win11/lenovo-thinkpad-t480-windows-11-v1.json",
+     make_profile("lenovo-thinkpad-t480-windows-11-v1", "Lenovo", "ThinkPad T480", "Windows 11", year=2018,
+                  gpu_name="NVIDIA GeForce MX150", gpu_vram_mb=2048)),
+    ("win11/lenovo-thinkpad-t480-windows-11-v2.json",
+     make_profile("lenovo-thinkpad-t480-windows-11-v2", "Lenovo", "ThinkPad T480", "Windows 11", year=2018,
+                  ram_mb=32768, storage_gb=1000, gpu_name="NVIDIA GeForce MX150", gpu_vram_mb=8192)),
+    ("win7/lenovo-thinkpad-t420-windows-7-v1.json",
+     make_profile("lenovo-thinkpad-t420-windows-7-v1", "Lenovo", "ThinkPad T420", "Windows 7", year=2011,
+                  ram_mb=4096, storage_gb=320, gpu_vram_mb=None)),
+    ("win10/template.json",
+     make_profile("template-win10-laptop", "Generic", "Windows 10 Laptop Template", "Windows 10", year=2018,
+                  environment=False)),
+    ("xp/template.json",
+     make_profile("template-xp-laptop", "Generic", "Windows XP Laptop Template", "Windows XP", year=2004,
+                  environment=False, cpu_cores=1, ram_mb=512, storage_gb=40, gpu_vram_mb=64)),
+]
+
+
+# Queries spanning field boundaries ("hp stream", "10 hp"), the os/id boundary
+# ("1 hp-stream") and hand-authored profiles ("generic")
+QUERIES = ["hp stream", "windows 10", "Windows 1", "10 hp", "1 hp-stream", "generic", "template", "t480",
+           "stream 11 windows 8.1", "v2", "0", "", "no such laptop"]
+
+
+def write_tree(profiles_dir, profiles=PROFILES):
+    for rel_path, profile in profiles:
+        path = os.path.join(str(profiles_dir), rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(profile, f, indent=2)
+    # Not profiles: skipped by every reader
+    with open(os.path.join(str(profiles_dir), "profile_schema.json"), 'w') as f:
+        json.dump({"type": "object"}, f)
+    return str(profiles_dir)
+
+
+@pytest.fixture
+def profiles_dir(tmp_path):
+    """A small profiles tree (no store)."""
+    return write_tree(tmp_path / "profiles")
+
+
+@pytest.fixture
+def packed_dir(profiles_dir):
+    """The same tree with a current packed store alongside it."""
+    from profile_store import pack_tree
+    pack_tree(profiles_dir)
+    return profiles_dir
@@ -0,0 +1,263 @@
+import copy
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import zipfile
+from collections.abc import Iterator
+
+import pytest
+
+import batch_export
+from batch_export import ResultSpool, build_manifest, stream_manifest
+from conftest import PROFILES, write_tree
+from export import profile_record, terraform_entry
+from profile_store import open_store, pack_tree
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+
+
+@pytest.fixture
+def workdir(packed_dir, monkeypatch):
+    """Runs batch_export.py from the directory holding the test profiles tree (it reads ./profiles)."""
+    workdir = os.path.dirname(packed_dir)
+    monkeypatch.chdir(workdir)
+    return workdir
+
+
+def read_archive(path):
+    """{name: (permission bits, content)} of every file in a tar or zip archive."""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            return {info.filename: ((info.external_attr >> 16) & 0o777, archive.read(info)) for info in archive.infolist()}
+    with tarfile.open(path) as archive:
+        return {member.name: (member.mode, archive.extractfile(member).read()) for member in archive.getmembers()}
+
+
+def read_tree(root):
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+@pytest.mark.parametrize("suffix", [".tar.gz", ".zip"])
+def test_archive_matches_the_directory_export(workdir, suffix):
+    batch_export.main(["--format", "docker", "--archive", "out" + suffix])
+    batch_export.main(["--format", "docker", "--output", "out"])
+
+    members = read_archive("out" + suffix)
+    files = read_tree("out")
+    manifest = json.loads(members.pop("batch_manifest.json")[1])
+    del files["batch_manifest.json"], files[".export_cache.json"]
+    assert {name: content for name, (_, content) in members.items()} == files
+    assert {name: mode for name, (mode, _) in members.items()} == \
+           {name: 0o755 if name.endswith("launch.sh") else 0o644 for name in files}
+    assert manifest["total"] == manifest["succeeded"] == len(PROFILES)
+    assert sorted(result["id"] for result in manifest["profiles"]) == sorted(profile["id"] for _, profile in PROFILES)
+
+
+def test_multi_format_archive_uses_format_prefixes(workdir):
+    batch_export.main(["--format", "docker-bake,terraform-module", "--make", "hp", "--archive", "out.tar"])
+    names = set(read_archive("out.tar"))
+    assert {"docker-bake/batch_manifest.json", "docker-bake/docker-bake.hcl",
+            "terraform-module/batch_manifest.json", "terraform-module/main.tf"} <= names
+    assert "docker-bake/hp-stream-11-windows-10-v1/launch.sh" in names
+
+
+@pytest.mark.parametrize("config_map, shard", [
+    (None, None),
+    ({"a": "config-1", "b": "config-1", "c": "config-2"}, {"index": 1, "count": 2, "selected": 3, "kept": 2}),
+])
+def test_streamed_manifest_matches_build_manifest(config_map, shard):
+    results = [{"id": "config-1", "source": None, "status": "ok", "files": ["config-1/launch.sh"]},
+               {"id": "config-2", "source": "x", "status": "failed", "error": "ValueError: \"bad\"\nline"}]
+    for count in (0, 2):
+        out = io.BytesIO()
+        with ResultSpool() as spool:
+            for result in results[:count]:
+                spool.append(result)
+            stream_manifest(out, spool, "docker", config_map, shard)
+        expected = build_manifest([dict(result) for result in results[:count]], "docker", config_map, shard)
+        assert out.getvalue().decode('utf-8') == json.dumps(expected, indent=2)
+
+
+@pytest.mark.parametrize("no_store", [False, True])
+def test_selection_is_lazy(workdir, no_store):
+    args = batch_export.argparse.Namespace(input=None, db=None, no_store=no_store, make="hp", os=None)
+    with batch_export.contextlib.ExitStack() as inputs:
+        matches = batch_export.select_profiles(args, None, inputs)
+        assert isinstance(matches, Iterator)
+        assert len(list(matches)) == 3
+
+
+def test_export_failures_are_reported_on_stderr(workdir, monkeypatch, capsys):
+    def broken(profile):
+        raise ValueError("template failure")
+    monkeypatch.setattr(batch_export, "profile_record", broken)
+    batch_export.main(["--format", "docker", "--make", "dell", "--archive", "out.tar"])
+
+    captured = capsys.readouterr()
+    assert "Failed to export dell-xps-13-windows-10-v1: template failure" in captured.err
+    assert "Failed to export" not in captured.out
+    assert "0/1 exported successfully" in captured.out
+
+
+def test_concurrent_export_matches_serial(workdir):
+    for output, jobs in (("serial", "1"), ("parallel", "3")):
+        subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "batch_export.py"), "--format", "vagrant",
+                        "--output", output, "--jobs", jobs], cwd=workdir, check=True, capture_output=True)
+    serial = read_tree("serial")
+    assert read_tree("parallel") == serial
+
+    # Every profile gets its own directory, so launch scripts are not overwritten
+    ids = sorted(profile["id"] for _, profile in PROFILES)
+    assert sorted({path.split(os.sep)[0] for path in serial if os.sep in path}) == ids
+    for profile_id in ids:
+        assert b"Launch Script for " + profile_id.encode() in serial[os.path.join(profile_id, "launch.sh")]
+    manifest = json.loads(serial["batch_manifest.json"])
+    assert manifest["total"] == manifest["succeeded"] == len(PROFILES)
+    assert sorted(result["id"] for result in manifest["profiles"]) == ids
+
+
+@pytest.mark.parametrize("argv", [(), ("--no-store",)])
+def test_dedupe_exports_each_hardware_config_once(tmp_path, monkeypatch, argv):
+    # A variant that differs from the first profile only in its environment overlay
+    twin = copy.deepcopy(PROFILES[0][1])
+    twin["id"] = "hp-stream-11-windows-10-v9"
+    twin["environment"]["boot_mode"] = "Safe Mode"
+    profiles_dir = write_tree(tmp_path / "profiles", PROFILES + [("win10/hp-stream-11-windows-10-v9.json", twin)])
+    pack_tree(profiles_dir)
+    with open_store(profiles_dir) as store:
+        assert len(store) == len(PROFILES) + 1 and len(store.config_hashes) == len(PROFILES)
+    monkeypatch.chdir(tmp_path)
+
+    batch_export.main(["--format", "docker", "--dedupe", "--output", "out"] + list(argv))
+    manifest = json.loads(read_tree("out")["batch_manifest.json"])
+    config_map = manifest["config_map"]
+    assert sorted(config_map) == sorted([profile["id"] for _, profile in PROFILES] + [twin["id"]])
+    assert config_map[twin["id"]] == config_map[PROFILES[0][1]["id"]]
+    assert manifest["total"] == manifest["succeeded"] == len(set(config_map.values())) == len(PROFILES)
+    assert sorted(entry.name for entry in os.scandir("out") if entry.is_dir()) == sorted(set(config_map.values()))
+
+
+def test_export_cache_rewrites_only_changed_artifacts(workdir, capsys):
+    def export(*argv):
+        capsys.readouterr()
+        batch_export.main(["--format", "docker", "--output", "out", "--no-store"] + list(argv))
+        return capsys.readouterr().out
+
+    def rewritten():
+        """Artifacts written since the last call, which backdates every artifact."""
+        written = set()
+        for path in read_tree("out"):
+            if path not in ("batch_manifest.json", ".export_cache.json"):
+                if os.stat(os.path.join("out", path)).st_mtime_ns != 0:
+                    written.add(path)
+                os.utime(os.path.join("out", path), ns=(0, 0))
+        return written
+
+    export()
+    assert len(rewritten()) == 3 * len(PROFILES)
+    assert f"Unchanged (cached): {len(PROFILES)}. Artifacts rewritten: 0." in export()
+    assert rewritten() == set()
+
+    # Editing a profile re-renders it, and only its changed artifact is written
+    rel_path, profile = PROFILES[3]
+    edited = copy.deepcopy(profile)
+    edited["hardware"]["ram_mb"] = 32768
+    with open(os.path.join("profiles", rel_path), 'w') as f:
+        json.dump(edited, f)
+    assert f"Unchanged (cached): {len(PROFILES) - 1}. Artifacts rewritten: 1." in export()
+    assert rewritten() == {os.path.join(profile["id"], f"{profile['id']}.Dockerfile")}
+
+    # The cache trusts existing files; --no-cache restores hand-edited ones
+    launch_sh = os.path.join("out", PROFILES[0][1]["id"], "launch.sh")
+    with open(launch_sh, 'a') as f:
+        f.write("# edited\n")
+    os.utime(launch_sh, ns=(0, 0))
+    assert "Artifacts rewritten: 0." in export()
+    assert "Artifacts rewritten: 1." in export("--no-cache")
+    assert rewritten() == {os.path.relpath(launch_sh, "out")}
+
+
+def test_search_stream_pipes_into_export(workdir):
+    search = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, "search_profiles.py"), "hp stream", "--jsonl",
+                               "--dir", os.path.join(workdir, "profiles")], cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "batch_export.py"), "--input", "-", "--format", "docker",
+                    "--output", "piped"], cwd=workdir, stdin=search.stdout, check=True, capture_output=True)
+    search.stdout.close()
+    assert search.wait() == 0
+    batch_export.main(["--format", "docker", "--make", "hp", "--output", "direct"])
+
+    piped, direct = read_tree("piped"), read_tree("direct")
+    hp_ids = sorted(profile["id"] for _, profile in PROFILES if profile["metadata"]["make"] == "HP")
+    assert sorted(result["id"] for result in json.loads(piped["batch_manifest.json"])["profiles"]) == hp_ids
+    for files in (piped, direct):
+        del files["batch_manifest.json"], files[".export_cache.json"]
+    assert piped == direct
+
+
+def test_multi_format_export_matches_single_format_runs(workdir, monkeypatch):
+    parsed = []
+    from_dict = batch_export.Profile.from_dict
+    formats = ["docker", "vagrant", "wsb"]
+    with monkeypatch.context() as patch:
+        patch.setattr(batch_export.Profile, "from_dict",
+                      lambda data, *args, **kwargs: parsed.append(data["id"]) or from_dict(data, *args, **kwargs))
+        batch_export.main(["--format", ",".join(formats), "--output", "multi", "--no-store"])
+    # One selection pass: each profile is read once for all formats
+    assert sorted(parsed) == sorted(profile["id"] for _, profile in PROFILES)
+
+    multi = read_tree("multi")
+    assert {path.split(os.sep)[0] for path in multi} == set(formats)
+    for export_format in formats:
+        batch_export.main(["--format", export_format, "--output", export_format, "--no-store"])
+        assert {os.path.relpath(path, export_format): content for path, content in multi.items()
+                if path.startswith(export_format + os.sep)} == read_tree(export_format)
+
+
+def test_docker_bake_builds_every_profile_on_one_shared_base(workdir):
+    batch_export.main(["--format", "docker-bake", "--output", "out"])
+    files = read_tree("out")
+    bake = files["docker-bake.hcl"].decode()
+    ids = sorted(profile["id"] for _, profile in PROFILES)
+
+    targets = dict(re.findall(r'target "([^"]+)" \{\n  inherits = \["_profile"\]\n  dockerfile = "([^"]+)"', bake))
+    assert sorted(targets) == ids
+    assert re.search(r'group "default" \{\n  targets = \[\n(.*?)\n  \]', bake, re.S).group(1).split(",\n") == \
+        [f'    "{profile_id}"' for profile_id in ids]
+    # Each profile stage starts from the shared base, which alone holds the common setup
+    assert b"RUN " in files["Dockerfile.base"]
+    for profile_id, dockerfile in targets.items():
+        stage = files[dockerfile].decode()
+        assert [line for line in stage.splitlines() if line.startswith("FROM ")] == ["FROM testkit-base"]
+        assert "RUN " not in stage and f'TESTKIT_PROFILE_ID="{profile_id}"' in stage
+        assert f"docker buildx bake {profile_id}" in files[os.path.join(profile_id, "launch.sh")].decode()
+
+
+def test_terraform_module_holds_the_whole_selection(workdir):
+    def export(*argv):
+        batch_export.main(["--format", "terraform-module", "--output", "out"] + list(argv))
+        with open(os.path.join("out", "profiles.auto.tfvars.json")) as f:
+            return json.load(f)["profiles"]
+
+    entries = export()
+    assert entries == {profile["id"]: terraform_entry(profile_record(profile)) for _, profile in PROFILES}
+    assert entries["hp-stream-11-windows-10-v1"] == {"make": "HP", "model": "Stream 11", "os": "Windows 10",
+                                                     "cpu_cores": 2, "ram_mb": 2048, "ram_gb": 2}
+    with open(os.path.join("out", "main.tf")) as f:
+        main_tf = f.read()
+    assert main_tf.count('resource "aws_instance"') == 1 and "for_each = var.profiles" in main_tf
+    assert f"({len(PROFILES)} profiles)" in main_tf
+
+    # The module is rebuilt for each selection, so narrowing it drops the other instances
+    assert sorted(export("--make", "lenovo")) == sorted(profile["id"] for _, profile in PROFILES
+                                                        if profile["metadata"]["make"] == "Lenovo")
+    assert not [entry.name for entry in os.scandir("out") if entry.is_dir()]  # No per-profile directories
@@ -0,0 +1,48 @@
+import itertools
+import math
+
+import pytest
+
+from covering import covering_array, covers
+
+
+def uncovered(rows, sizes, strength):
+    """Every strength-way (columns, values) combination missing from rows, by brute force."""
+    missing = []
+    for columns in itertools.combinations(range(len(sizes)), strength):
+        for values in itertools.product(*(range(sizes[column]) for column in columns)):
+            if not any(all(row[column] == value for column, value in zip(columns, values)) for row in rows):
+                missing.append((columns, values))
+    return missing
+
+
+@pytest.mark.parametrize("sizes, strength", [
+    ([2, 2, 2], 2),
+    ([3, 3, 3, 3], 2),
+    ([5, 1, 4, 2, 3, 2], 2),
+    ([6, 4, 4, 3, 2, 2, 2], 2),
+    ([3, 2, 4, 2, 3], 3),
+    ([4, 3, 2], 1),
+])
+def test_every_combination_is_covered_without_duplicate_rows(sizes, strength):
+    rows = covering_array(sizes, strength)
+    assert uncovered(rows, sizes, strength) == []
+    assert covers(rows, sizes, strength)
+    assert len(set(rows)) == len(rows)
+    assert all(len(row) == len(sizes) and all(0 <= value < size for value, size in zip(row, sizes)) for row in rows)
+    # Smaller than the full product, but never below the combinations of the `strength` largest parameters
+    assert len(rows) < math.prod(sizes)
+    assert len(rows) >= math.prod(sorted(sizes)[-strength:])
+    assert covering_array(sizes, strength) == rows
+
+
+def test_strength_at_least_the_parameter_count_is_the_full_product():
+    assert covering_array([2, 3], 2) == list(itertools.product(range(2), range(3)))
+    assert covering_array([2, 3], 5) == list(itertools.product(range(2), range(3)))
+
+
+def test_covers_detects_a_missing_pair():
+    rows = covering_array([3, 3, 3], 2)
+    assert not covers(rows[1:], [3, 3, 3], 2)
+    with pytest.raises(ValueError, match="Strength"):
+        covering_array([3, 3], 0)
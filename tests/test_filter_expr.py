@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from conftest import PROFILES
+from filter_expr import FilterExpression, FilterSyntaxError
+from migrate_to_sqlite import PROFILE_COLUMNS, SCHEMA, query_profiles
+from profile_model import Profile
+from profile_store import open_store
+
+# Several fields are missing from some profiles (gpu_vram_mb, the templates' environment and software)
+EXPRESSIONS = [
+    "gpu_vram_mb > 4096",
+    "not gpu_vram_mb > 4096",
+    "not (gpu_vram_mb > 1000 or ram_mb < 4096)",
+    "not (gpu_vram_mb > 1000 and ram_mb >= 8192)",
+    "not not gpu_vram_mb >= 128",
+    "gpu_vram_mb != 1024",
+    "not gpu_vram_mb == 1024 and os ~ windows",
+    "primary_browser == chrome",
+    "not primary_browser == chrome",
+    "boot_mode !~ safe",
+    "not boot_mode ~ normal or make == generic",
+    "manufacturer == hp and not (model ~ '11' and year < 2015)",
+    "storage_gb <= 256 and not id ~ template",
+    "not (id ~ '-v1' or cpu_cores > 2)",
+]
+
+
+@pytest.fixture(scope="module")
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    rows = []
+    for _, data in PROFILES:
+        profile = Profile.from_dict(data)
+        rows.append(tuple(profile.get(column) if column != "id" else profile.id for column in PROFILE_COLUMNS))
+    conn.executemany(f"INSERT INTO profiles ({', '.join(PROFILE_COLUMNS)}) VALUES ({', '.join('?' * len(PROFILE_COLUMNS))})", rows)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_evaluators_agree(packed_dir, db, source):
+    expression = FilterExpression(source)
+    expected = sorted(data["id"] for _, data in PROFILES if expression.matches(Profile.from_dict(data)))
+    # Dicts in either layout evaluate like Profiles
+    assert sorted(data["id"] for _, data in PROFILES if expression.matches(data)) == expected
+
+    with open_store(packed_dir) as store:
+        assert sorted(store.id_at(row) for row in expression.rows(store)) == expected
+
+    assert sorted(row["id"] for row in query_profiles(db, where=expression.to_sql())) == expected
+
+
+def test_not_keeps_profiles_missing_the_field(packed_dir, db):
+    expression = FilterExpression("not gpu_vram_mb > 4096")
+    missing = {data["id"] for _, data in PROFILES if "gpu_vram_mb" not in data["hardware"]}
+    assert missing
+    assert missing <= {row["id"] for row in query_profiles(db, where=expression.to_sql())}
+
+
+@pytest.mark.parametrize("source", ["ram_mb >", "ram_mb == big", "make > 3", "not", "(ram_mb > 1", "speed > 3"])
+def test_syntax_errors(source):
+    with pytest.raises(FilterSyntaxError):
+        FilterExpression(source)
@@ -0,0 +1,148 @@
+import filecmp
+import itertools
+import json
+import os
+
+import pytest
+
+import generate_profiles
+from profile_store import open_store, scan_tree
+
+
+@pytest.fixture(scope="module")
+def laptops():
+    """The three smallest models of the real database."""
+    return sorted(generate_profiles.load_db(), key=generate_profiles.variant_count)[:3]
+
+
+def generate(tmp_path, monkeypatch, laptops, name, *argv):
+    db_path = tmp_path / "laptops.json"
+    db_path.write_text(json.dumps(laptops))
+    profiles_dir = str(tmp_path / name)
+    os.makedirs(profiles_dir, exist_ok=True)
+    monkeypatch.setattr(generate_profiles, "DB_PATH", str(db_path))
+    monkeypatch.setattr(generate_profiles, "PROFILES_DIR", profiles_dir)
+    monkeypatch.setattr(generate_profiles, "MANIFEST_PATH", os.path.join(profiles_dir, ".generation_manifest.json"))
+    monkeypatch.setattr(generate_profiles, "STORE_PATH", os.path.join(profiles_dir, "profiles.tkpack"))
+    generate_profiles.main(list(argv))
+    return profiles_dir
+
+
+def tree_files(profiles_dir):
+    return sorted(rel_path for rel_path, _ in scan_tree(profiles_dir))
+
+
+@pytest.mark.parametrize("argv", [(), ("--strategy", "pairwise"), ("--shard", "2/3")])
+def test_parallel_generation_matches_sequential(tmp_path, monkeypatch, laptops, argv):
+    sequential = generate(tmp_path, monkeypatch, laptops, "sequential", *argv)
+    parallel = generate(tmp_path, monkeypatch, laptops, "parallel", "--jobs", "2", *argv)
+
+    files = tree_files(sequential)
+    assert files and tree_files(parallel) == files
+    assert all(filecmp.cmp(os.path.join(sequential, path), os.path.join(parallel, path), shallow=False) for path in files)
+    for profiles_dir in (sequential, parallel):
+        with open_store(profiles_dir) as store:
+            assert list(store) == [profile for _, profile in scan_tree(profiles_dir)]
+
+
+def test_variant_paths_match_generated_profiles(laptops):
+    for laptop in laptops:
+        for strength in (None, 2):
+            generated = generate_profiles.generate_laptop(laptop, strength)
+            assert [rel_path for _, rel_path in generate_profiles.variant_paths(laptop, strength)] == \
+                   [rel_path for rel_path, _ in generated]
+
+
+def test_generation_tasks_split_large_models(laptops):
+    pending = [(laptop, list(range(1, generate_profiles.variant_count(laptop) + 1))) for laptop in laptops]
+    tasks = list(generate_profiles.generation_tasks(pending, jobs=4))
+    assert len(tasks) >= 4
+    assert max(len(ids) for _, ids in tasks) <= generate_profiles.TASK_VARIANTS
+    for laptop, variant_ids in pending:
+        assert [variant_id for task_laptop, ids in tasks if task_laptop is laptop for variant_id in ids] == variant_ids
+
+
+def test_rerun_keeps_hand_authored_profiles_in_the_store(tmp_path, monkeypatch, laptops):
+    profiles_dir = generate(tmp_path, monkeypatch, laptops, "profiles")
+    template = {"id": "template-win10-laptop", "metadata": {"make": "Generic", "model": "Template", "os_target": "Windows 10"},
+                "hardware": {"cpu_cores": 4, "ram_mb": 8192}}
+    with open(os.path.join(profiles_dir, "win10", "template.json"), 'w') as f:
+        json.dump(template, f)
+    assert open_store(profiles_dir) is None
+
+    generate(tmp_path, monkeypatch, laptops, "profiles")
+    with open_store(profiles_dir) as store:
+        assert store.get("template-win10-laptop") == template
+        assert len(store) == len(tree_files(profiles_dir))
+
+
+@pytest.mark.parametrize("argv", [(), ("--force",)])
+def test_regeneration_removes_stale_variants(tmp_path, monkeypatch, laptops, argv):
+    edited = [dict(laptops[0], ram_options=laptops[0]["ram_options"] + [65536])] + laptops[1:]
+    profiles_dir = generate(tmp_path, monkeypatch, edited, "profiles")
+    assert len(tree_files(profiles_dir)) > len(tree_files(generate(tmp_path, monkeypatch, laptops, "fresh")))
+
+    # Shrinking a model drops its extra variants, forced or not
+    generate(tmp_path, monkeypatch, laptops, "profiles", *argv)
+    assert tree_files(profiles_dir) == tree_files(str(tmp_path / "fresh"))
+
+    # So does removing a model from the catalog, and neither leaves its profiles in the store
+    generate(tmp_path, monkeypatch, laptops[1:], "profiles", *argv)
+    assert tree_files(profiles_dir) == tree_files(generate(tmp_path, monkeypatch, laptops[1:], "fresh-trimmed"))
+    with open_store(profiles_dir) as store:
+        assert sorted(store.relative_path(row) for row in range(len(store))) == tree_files(profiles_dir)
+
+
+def test_unchanged_models_are_not_rewritten(tmp_path, monkeypatch, laptops, capsys):
+    profiles_dir = generate(tmp_path, monkeypatch, laptops, "profiles")
+    mtimes = {path: os.stat(os.path.join(profiles_dir, path)).st_mtime_ns for path in tree_files(profiles_dir)}
+    capsys.readouterr()
+
+    generate(tmp_path, monkeypatch, laptops, "profiles")
+    assert "Total profiles generated: 0" in capsys.readouterr().out
+    assert {path: os.stat(os.path.join(profiles_dir, path)).st_mtime_ns for path in tree_files(profiles_dir)} == mtimes
+
+
+def test_catalog_resolves_every_generated_id(laptops):
+    # The smallest models have a single OS; add the smallest with several
+    multi_os = min((laptop for laptop in generate_profiles.load_db() if len(laptop["supported_os"]) > 1),
+                   key=generate_profiles.variant_count)
+    laptops = laptops + [multi_os]
+    catalog = generate_profiles.ProfileCatalog(laptops)
+    generated = [profile for laptop in laptops for _, profile in generate_profiles.generate_laptop(laptop)]
+    assert len(catalog) == len(generated)
+    assert list(catalog) == generated
+    assert all(catalog.get(profile["id"]) == profile for profile in generated)
+
+    # Each OS owns its own block of variant numbers: another OS's number, or one past the end, resolves to nothing
+    first_prefix = generated[-generate_profiles.variant_count(multi_os)]["id"].rsplit("-v", 1)[0]
+    last_prefix, variant = generated[-1]["id"].rsplit("-v", 1)
+    for profile_id in (f"{last_prefix}-v{int(variant) + 1}", f"{last_prefix}-v0", f"{last_prefix}-v1",
+                       f"{first_prefix}-v{variant}", last_prefix, "no-such-laptop-windows-10-v1"):
+        assert catalog.get(profile_id) is None and profile_id not in catalog
+
+
+def test_pairwise_variants_cover_every_pair_of_options():
+    laptop = max(generate_profiles.load_db(), key=lambda laptop: len(generate_profiles.permutation_options(laptop)))
+    options = generate_profiles.permutation_options(laptop)
+    generated = generate_profiles.generate_laptop(laptop, 2)
+    # Option values may be dicts, so compare their positions in the option lists
+    rows = [tuple(values.index(value) for values, value in
+                  zip(options, generate_profiles.decode_variant(laptop, int(profile["id"].rsplit("-v", 1)[1]))))
+            for _, profile in generated]
+    assert len(set(rows)) == len(generated) < generate_profiles.variant_count(laptop)
+    for first, second in itertools.combinations(range(len(options)), 2):
+        assert {(row[first], row[second]) for row in rows} == \
+               set(itertools.product(range(len(options[first])), range(len(options[second]))))
+
+    # Each variant keeps its id from the full product, so the catalog resolves it
+    catalog = generate_profiles.ProfileCatalog([laptop])
+    assert all(catalog.get(profile["id"]) == profile for _, profile in generated)
+
+
+def test_jsonl_emission_streams_the_profiles_without_writing_files(tmp_path, monkeypatch, laptops, capfd):
+    profiles_dir = generate(tmp_path, monkeypatch, laptops, "profiles", "--emit", "jsonl")
+    out, err = capfd.readouterr()
+    assert [json.loads(line) for line in out.splitlines()] == list(generate_profiles.iter_profiles(laptops))
+    assert f"Total profiles emitted: {len(out.splitlines())}" in err
+    assert os.listdir(profiles_dir) == []
@@ -0,0 +1,33 @@
+import ast
+import glob
+import os
+
+import pytest
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), '..')
+SOURCES = sorted(glob.glob(os.path.join(REPO_ROOT, 'scripts', '*.py')) +
+                 glob.glob(os.path.join(REPO_ROOT, 'benchmarks', '*.py')))
+
+
+def imported_names(statements, package=""):
+    names = []
+    for statement in statements:
+        if isinstance(statement, ast.ImportFrom) and statement.module:
+            module = statement.module[len(package):] if statement.module.startswith(package) else statement.module
+            names.append((module, sorted(alias.name for alias in statement.names)))
+    return names
+
+
+@pytest.mark.parametrize("path", SOURCES, ids=os.path.basename)
+def test_fallback_imports_match(path):
+    """Both branches of the `except ImportError` script imports bring in the same names."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Try):
+            continue
+        for handler in node.handlers:
+            if isinstance(handler.type, ast.Name) and handler.type.id == "ImportError":
+                local = imported_names(node.body)
+                if local:
+                    assert imported_names(handler.body, "scripts.") == local, f"line {node.lineno}"
@@ -0,0 +1,85 @@
+import argparse
+import json
+import pstats
+
+import pytest
+
+from instrument import Stats, add_arguments, format_text, instrumented, STATS
+
+
+@pytest.fixture(autouse=True)
+def disable_stats():
+    """instrumented() enables the shared STATS; leave it off for other tests."""
+    yield
+    STATS.reset(enabled=False)
+
+
+def test_disabled_stats_record_nothing():
+    stats = Stats()
+    with stats.phase("scan"):
+        stats.count("files_scanned", 5)
+    assert stats.phases == {} and stats.counters == {}
+
+
+def test_phases_and_counters_accumulate_and_merge():
+    stats = Stats()
+    stats.reset(enabled=True)
+    for _ in range(3):
+        with stats.phase("read"):
+            stats.count("files_read")
+    stats.count("bytes_read", 100)
+    assert stats.phases["read"][2] == 3 and stats.counters == {"files_read": 3, "bytes_read": 100}
+
+    worker = Stats()
+    worker.reset(enabled=True)
+    with worker.phase("read"):
+        worker.count("files_read", 2)
+    with worker.phase("render"):
+        pass
+    stats.merge(json.loads(json.dumps(worker.snapshot())))  # Snapshots cross process boundaries
+    assert stats.phases["read"][2] == 4 and stats.phases["render"][2] == 1
+    assert stats.counters["files_read"] == 5
+
+    stats.reset()
+    assert stats.enabled and stats.phases == {} and stats.counters == {}
+
+
+def parse(*argv):
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    return parser.parse_args(list(argv))
+
+
+def test_instrumented_reports_to_stderr_only(capsys):
+    with instrumented(parse("--stats", "json"), "example") as stats:
+        with stats.phase("work"):
+            stats.count("items", 7)
+        print("data")
+    out, err = capsys.readouterr()
+    assert out == "data\n"
+    report = json.loads(err)
+    assert report["script"] == "example" and report["counters"] == {"items": 7}
+    assert report["phases"]["work"]["calls"] == 1 and report["wall_s"] >= report["phases"]["work"]["wall_s"]
+    assert "  items" in format_text(report)
+
+    # Without --stats the shared instance is reset and disabled
+    with instrumented(parse(), "example"):
+        STATS.count("items")
+    assert STATS.counters == {} and capsys.readouterr().err == ""
+
+
+def test_report_is_printed_when_the_script_exits_early(capsys):
+    with pytest.raises(SystemExit):
+        with instrumented(parse("--stats", "text"), "example"):
+            STATS.count("items", 2)
+            raise SystemExit(1)
+    err = capsys.readouterr().err
+    assert err.startswith("example: ") and "items" in err
+
+
+def test_cprofile_writes_a_loadable_profile(tmp_path, capsys):
+    path = str(tmp_path / "run.prof")
+    with instrumented(parse("--cprofile", path), "example"):
+        sorted(range(1000), key=lambda value: -value)
+    assert "cProfile output: " + path in capsys.readouterr().err
+    assert pstats.Stats(path).total_calls > 0
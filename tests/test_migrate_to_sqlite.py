@@ -0,0 +1,76 @@
+import os
+import sqlite3
+
+import pytest
+
+import batch_export
+from conftest import PROFILES, QUERIES
+from generate_profiles import load_db
+from migrate_to_sqlite import PROFILE_COLUMNS, open_db, row_to_profile, sync
+from profile_store import open_store
+from search_profiles import search_profiles
+
+
+@pytest.fixture
+def db_path(packed_dir, tmp_path):
+    path = str(tmp_path / "hardware.db")
+    conn = sqlite3.connect(path)
+    sync(conn, load_db(), packed_dir)
+    conn.close()
+    return path
+
+
+def test_profiles_table_holds_the_whole_tree(db_path):
+    conn = open_db(db_path)
+    try:
+        conn.row_factory = sqlite3.Row
+        rows = {row["id"]: row for row in conn.execute("SELECT * FROM profiles")}
+    finally:
+        conn.close()
+    assert {row["path"] for row in rows.values()} == {path for path, _ in PROFILES}
+    # Hand-authored profiles come back exactly as their files have them, missing sections included
+    assert all(row_to_profile(rows[profile["id"]]) == profile for _, profile in PROFILES)
+    # Profiles of models not in laptops.json have no laptop row
+    assert rows["template-xp-laptop"]["laptop_id"] is None
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_db_search_matches_store_and_scan(packed_dir, db_path, query):
+    scanned = sorted(search_profiles(packed_dir, query, use_store=False, use_index=False))
+    assert sorted(search_profiles(packed_dir, query, use_index=False)) == scanned
+    assert sorted(search_profiles(packed_dir, query, db_path=db_path)) == scanned
+
+
+@pytest.mark.parametrize("make, os_target, where", [
+    ("hp", None, None), (None, "windows 10", None), ("generic", None, None),
+    (None, None, "ram_mb >= 8192 and not gpu_vram_mb > 1024"), (None, None, None),
+])
+def test_db_export_selection_matches_store_and_scan(packed_dir, db_path, make, os_target, where):
+    expression = batch_export.FilterExpression(where) if where else None
+    scanned = list(batch_export.filter_profiles(batch_export.find_profiles(packed_dir), make, os_target, expression))
+    with open_store(packed_dir) as store:
+        stored = list(batch_export.filter_store(store, make, os_target, packed_dir, expression))
+    conn = open_db(db_path)
+    try:
+        queried = list(batch_export.filter_db(conn, make, os_target, packed_dir, expression))
+    finally:
+        conn.close()
+
+    def key(profiles):
+        return sorted((profile.id, os.path.normpath(profile.source), profile.to_dict()) for profile in profiles)
+    assert scanned and key(queried) == key(stored) == key(scanned)
+
+
+def test_sync_is_idempotent_and_replaces_an_old_profiles_table(packed_dir, tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE profiles (id TEXT PRIMARY KEY, make TEXT, os_dir TEXT)")
+    conn.execute("INSERT INTO profiles VALUES ('stale', 'HP', 'win10')")
+    conn.commit()
+
+    laptops = load_db()
+    assert sync(conn, laptops, packed_dir) == len(PROFILES)
+    assert sync(conn, laptops, packed_dir) == len(PROFILES)
+    assert tuple(row[1] for row in conn.execute("PRAGMA table_info(profiles)")) == PROFILE_COLUMNS
+    assert conn.execute("SELECT COUNT(*) FROM laptops").fetchone()[0] == len(laptops)
+    conn.close()
@@ -0,0 +1,92 @@
+import math
+import random
+
+import pytest
+
+import nearest
+from conftest import make_profile, write_tree
+from nearest import ABSENT, FEATURE_NAMES, NearestIndex, nearest_rows, parse_spec, raw_features
+from profile_store import open_store, pack_tree
+
+OS_TARGETS = ["Windows 10", "Windows 11", "Windows 7"]
+
+
+def random_profiles(count=300, seed=7):
+    rng = random.Random(seed)
+    profiles = []
+    for i in range(count):
+        profiles.append(make_profile(
+            f"gen-{i}", rng.choice(["Dell", "HP", "Lenovo"]), f"Model {i % 40}", rng.choice(OS_TARGETS),
+            year=rng.randint(2005, 2024), cpu_cores=rng.choice([1, 2, 4, 6, 8, 16]),
+            ram_mb=rng.choice([1024, 2048, 4096, 8192, 12288, 16384, 32768, 65536]),
+            storage_gb=rng.choice([32, 64, 128, 256, 512, 1000, 2000]),
+            gpu_vram_mb=rng.choice([None, 128, 512, 2048, 4096, 8192]),
+            screen_resolution=rng.choice([None, "1366x768", "1920x1080", "2560x1440", "3840x2160"])))
+    return profiles
+
+
+PROFILES = random_profiles()
+SPECS = [
+    ("cores=6 ram=12GB resolution=2560x1440 vram=4GB", 5, None),
+    ("ram=16GB", 10, None),
+    ("ram=3GB storage=100GB year=2012", 1, None),
+    ("cores=4 vram=0", 25, "Windows 11"),
+    ("resolution=1920x1080 year=2030", 40, "windows 7"),
+]
+
+
+def brute_force(profiles, spec, k, os_target):
+    """(distance, row) of the k nearest profiles, measured one by one."""
+    index = NearestIndex.from_profiles(profiles)  # Only for its normalization of each feature's range
+    dims = {FEATURE_NAMES.index(feature): index.normalize(FEATURE_NAMES.index(feature), value) for feature, value in spec.items()}
+    scored = []
+    for row, profile in enumerate(profiles):
+        if os_target is not None and profile["metadata"]["os_target"].lower() != os_target.lower():
+            continue
+        features = raw_features(profile)
+        point = {dim: ABSENT if features[dim] is None else index.normalize(dim, features[dim]) for dim in dims}
+        scored.append((math.sqrt(sum((point[dim] - target) ** 2 for dim, target in dims.items())), row))
+    return sorted(scored)[:k]
+
+
+def assert_same_neighbours(found, expected):
+    assert [distance for distance, _ in found] == pytest.approx([distance for distance, _ in expected])
+    # Profiles tied with the k-th distance may be picked in any order; all closer ones must match
+    cutoff = expected[-1][0] - 1e-9
+    assert {row for distance, row in found if distance < cutoff} == {row for distance, row in expected if distance < cutoff}
+
+
+@pytest.fixture(params=["kdtree", "numpy"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(nearest, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("spec, k, os_target", SPECS)
+def test_profile_index_matches_brute_force(backend, spec, k, os_target):
+    spec = parse_spec(spec)
+    index = NearestIndex.from_profiles(PROFILES)
+    found = sorted((distance, row) for distance, _, rows in index.nearest_members(spec, k, os_target) for row in rows)[:k]
+    assert_same_neighbours(found, brute_force(PROFILES, spec, k, os_target))
+
+
+def test_store_index_matches_brute_force(backend, tmp_path):
+    profiles_dir = write_tree(tmp_path / "profiles", [(f"other/{profile['id']}.json", profile) for profile in PROFILES])
+    pack_tree(profiles_dir)
+    with open_store(profiles_dir) as store:
+        rows = list(store)
+        index = NearestIndex.from_store(store)
+        for spec, k, os_target in SPECS:
+            spec = parse_spec(spec)
+            assert_same_neighbours(nearest_rows(store, index, spec, k, os_target), brute_force(rows, spec, k, os_target))
+
+
+def test_a_query_returns_at_most_the_matching_profiles(backend):
+    index = NearestIndex.from_profiles(PROFILES)
+    matching = sum(profile["metadata"]["os_target"] == "Windows 7" for profile in PROFILES)
+    found = index.nearest_members(parse_spec("ram=8GB"), len(PROFILES), "Windows 7")
+    assert sum(len(rows) for _, _, rows in found) == matching
+    assert index.nearest_members(parse_spec("ram=8GB"), 5, "Windows 95") == []
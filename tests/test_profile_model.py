@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from conftest import PROFILES
+from profile_model import FIELDS, Profile
+
+
+@pytest.mark.parametrize("rel_path, data", PROFILES, ids=[rel_path for rel_path, _ in PROFILES])
+def test_generated_layout_round_trips(rel_path, data):
+    profile = Profile.from_dict(data, source=rel_path)
+    assert profile.to_dict() == data
+    assert profile.id == data["id"] and profile.source == rel_path
+    assert profile.make == data["metadata"]["make"] and profile.ram_mb == data["hardware"]["ram_mb"]
+    assert profile.get("gpu_vram_mb") == data["hardware"].get("gpu_vram_mb")
+
+
+def test_flat_layout_and_aliases():
+    profile = Profile.from_dict({"id": "legacy", "make": "Dell", "model": "Latitude", "os": "Windows 7",
+                                 "hardware": {"cpu": "Intel Core 2 Duo", "cpu_count": 2, "ram_mb": 2048},
+                                 "software": {"browser": "IE8"}})
+    assert (profile.make, profile.os_target, profile.cpu_name, profile.cpu_cores, profile.primary_browser) == \
+           ("Dell", "Windows 7", "Intel Core 2 Duo", 2, "IE8")
+    assert profile.get("os") == profile.get("os_target") == "Windows 7"
+    assert profile.get("manufacturer") == "Dell"
+    assert profile.get("storage_gb", "n/a") == "n/a" and profile.get("no_such_field", 0) == 0
+    assert profile.to_dict() == {"id": "legacy", "metadata": {"make": "Dell", "model": "Latitude", "os_target": "Windows 7"},
+                                 "hardware": {"cpu_name": "Intel Core 2 Duo", "cpu_cores": 2, "ram_mb": 2048},
+                                 "software": {"primary_browser": "IE8"}}
+
+
+def test_profiles_are_slotted_and_share_interned_values():
+    # Separately parsed documents hold distinct but equal strings and numbers until interned
+    first, second = (Profile.from_dict(json.loads(json.dumps(data))) for data in (PROFILES[0][1], PROFILES[1][1]))
+    assert not hasattr(first, "__dict__")
+    assert set(Profile.__slots__) >= set(FIELDS)
+    for name in ("make", "model", "os_target", "cpu_name", "screen_resolution"):
+        assert getattr(first, name) is getattr(second, name)
+    document = '{"id": "x", "hardware": {"ram_mb": 1048576}}'
+    assert Profile.from_dict(json.loads(document)).ram_mb is Profile.from_dict(json.loads(document)).ram_mb
+    with pytest.raises(AttributeError):
+        first.color = "red"
+
+
+def test_replace_and_equality():
+    profile = Profile.from_dict(PROFILES[0][1], source="a.json")
+    renamed = profile.replace(id="config-1", config_hash="abc")
+    assert (renamed.id, renamed.config_hash, renamed.source) == ("config-1", "abc", "a.json")
+    assert renamed.to_dict() == dict(PROFILES[0][1], id="config-1")
+    assert profile.id == PROFILES[0][1]["id"] and profile != renamed
+    assert Profile.from_dict(PROFILES[0][1]) == profile
@@ -0,0 +1,45 @@
+import argparse
+import json
+
+import pytest
+
+from conftest import PROFILES, make_profile, write_tree
+from filter_expr import FilterExpression
+from profile_stats import (DEFAULT_PERCENTILES, FIELDS, Corpus, Dim, counts_table, coverage_tables, crosstab_table,
+                           describe_table, render, run)
+from profile_store import open_store, scan_tree
+
+
+def tables(corpus):
+    return coverage_tables(corpus, DEFAULT_PERCENTILES) + [
+        counts_table(corpus, [Dim("make"), Dim("ram_mb", "pow2")], sort="count"),
+        counts_table(corpus, [Dim("storage_gb", 100), Dim("primary_browser")]),
+        describe_table(corpus, ["gpu_vram_mb", "year"], [Dim("os_target")], [10, 50, 99]),
+        crosstab_table(corpus, Dim("boot_mode"), Dim("accessibility_mode")),
+    ]
+
+
+@pytest.mark.parametrize("where", [None, "gpu_vram_mb >= 1024", "not make == hp", "id ~ nothing"])
+def test_store_and_scan_build_the_same_tables(packed_dir, where):
+    expression = FilterExpression(where) if where else None
+    with open_store(packed_dir) as store:
+        from_store = Corpus.from_store(store, sorted(FIELDS), expression)
+    from_profiles = Corpus.from_profiles((profile for _, profile in scan_tree(packed_dir)), sorted(FIELDS), expression)
+    assert from_store.rows == from_profiles.rows
+    assert render(tables(from_store), "json") == render(tables(from_profiles), "json")
+
+
+def report_summary(profiles_dir, capsys):
+    args = argparse.Namespace(by=None, describe=None, crosstab=None, percentiles=DEFAULT_PERCENTILES, sort="key",
+                              top=None, format="json", output=None, no_store=False, dir=profiles_dir)
+    assert run(args, None) == 0
+    return {row["metric"]: row["value"] for row in json.loads(capsys.readouterr().out)["Corpus"]}
+
+
+def test_report_scans_the_tree_when_the_store_is_stale(packed_dir, capsys):
+    assert report_summary(packed_dir, capsys) == {"Profiles": len(PROFILES), "Models": 6, "Manufacturers": 4,
+                                                  "OS targets": 5, "Hardware configs": 9}
+    write_tree(packed_dir, [("win10/hp-stream-14-windows-10-v1.json",
+                             make_profile("hp-stream-14-windows-10-v1", "HP", "Stream 14", "Windows 10"))])
+    summary = report_summary(packed_dir, capsys)
+    assert (summary["Profiles"], summary["Models"]) == (len(PROFILES) + 1, 7)
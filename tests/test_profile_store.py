@@ -0,0 +1,67 @@
+import os
+import struct
+
+from conftest import PROFILES, make_profile, write_tree
+from profile_store import MAGIC, STORE_NAME, VERSION, is_store_current, open_store, pack_tree, scan_tree, write_store
+
+
+def test_store_holds_every_profile_of_the_tree(packed_dir):
+    with open_store(packed_dir) as store:
+        assert len(store) == len(PROFILES)
+        assert list(store) == [profile for _, profile in scan_tree(packed_dir)]
+        assert sorted(store.relative_path(row) for row in range(len(store))) == sorted(path for path, _ in PROFILES)
+        # Hand-authored files keep their own file names
+        assert store.relative_path(store.row_of("template-xp-laptop")) == os.path.join("xp", "template.json")
+
+
+def test_open_store_ignores_a_store_the_tree_has_moved_past(packed_dir):
+    assert is_store_current(packed_dir)
+    write_tree(packed_dir, [("win10/acer-aspire-windows-10-v1.json",
+                             make_profile("acer-aspire-windows-10-v1", "Acer", "Aspire", "Windows 10"))])
+    assert not is_store_current(packed_dir)
+    assert open_store(packed_dir) is None
+
+    pack_tree(packed_dir)
+    with open_store(packed_dir) as store:
+        assert len(store) == len(PROFILES) + 1
+
+
+def test_open_store_ignores_edited_and_removed_files(packed_dir):
+    path = os.path.join(packed_dir, PROFILES[0][0])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert open_store(packed_dir) is None
+
+    pack_tree(packed_dir)
+    os.remove(path)
+    assert open_store(packed_dir) is None
+
+
+def test_open_store_ignores_a_store_without_a_fingerprint(profiles_dir):
+    write_store(scan_tree(profiles_dir), os.path.join(profiles_dir, STORE_NAME))
+    assert open_store(profiles_dir) is None
+
+
+def test_store_warnings_go_to_stderr(packed_dir, capsys):
+    path = os.path.join(packed_dir, STORE_NAME)
+    with open(path, 'r+b') as f:
+        f.seek(len(MAGIC))
+        f.write(struct.pack('<I', VERSION - 1))
+    assert open_store(packed_dir) is None
+
+    with open(os.path.join(packed_dir, "win10", "broken.json"), 'w') as f:
+        f.write("{")
+    pack_tree(packed_dir)
+    os.remove(os.path.join(packed_dir, PROFILES[0][0]))
+    assert open_store(packed_dir) is None
+
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "outdated profile store" in captured.err and "stale profile store" in captured.err
+    assert "Skipping win10/broken.json" in captured.err
+
+
+def test_open_store_can_skip_the_tree_check(packed_dir):
+    os.remove(os.path.join(packed_dir, PROFILES[0][0]))
+    with open_store(packed_dir, check_tree=False) as store:
+        assert len(store) == len(PROFILES)
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import run_suite
+from run_suite import compare, synthesize_catalog
+
+
+def test_synthetic_catalogs_keep_models_unique():
+    laptops = run_suite.generate_profiles.load_db()[:5]
+    catalog = synthesize_catalog(laptops, 3)
+    assert len(catalog) == 15
+    assert catalog[:5] == laptops
+    assert len({(laptop["make"], laptop["model"]) for laptop in catalog}) == 15
+    for copy, laptop in zip(catalog[10:], laptops):
+        assert copy == dict(laptop, model=laptop["model"] + " Mk3")
+
+
+def result(case="generate", scale=1, rate=1000.0, rss=100.0):
+    return {"case": case, "scale": scale, "profiles_per_sec": rate, "peak_rss_mb": rss}
+
+
+def test_compare_flags_slowdowns_and_memory_growth_past_the_threshold():
+    baseline = {"results": [result(), result("search_store", rate=5000.0), result(scale=10)]}
+    assert compare([result(rate=950.0, rss=105.0), result(scale=10)], baseline, 0.10) == []
+    assert compare([result("filter_profiles", rate=1.0, rss=1000.0)], baseline, 0.10) == []  # No baseline entry
+    regressions = compare([result(rate=800.0), result("search_store", rate=5000.0, rss=150.0)], baseline, 0.10)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("1x generate: profiles/sec") and "(-20%)" in regressions[0]
+    assert regressions[1].startswith("1x search_store: peak RSS") and "(+50%)" in regressions[1]
+    assert compare([result(rate=800.0)], baseline, 0.25) == []
+
+
+def test_suite_run_writes_results_and_checks_them_against_a_baseline(tmp_path, capsys):
+    output = str(tmp_path / "results.json")
+    argv = ["--scales", "1", "--case", "export_docker", "--export-sample", "3", "--workdir", str(tmp_path)]
+    assert run_suite.main(argv + ["--output", output]) == 0
+    with open(output) as f:
+        report = json.load(f)
+    [measured] = report["results"]
+    assert measured["case"] == "export_docker" and measured["scale"] == 1 and measured["profiles"] == 3
+    assert measured["wall_s"] > 0 and measured["peak_rss_mb"] > 0
+
+    # A baseline ten times faster is a regression
+    measured["profiles_per_sec"] *= 10
+    with open(output, 'w') as f:
+        json.dump(report, f)
+    assert run_suite.main(argv + ["--compare", output]) == 1
+    assert "1 regression(s)" in capsys.readouterr().out
+    assert os.listdir(tmp_path) == ["results.json"]  # Workspaces are removed
@@ -0,0 +1,58 @@
+import os
+import pickle
+
+import pytest
+
+from conftest import QUERIES, make_profile, write_tree
+from search_index import INDEX_NAME, INDEXED_FIELDS, SearchIndex
+from search_profiles import search_profiles
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_index_search_matches_file_scan(profiles_dir, query):
+    scanned = search_profiles(profiles_dir, query, use_store=False, use_index=False)
+    assert sorted(search_profiles(profiles_dir, query)) == sorted(scanned)
+
+
+@pytest.mark.parametrize("field", INDEXED_FIELDS)
+def test_index_field_search_matches_file_scan(profiles_dir, field):
+    for query in ("hp", "windows 1", "t4", "intel", "-v1", "1"):
+        scanned = search_profiles(profiles_dir, query, field, use_store=False, use_index=False)
+        assert sorted(search_profiles(profiles_dir, query, field)) == sorted(scanned)
+
+
+def test_saved_index_is_reused_until_the_tree_changes(profiles_dir, monkeypatch):
+    SearchIndex.load(profiles_dir)
+    with monkeypatch.context() as patch:
+        patch.setattr(SearchIndex, "refresh", lambda *args: pytest.fail("fingerprint matched; no refresh expected"))
+        assert len(SearchIndex.load(profiles_dir).search("hp stream")) == 3
+
+    write_tree(profiles_dir, [("win10/hp-stream-14-windows-10-v1.json",
+                               make_profile("hp-stream-14-windows-10-v1", "HP", "Stream 14", "Windows 10"))])
+    assert len(SearchIndex.load(profiles_dir).search("hp stream")) == 4
+    os.remove(os.path.join(profiles_dir, "win10", "hp-stream-14-windows-10-v1.json"))
+    assert len(SearchIndex.load(profiles_dir).search("hp stream")) == 3
+
+
+class Payload:
+    def __reduce__(self):
+        return (open, (os.environ["MARKER"], "w"))
+
+
+def test_index_file_is_never_unpickled(profiles_dir, tmp_path, monkeypatch):
+    marker = tmp_path / "unpickled"
+    monkeypatch.setenv("MARKER", str(marker))
+    with open(os.path.join(profiles_dir, INDEX_NAME), 'wb') as f:
+        pickle.dump({"version": 1, "payload": Payload()}, f)
+
+    index = SearchIndex.load(profiles_dir)
+    assert not marker.exists()
+    assert len(index.search("generic")) == 2
+
+
+def test_truncated_index_is_rebuilt(profiles_dir):
+    SearchIndex.load(profiles_dir)
+    path = os.path.join(profiles_dir, INDEX_NAME)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 4)
+    assert len(SearchIndex.load(profiles_dir).search("hp stream")) == 3
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import QUERIES
+from search_profiles import search_profiles
+
+FIELD_QUERIES = [("make", "hp"), ("model", "thinkpad t4"), ("os", "windows 1"), ("id", "-v1"),
+                 ("cpu_name", "i5"), ("ram_mb", "40")]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_store_search_matches_file_scan(packed_dir, query):
+    scanned = search_profiles(packed_dir, query, use_store=False, use_index=False)
+    assert sorted(search_profiles(packed_dir, query, use_index=False)) == sorted(scanned)
+
+
+@pytest.mark.parametrize("field, query", FIELD_QUERIES)
+def test_store_field_search_matches_file_scan(packed_dir, field, query):
+    scanned = search_profiles(packed_dir, query, field, use_store=False, use_index=False)
+    assert scanned
+    assert sorted(search_profiles(packed_dir, query, field, use_index=False)) == sorted(scanned)
+
+
+def test_cross_field_query_finds_hand_authored_variants(packed_dir):
+    assert len(search_profiles(packed_dir, "hp stream", use_index=False)) == 3
+
+
+def test_store_search_when_imported_from_the_repo_root(packed_dir):
+    # The scripts' fallback imports (`from scripts.x import ...`) are only taken outside scripts/
+    repo_root = os.path.join(os.path.dirname(__file__), '..')
+    code = ("import sys\n"
+            "from scripts import search_profiles\n"
+            "print(len(search_profiles.search_profiles(sys.argv[1], 'hp stream', use_index=False)))\n")
+    result = subprocess.run([sys.executable, "-c", code, packed_dir], cwd=repo_root,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == "3"
@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import PROFILES
+import serve
+from serve import MAX_BODY_BYTES, BoundedCache, ProfileIndex, serve_connection
+
+INDEX = ProfileIndex((profile for _, profile in PROFILES), "test")
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return int(status_line.split()[1]), headers, body
+
+
+def exchange(*requests, responses=None):
+    """Sends the raw requests on one connection; returns (status, headers, body) per response."""
+    async def run():
+        server = await asyncio.start_server(lambda r, w: serve_connection(INDEX, r, w), "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            for request in requests:
+                writer.write(request)
+            await writer.drain()
+            results = [await read_response(reader) for _ in range(responses or len(requests))]
+            tail = await reader.read()  # The server must close (or have closed) the connection
+            writer.close()
+            return results, tail
+    return asyncio.run(asyncio.wait_for(run(), 10))
+
+
+def get(path, *headers, close=False):
+    lines = [f"GET {path} HTTP/1.1", "Host: localhost"] + list(headers) + (["Connection: close"] if close else [])
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+
+def test_bodies_are_skipped_on_keep_alive_connections():
+    body = json.dumps({"ignored": "x" * 100}).encode()
+    post = b"POST /api/v1/formats HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+    (posted, formats), _ = exchange(post, get("/api/v1/formats", close=True))
+    assert posted[0] == 405
+    assert formats[0] == 200 and "docker" in json.loads(formats[2])
+
+
+@pytest.mark.parametrize("headers, status", [
+    (f"Content-Length: {MAX_BODY_BYTES + 1}", 413),
+    ("Content-Length: -3", 400),
+    ("Transfer-Encoding: chunked", 411),
+])
+def test_unreadable_bodies_are_refused_and_close_the_connection(headers, status):
+    request = f"PUT /api/v1/formats HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n\r\n".encode()
+    [(answered, response_headers, _)], tail = exchange(request + get("/api/v1/formats"), responses=1)
+    assert answered == status
+    assert response_headers["connection"] == "close"
+    assert tail == b""
+
+
+def test_if_none_match():
+    [(_, headers, _)] = exchange(get("/api/v1/profiles/template-xp-laptop", close=True))[0]
+    etag = headers["etag"]
+    for value in (etag, "*", f'"other", W/{etag}'):
+        [(status, _, body)] = exchange(get("/api/v1/profiles/template-xp-laptop", f"If-None-Match: {value}", close=True))[0]
+        assert (status, body) == (304, b"")
+    [(status, _, _)] = exchange(get("/api/v1/profiles/template-xp-laptop", 'If-None-Match: "other"', close=True))[0]
+    assert status == 200
+    # "*" only matches resources that exist
+    [(status, _, _)] = exchange(get("/api/v1/profiles/missing", "If-None-Match: *", close=True))[0]
+    assert status == 404
+
+
+@pytest.mark.parametrize("request_bytes, status", [
+    (b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n", 414),
+    (b"GET /api/v1/formats HTTP/1.1\r\nX-Big: " + b"a" * 70000 + b"\r\n\r\n", 431),
+    (b"GET /api/v1/formats HTTP/1.1\r\n" + b"X-Header: 1\r\n" * 101 + b"\r\n", 431),
+    (b"NONSENSE\r\n\r\n", 400),
+])
+def test_oversized_or_malformed_requests_are_answered(request_bytes, status):
+    [(answered, headers, _)], _ = exchange(request_bytes)
+    assert answered == status
+    assert headers["connection"] == "close"
+
+
+def test_bounded_cache_evicts_least_recently_used_by_size():
+    cache = BoundedCache(10, len)
+    assert cache.get("a", lambda: "aaaa") == "aaaa"
+    cache.get("b", lambda: "bbbb")
+    cache.get("a", lambda: "unused")  # Refreshes "a"
+    cache.get("c", lambda: "cccc")    # Evicts "b"
+    assert cache.used == 8 and len(cache) == 2
+    assert cache.get("b", lambda: "BBBB") == "BBBB"
+    assert cache.get("huge", lambda: "x" * 11) == "x" * 11
+    assert cache.used <= 10 and cache.get("huge", lambda: "recomputed") == "recomputed"
+
+
+def test_query_cache_stays_within_its_byte_budget(monkeypatch):
+    monkeypatch.setattr(serve, "QUERY_CACHE_BYTES", 64)
+    index = ProfileIndex((profile for _, profile in PROFILES), "test")
+    pages = {}
+    for min_ram in range(0, 40000, 512):
+        pages[min_ram] = index.page((), (("ram_mb", min_ram),), 1, 1000)
+        assert index.cache.used <= 64
+    # Evicted queries are recomputed to the same response
+    assert all(index.page((), (("ram_mb", min_ram),), 1, 1000) == body for min_ram, body in pages.items())
+    assert json.loads(pages[4096])["total"] == sum(1 for _, profile in PROFILES if profile["hardware"]["ram_mb"] >= 4096)
+
+
+@pytest.mark.parametrize("export_format, status", [("docker", 200), ("vagrant", 200), ("docker-bake", 400),
+                                                    ("terraform-module", 400), ("no-such-format", 404)])
+def test_export_route_only_serves_per_profile_formats(export_format, status):
+    [(answered, _, body)] = exchange(get(f"/api/v1/profiles/template-xp-laptop/export/{export_format}", close=True))[0]
+    assert answered == status
+    if status == 200:
+        assert json.loads(body)["files"][0]["name"].startswith("template-xp-laptop")
+    [(_, _, formats)] = exchange(get("/api/v1/formats", close=True))[0]
+    assert (export_format in json.loads(formats)) == (status == 200)
+
+
+def test_handler_failures_are_answered_with_500(monkeypatch, capsys):
+    def broken(profile):
+        raise KeyError("template field")
+    monkeypatch.setattr(serve, "profile_record", broken)
+    (failed, after), _ = exchange(get("/api/v1/profiles/template-xp-laptop/export/docker"),
+                                  get("/api/v1/profiles/template-xp-laptop", close=True))
+    assert failed[0] == 500 and json.loads(failed[2]) == {"error": "Internal server error"}
+    # The connection survives the failure
+    assert after[0] == 200
+    assert "KeyError" in capsys.readouterr().err
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+
+import pytest
+
+from merge_shards import BATCH_MANIFEST, GENERATION_MANIFEST, main, verify_export, verify_generation
+from shards import Shard, parse_shard, shard_of, take_shard
+
+IDS = [f"lenovo-thinkpad-t480-windows-10-v{n}" for n in range(1, 41)]
+
+
+def test_shard_of_is_stable_and_in_range():
+    for count in (1, 2, 3, 8):
+        owners = [shard_of(profile_id, count) for profile_id in IDS]
+        assert owners == [shard_of(profile_id, count) for profile_id in IDS]
+        assert set(owners) <= set(range(1, count + 1))
+    assert len({shard_of(profile_id, 3) for profile_id in IDS}) == 3
+
+
+def test_take_shard_partitions_the_selection():
+    kept = []
+    for index in (1, 2, 3):
+        counts = {}
+        kept.extend(take_shard(IDS, Shard(index, 3), counts, key=str))
+        assert counts["selected"] == len(IDS)
+    assert sorted(kept) == sorted(IDS)
+
+
+@pytest.mark.parametrize("value", ["0/3", "4/3", "3", "a/b", "1/0"])
+def test_parse_shard_rejects_bad_values(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_shard(value)
+
+
+def write_export_shard(root, index, count, ids, selected=len(IDS)):
+    """A batch_export.py --shard output directory holding `ids`."""
+    os.makedirs(root)
+    profiles = []
+    for profile_id in ids:
+        path = os.path.join(profile_id, "Dockerfile")
+        os.makedirs(os.path.join(root, profile_id))
+        open(os.path.join(root, path), 'w').close()
+        profiles.append({"id": profile_id, "status": "ok", "files": [path]})
+    manifest = {"format": "docker", "total": len(ids), "profiles": profiles,
+                "shard": {"index": index, "count": count, "selected": selected, "kept": len(ids)}}
+    with open(os.path.join(root, BATCH_MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    return root, manifest
+
+
+def export_shards(tmp_path, count=2, assign=None):
+    assign = assign or (lambda profile_id: shard_of(profile_id, count))
+    return [write_export_shard(str(tmp_path / f"shard{index}"), index, count,
+                               [profile_id for profile_id in IDS if assign(profile_id) == index])
+            for index in range(1, count + 1)]
+
+
+def test_complete_export_shards_verify(tmp_path):
+    assert verify_export(export_shards(tmp_path), "docker") == []
+
+
+def test_missing_shard(tmp_path):
+    problems = verify_export(export_shards(tmp_path, 3)[:2], "docker")
+    assert problems == ["docker: missing shard(s) 3/3"]
+
+
+def test_duplicated_shard(tmp_path):
+    shards = export_shards(tmp_path)
+    problems = verify_export([shards[0], shards[0], shards[1]], "docker")
+    assert problems == ["docker: shard(s) given more than once: 1/2"]
+
+
+def test_foreign_owned_and_duplicated_ids(tmp_path):
+    foreign = IDS[0]
+    owner = shard_of(foreign, 2)
+    # The other shard exports the id as well
+    shards = export_shards(tmp_path, assign=lambda profile_id: shard_of(profile_id, 2))
+    other_root, other = shards[2 - owner]
+    path = os.path.join(foreign, "Dockerfile")
+    os.makedirs(os.path.join(other_root, foreign))
+    open(os.path.join(other_root, path), 'w').close()
+    other["profiles"].append({"id": foreign, "status": "ok", "files": [path]})
+    other["total"] += 1
+
+    problems = verify_export(shards, "docker")
+    assert f"docker: {foreign} belongs to shard {owner}/2, not {3 - owner}/2" in problems
+    assert any(problem.startswith(f"docker: {foreign} exported by shards") for problem in problems)
+    assert any("shards exported 41 profiles but the selection has 40" in problem for problem in problems)
+
+
+def test_missing_artifact(tmp_path):
+    shards = export_shards(tmp_path)
+    root, manifest = shards[0]
+    os.remove(os.path.join(root, manifest["profiles"][0]["files"][0]))
+    assert verify_export(shards, "docker") == [f"docker: {os.path.join(root, manifest['profiles'][0]['files'][0])} is missing"]
+
+
+def write_generation_shard(root, index, count, ids):
+    os.makedirs(os.path.join(root, "win10"))
+    files = []
+    for profile_id in ids:
+        files.append(os.path.join("win10", f"{profile_id}.json"))
+        with open(os.path.join(root, files[-1]), 'w') as f:
+            json.dump({"id": profile_id}, f)
+    manifest = {"version": 1, "shard": {"index": index, "count": count},
+                "models": {"Lenovo|ThinkPad T480": {"hash": "abc", "variants": len(IDS), "files": files}}}
+    with open(os.path.join(root, GENERATION_MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    return root, manifest
+
+
+def test_generation_shards(tmp_path):
+    shards = [write_generation_shard(str(tmp_path / f"shard{index}"), index, 2,
+                                     [profile_id for profile_id in IDS if shard_of(profile_id, 2) == index])
+              for index in (1, 2)]
+    assert verify_generation(shards) == []
+
+    root, manifest = shards[1]
+    dropped = manifest["models"]["Lenovo|ThinkPad T480"]["files"].pop()
+    assert verify_generation(shards) == ["profiles: Lenovo|ThinkPad T480 has 39 of its 40 profiles across the shards"]
+    manifest["models"]["Lenovo|ThinkPad T480"]["files"].append(dropped)
+
+    foreign = shards[0][1]["models"]["Lenovo|ThinkPad T480"]["files"][0]
+    manifest["models"]["Lenovo|ThinkPad T480"]["files"].append(foreign)
+    with open(os.path.join(root, foreign), 'w') as f:
+        json.dump({}, f)
+    profile_id = os.path.splitext(os.path.basename(foreign))[0]
+    assert verify_generation(shards) == [
+        f"profiles: {profile_id} generated by shards 1 and 2",
+        f"profiles: {profile_id} belongs to shard 1/2, not 2/2",
+    ]
+
+
+def test_verify_exit_codes(tmp_path):
+    shards = export_shards(tmp_path, 3)
+    with pytest.raises(SystemExit) as exit:
+        main(["verify"] + [root for root, _ in shards])
+    assert exit.value.code == 0
+    with pytest.raises(SystemExit) as exit:
+        main(["verify"] + [root for root, _ in shards[:2]])
+    assert exit.value.code == 1
@@ -0,0 +1,33 @@
+import pytest
+
+from templates import Template
+
+RECORD = {"id": "hp-stream-11-windows-10-v1", "make": "HP", "ram_mb": 2048, "ratio": 0.5}
+
+
+@pytest.mark.parametrize("source", [
+    "",
+    "no fields at all",
+    "{id}",
+    "FROM base\nENV ID=\"{id}\" MAKE=\"{make}\" RAM=\"{ram_mb}\"\n",
+    "{make}{make}-{ram_mb}MB",
+    "locals {{ ram = {ram_mb} }}",
+    "100% {ratio} %s %(id)s %%",
+])
+def test_render_matches_str_format(source):
+    assert Template(source).render(RECORD) == source.format(**RECORD)
+
+
+def test_fields_are_listed_in_order():
+    assert Template("{make} {id} {make}").fields == ["make", "id", "make"]
+
+
+@pytest.mark.parametrize("source", ["{", "}", "a { b", "{id", "{{id}", "{ id }", "{0}"])
+def test_unbalanced_or_invalid_braces_are_rejected(source):
+    with pytest.raises(ValueError, match="Unbalanced brace"):
+        Template(source)
+
+
+def test_missing_fields_raise_key_error():
+    with pytest.raises(KeyError, match="model"):
+        Template("{make} {model}").render(RECORD)
@@ -0,0 +1,149 @@
+import copy
+import json
+import os
+
+import pytest
+
+from conftest import PROFILES, write_tree
+import validate_profiles
+from validate_profiles import (CACHE_NAME, SchemaError, compile_schema, load_schema, validate_document,
+                               validate_files)
+
+REPO_SCHEMA = os.path.join(validate_profiles.PROFILES_DIR, validate_profiles.SCHEMA_NAME)
+
+
+def violations(schema, value):
+    return [(location, keyword) for location, keyword, _ in validate_document(compile_schema(schema), value)]
+
+
+@pytest.mark.parametrize("schema, value, expected", [
+    ({"type": "integer"}, "4", [("", "type")]),
+    ({"type": "integer"}, True, [("", "type")]),
+    ({"type": "integer"}, 4.5, [("", "type")]),
+    ({"type": ["string", "null"]}, 0, [("", "type")]),
+    ({"required": ["id", "metadata"]}, {"id": "x"}, [("metadata", "required")]),
+    ({"properties": {"year": {"type": "integer"}}}, {"year": "2016"}, [("year", "type")]),
+    ({"properties": {"a": {}}, "additionalProperties": False}, {"a": 1, "b": 2}, [("b", "additionalProperties")]),
+    ({"additionalProperties": {"type": "string"}}, {"a": "x", "b": 2}, [("b", "type")]),
+    ({"items": {"type": "string"}}, ["a", 1, "b"], [("1", "type")]),
+    ({"enum": ["Laptop", "Desktop"]}, "Phone", [("", "enum")]),
+    ({"enum": [1]}, True, [("", "enum")]),
+    ({"const": "v1"}, "v2", [("", "const")]),
+    ({"pattern": "^[a-z0-9-]+$"}, "HP Stream", [("", "pattern")]),
+    ({"minimum": 1980}, 1979, [("", "minimum")]),
+    ({"maximum": 2030}, 2031, [("", "maximum")]),
+    ({"exclusiveMinimum": 0}, 0, [("", "exclusiveMinimum")]),
+    ({"exclusiveMaximum": 10}, 10, [("", "exclusiveMaximum")]),
+    ({"minLength": 2}, "a", [("", "minLength")]),
+    ({"maxLength": 2}, "abc", [("", "maxLength")]),
+    ({"minItems": 1}, [], [("", "minItems")]),
+    ({"maxItems": 1}, [1, 2], [("", "maxItems")]),
+])
+def test_each_keyword_reports_its_violation(schema, value, expected):
+    assert violations(schema, value) == expected
+
+
+@pytest.mark.parametrize("schema, value", [
+    ({"type": "integer"}, 1.0),
+    ({"type": "integer", "minimum": 1980}, 2016.0),
+    ({"enum": [1, 2]}, 2.0),
+    ({"const": 0}, 0.0),
+    ({"minimum": 1980}, "1"),
+    ({"pattern": "^x", "minLength": 2}, 5),
+])
+def test_valid_values_pass(schema, value):
+    assert violations(schema, value) == []
+
+
+def test_unsupported_keywords_are_an_error():
+    with pytest.raises(SchemaError, match="oneOf"):
+        compile_schema({"properties": {"id": {"oneOf": [{"type": "string"}]}}})
+
+
+def test_every_violation_is_reported_in_one_pass():
+    check = compile_schema(load_schema(REPO_SCHEMA)[0])
+    profile = copy.deepcopy(PROFILES[0][1])
+    assert validate_document(check, profile) == []
+    profile["id"] = "HP Stream"
+    profile["metadata"]["year"] = 1900
+    profile["metadata"]["os_target"] = "Windows 12"
+    profile["hardware"]["ram_mb"] = "2048"
+    del profile["metadata"]["make"]
+    found = {(location, keyword) for location, keyword in violations(load_schema(REPO_SCHEMA)[0], profile)}
+    assert found >= {("id", "pattern"), ("metadata.year", "minimum"), ("metadata.os_target", "enum"),
+                     ("hardware.ram_mb", "type")}
+    assert len(found) == len(validate_document(check, profile))
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    """The test profiles with the repo schema, validated and cached inside tmp_path."""
+    profiles_dir = write_tree(tmp_path / "profiles")
+    with open(REPO_SCHEMA, 'rb') as src, open(os.path.join(profiles_dir, validate_profiles.SCHEMA_NAME), 'wb') as dst:
+        dst.write(src.read())
+    monkeypatch.setattr(validate_profiles, "PROFILES_DIR", profiles_dir)
+    return profiles_dir
+
+
+def run(*argv):
+    with pytest.raises(SystemExit) as exited:
+        validate_profiles.main(["--format", "json", "--jobs", "1"] + list(argv))
+    return exited.value.code
+
+
+def test_editing_a_file_invalidates_its_cached_result(tree, capsys):
+    assert run() == 0
+    assert json.loads(capsys.readouterr().out)["files"] == len(PROFILES)
+    with open(os.path.join(tree, CACHE_NAME)) as f:
+        assert len(json.load(f)["files"]) == len(PROFILES)
+
+    path = os.path.join(tree, PROFILES[0][0])
+    profile = copy.deepcopy(PROFILES[0][1])
+    profile["metadata"]["year"] = 1900
+    with open(path, 'w') as f:
+        json.dump(profile, f)
+    assert run() == 1
+    errors = json.loads(capsys.readouterr().out)["errors"]
+    assert [(os.path.basename(name), [error["keyword"] for error in found]) for name, found in errors.items()] == \
+        [(os.path.basename(path), ["minimum"])]
+
+    with open(path, 'w') as f:
+        json.dump(PROFILES[0][1], f)
+    assert run() == 0
+
+
+def test_the_schema_file_is_never_validated(tree, tmp_path, capsys):
+    # A stricter schema elsewhere: the tree's own profile_schema.json is not a profile and would fail it
+    strict = tmp_path / "strict.json"
+    strict.write_text(json.dumps({"type": "object", "required": ["id", "metadata"]}))
+    assert run("--no-cache", "--schema", str(strict)) == 0
+    assert json.loads(capsys.readouterr().out)["files"] == len(PROFILES)
+
+    # ... and a schema kept inside the tree under another name
+    inside = os.path.join(tree, "strict.json")
+    strict.rename(inside)
+    assert run("--no-cache", "--schema", inside, tree) == 0
+    assert json.loads(capsys.readouterr().out)["files"] == len(PROFILES)
+
+
+def test_small_runs_do_not_start_a_pool(tree, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("a process pool was started")
+    monkeypatch.setattr(validate_profiles, "ProcessPoolExecutor", no_pool)
+    paths = validate_profiles.find_files([tree], REPO_SCHEMA)
+    schema = load_schema(REPO_SCHEMA)[0]
+    report = validate_files(paths, schema, {"files": {}, "results": {}}, tree, jobs=8)
+    assert len(report) == len(PROFILES) and not any(report.values())
+
+
+def test_pooled_and_serial_runs_agree(tree, monkeypatch):
+    with open(os.path.join(tree, PROFILES[1][0]), 'w') as f:
+        f.write("{not json")
+    paths = validate_profiles.find_files([tree], REPO_SCHEMA)
+    schema = load_schema(REPO_SCHEMA)[0]
+    serial = validate_files(paths, schema, {"files": {}, "results": {}}, tree, jobs=1)
+    monkeypatch.setattr(validate_profiles, "PARALLEL_MIN_FILES", 1)
+    monkeypatch.setattr(validate_profiles, "VALIDATE_CHUNK", 2)
+    assert validate_files(paths, schema, {"files": {}, "results": {}}, tree, jobs=2) == serial
+    assert [keyword for _, keyword, _ in serial[os.path.join(tree, PROFILES[1][0])]] == ["json"]
+    assert sum(map(bool, serial.values())) == 1